@@ -1,68 +1,59 @@
 # backend/main.py
+import asyncio
 from pathlib import Path
-import os
-from dotenv import load_dotenv
-
-DEFAULT_ENV_PATH = "/Users/cheapanharith/developer/OOPproject/password.env"
-
-def _load_env():
-    env_file = os.getenv("ENV_FILE", DEFAULT_ENV_PATH)
-    candidates = [Path(env_file).expanduser().resolve()]
-    here = Path(__file__).resolve().parent
-    candidates += [here / ".env", here.parent / ".env", Path.cwd() / ".env"]
-    for up in list(here.parents)[:6]:
-        candidates.append(up / ".env")
-    tried = []
-    for p in candidates:
-        try:
-            tried.append(str(p))
-            if p.exists():
-                load_dotenv(dotenv_path=p, override=True)
-                print(f"[ENV] Loaded {p}")
-                break
-        except Exception:
-            pass
-    else:
-        load_dotenv(override=True)
-        print(f"[ENV] .env not found. Tried: {tried}")
 
-_load_env()
+from config.settings import reload_settings, settings
 
 print(
     "[MAIL CFG]",
-    "SMTP_USER=", os.getenv("SMTP_USER"),
-    "EMAIL_FROM=", os.getenv("EMAIL_FROM"),
-    "HOST=", os.getenv("SMTP_HOST"),
-    "PORT=", os.getenv("SMTP_PORT"),
+    "SMTP_USER=", settings.SMTP_USER or None,
+    "FROM=", settings.smtp_sender,
+    "HOST=", settings.SMTP_HOST,
+    "PORT=", settings.SMTP_PORT,
+    "SECURITY=", settings.smtp_security,
 )
 
-from fastapi import FastAPI, Form
+from fastapi import FastAPI, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.concurrency import run_in_threadpool
+
+from utils.sessions import ServerSessionMiddleware, SessionSweeper, make_store
 
 app = FastAPI()
 
-SECRET_KEY = os.getenv("SECRET_KEY")
+SECRET_KEY = settings.SECRET_KEY
 if not SECRET_KEY:
     import secrets as _secrets
     SECRET_KEY = _secrets.token_urlsafe(32)
     print("WARNING: Using ephemeral SECRET_KEY. Set SECRET_KEY in .env for persistent sessions.")
 
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=SECRET_KEY,
-    session_cookie="nb_session",
-    max_age=60 * 60 * 24,
-    same_site="lax",
-    https_only=False,
-)
+session_store = make_store(settings.SESSION_BACKEND)
+session_sweeper = SessionSweeper(session_store, settings.SESSION_SWEEP_INTERVAL) if session_store else None
+if session_store is not None:
+    # Only an opaque id in the cookie; the session itself stays on the server
+    app.add_middleware(
+        ServerSessionMiddleware,
+        store=session_store,
+        session_cookie=settings.SESSION_COOKIE,
+        max_age=settings.SESSION_MAX_AGE,
+        same_site=settings.SESSION_SAME_SITE.lower(),
+        https_only=settings.SESSION_HTTPS_ONLY,
+    )
+else:
+    app.add_middleware(
+        SessionMiddleware,
+        secret_key=SECRET_KEY,
+        session_cookie=settings.SESSION_COOKIE,
+        max_age=settings.SESSION_MAX_AGE,
+        same_site=settings.SESSION_SAME_SITE.lower(),
+        https_only=settings.SESSION_HTTPS_ONLY,
+    )
 
-origins_env = os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173")
-allow_origins = [o.strip() for o in origins_env.split(",") if o.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=allow_origins,
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -75,7 +66,7 @@ STATIC_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 from routes.public.index import router as index_router
-from routes.public.userdb import router as userdb_router
+from routes.public.userdb import router as userdb_router, service_flights, userdash_cache
 from routes.public.booking import router as booking_router, rating_router as booking_rating_router
 
 from routes.admin.auth import router as auth_router
@@ -85,6 +76,19 @@ from routes.admin.restaurants import router as restaurants_router
 from routes.admin.menu import router as menu_router
 from routes.admin.bookings import router as admin_bookings_router
 
+from routes.api.v1 import router as api_v1_router
+
+from models.database import db_connection, get_pool, pool_stats, run_in_db, shutdown_executor
+from models import booking_rollups, capacity, idempotency, outbox, ratelimit, sessions, worker_ids
+from models.catalog import cache_stats
+from utils.templating import template_stats, warm_templates
+from utils.mailer import mailer, send_email
+from utils.ids import order_ids
+from utils.ratelimit import limiter
+
+# This process's slice of the booking order id space (see models/worker_ids.py)
+worker_id_lease = worker_ids.WorkerIdLease(order_ids)
+
 app.include_router(index_router)
 app.include_router(userdb_router)
 app.include_router(booking_router)
@@ -97,21 +101,135 @@ app.include_router(restaurants_router)
 app.include_router(menu_router)
 app.include_router(admin_bookings_router)
 
-try:
-    from routes.admin.smtp_helper import send_email as _smtp_send
-except Exception:
-    _smtp_send = None
+app.include_router(api_v1_router)
 
 @app.post("/_smtp/test")
 async def _smtp_test(to: str = Form(...)):
-    if _smtp_send is None:
-        return {"ok": False, "error": "smtp_helper_unavailable"}
-    _smtp_send(to, "SMTP Test", "SMTP OK", "<b>SMTP OK</b>")
+    try:
+        await run_in_threadpool(send_email, to, "SMTP Test", "SMTP OK", "<b>SMTP OK</b>")
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
     return {"ok": True}
 
+@app.get("/_mail/stats")
+def _mail_stats():
+    return mailer.stats()
+
+@app.get("/_mail/outbox")
+async def _mail_outbox():
+    async with db_connection() as db:
+        table = await run_in_db(outbox.stats, db)
+    return {**table, "in_process": outbox.outbox_runner.running, "worker": outbox.outbox_runner.worker.stats()}
+
+async def _backfill_rollups() -> None:
+    try:
+        async with db_connection() as db:
+            await run_in_db(booking_rollups.backfill, db)
+    except Exception as e:
+        print(f"[ROLLUPS] backfill failed: {type(e).__name__}: {e}")
+
 @app.on_event("startup")
 async def startup():
     print("Server starting up")
+    await mailer.start()
+    if settings.TEMPLATES_PRECOMPILE:
+        warm_templates()
+    try:
+        async with db_connection() as db:
+            await run_in_db(booking_rollups.ensure_tables, db)
+            await run_in_db(capacity.ensure_tables, db)
+    except Exception as e:
+        print(f"[ROLLUPS] could not create rollup/capacity tables: {e}")
+    else:
+        # In the background: the first backfill of a large bookings table can take a while
+        app.state.rollup_backfill = asyncio.create_task(_backfill_rollups())
+    try:
+        async with db_connection() as db:
+            await run_in_db(worker_ids.ensure_table, db)
+    except Exception as e:
+        print(f"[WORKER-ID] could not create the worker id table: {e}")
+    await worker_id_lease.start()
+    print(f"[WORKER-ID] order ids use worker {order_ids.worker_id}")
+    try:
+        async with db_connection() as db:
+            await run_in_db(idempotency.ensure_table, db)
+            purged = await run_in_db(idempotency.purge, db, settings.IDEMPOTENCY_KEY_DAYS)
+        if purged:
+            print(f"[IDEMPOTENCY] purged {purged} keys older than {settings.IDEMPOTENCY_KEY_DAYS} days")
+    except Exception as e:
+        print(f"[IDEMPOTENCY] could not prepare idempotency keys: {e}")
+    try:
+        async with db_connection() as db:
+            await run_in_db(outbox.ensure_table, db)
+            await run_in_db(outbox.purge, db, settings.MAIL_OUTBOX_KEEP_DAYS)
+        if settings.MAIL_OUTBOX_INPROCESS:
+            await outbox.outbox_runner.start()
+    except Exception as e:
+        print(f"[OUTBOX] could not start the mail outbox: {e}")
+    if settings.RATE_LIMIT_BACKEND == "db":
+        try:
+            async with db_connection() as db:
+                await run_in_db(ratelimit.ensure_table, db)
+                await run_in_db(ratelimit.purge, db)
+        except Exception as e:
+            print(f"[RATELIMIT] could not prepare the rate bucket table: {e}")
+    if session_sweeper is not None:
+        if settings.SESSION_BACKEND == "db":
+            try:
+                async with db_connection() as db:
+                    await run_in_db(sessions.ensure_table, db)
+            except Exception as e:
+                print(f"[SESSIONS] could not create the session table: {e}")
+        await session_sweeper.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    if session_sweeper is not None:
+        await session_sweeper.stop()
+    await outbox.outbox_runner.stop()
+    await worker_id_lease.stop()
+    await mailer.stop()
+    get_pool().dispose()
+    shutdown_executor()
+
+@app.get("/_db/pool")
+def _db_pool():
+    return pool_stats()
+
+@app.get("/_cache/stats")
+def _cache_stats():
+    return cache_stats()
+
+@app.get("/_cache/pages")
+def _page_cache_stats():
+    return userdash_cache.stats()
+
+@app.get("/_cache/flights")
+def _flight_stats():
+    return service_flights.stats()
+
+@app.get("/_sessions/stats")
+def _session_stats():
+    return session_store.stats() if session_store is not None else {"backend": "cookie"}
+
+@app.get("/_ratelimit/stats")
+def _ratelimit_stats():
+    return limiter.stats()
+
+@app.get("/_templates/stats")
+def _template_stats():
+    return template_stats()
+
+@app.post("/_settings/reload")
+def _settings_reload(request: Request):
+    """Re-read the environment and .env; returns the names (not values) that changed. Admins only."""
+    if not request.session.get("user_email"):
+        raise HTTPException(status_code=403, detail="Admin login required")
+    try:
+        changed = reload_settings()
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    return {"ok": True, "changed": changed}
 
 @app.get("/healthz")
 def healthz():
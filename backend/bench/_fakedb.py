@@ -0,0 +1,153 @@
+# bench/_fakedb.py
+"""In-memory stand-in for a mysql.connector connection, used by the benchmarks and tests."""
+from __future__ import annotations
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+
+def make_restaurants(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    tags = ["asian", "western", "khmer", "japanese", "korean", "pub", "club", "bar"]
+    return [
+        {
+            "id": i,
+            "name": f"Restaurant {i:06d}",
+            "description": f"Place number {i}",
+            "ratings": round(rnd.uniform(0, 5), 1),
+            "price_range": rnd.randint(1, 4),
+            "tag": rnd.choice(tags),
+            "latitude": 11.55 + rnd.uniform(-0.2, 0.2),
+            "longitude": 104.92 + rnd.uniform(-0.2, 0.2),
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+class FakeCursor:
+    def __init__(self, conn: "FakeConnection", dictionary: bool):
+        self._conn = conn
+        self._rows: List[Any] = []
+        self.rowcount = 0
+        self.lastrowid: Optional[int] = None
+
+    def execute(self, sql: str, params: Any = None) -> None:
+        self._conn.queries += 1
+        if self._conn.latency:
+            time.sleep(self._conn.latency)
+        s = " ".join(sql.split()).lower()
+        if "from newestone.restaurants" in s and "group by" not in s:
+            self._rows = list(self._conn.restaurants)
+        else:
+            self._rows = []
+        self.rowcount = len(self._rows)
+
+    def fetchall(self) -> List[Any]:
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self) -> Any:
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self) -> None:
+        pass
+
+
+class FakeConnection:
+    in_transaction = False
+
+    def __init__(self, restaurants: List[Dict[str, Any]], latency: float = 0.0):
+        self.restaurants = restaurants
+        self.latency = latency
+        self.queries = 0
+
+    def cursor(self, dictionary: bool = False) -> FakeCursor:
+        return FakeCursor(self, dictionary)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class FakeBookingCursor:
+    """Understands the statements the booking paths issue: idempotency claims, slot counters, booking inserts."""
+
+    def __init__(self, conn: "FakeBookingConnection"):
+        self._conn = conn
+        self._rows: List[Any] = []
+        self.rowcount = 0
+
+    def execute(self, sql: str, params: Any = ()) -> None:
+        conn = self._conn
+        conn.queries += 1
+        s = " ".join(sql.split()).lower()
+        self._rows, self.rowcount = [], 0
+        if s.startswith("insert ignore into newestone.idempotency_keys"):
+            key = (params[0], params[1])
+            if key not in conn.idempotency:
+                conn.idempotency[key] = (params[2], params[3])
+                conn.undo.append(lambda: conn.idempotency.pop(key, None))
+                self.rowcount = 1
+        elif s.startswith("select order_id, fingerprint from newestone.idempotency_keys"):
+            claimed = conn.idempotency.get((params[0], params[1]))
+            self._rows = [claimed] if claimed is not None else []
+        elif s.startswith("insert ignore into newestone.booking_slots"):
+            key = (params[0], params[1])
+            if key not in conn.slots:
+                conn.slots[key] = [params[2], 0]
+                conn.undo.append(lambda: conn.slots.pop(key, None))
+                self.rowcount = 1
+        elif s.startswith("update newestone.booking_slots set reserved = reserved +"):
+            guests, key = params[0], (params[1], params[2])
+            slot = conn.slots[key]
+            if "<= capacity" in s and slot[1] + guests > slot[0]:
+                return
+            slot[1] += guests
+            conn.undo.append(lambda: slot.__setitem__(1, slot[1] - guests))
+            self.rowcount = 1
+        elif s.startswith("insert into newestone.bookings"):
+            conn.bookings.append(tuple(params))
+            conn.undo.append(conn.bookings.pop)
+            self.rowcount = 1
+        # Anything else (rollups, slot holds, config lookups) reads nothing and changes nothing here
+
+    def fetchone(self) -> Any:
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self) -> List[Any]:
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self) -> None:
+        pass
+
+
+class FakeBookingConnection:
+    """Single-threaded stand-in with real commit/rollback for the booking insert paths."""
+
+    in_transaction = False
+
+    def __init__(self):
+        self.idempotency: Dict[Any, Any] = {}  # (scope, stored key) -> (order_id, fingerprint)
+        self.slots: Dict[Any, List[int]] = {}  # (restaurant_id, slot_start) -> [capacity, reserved]
+        self.bookings: List[Any] = []
+        self.undo: List[Any] = []
+        self.queries = 0
+
+    def cursor(self, dictionary: bool = False) -> FakeBookingCursor:
+        return FakeBookingCursor(self)
+
+    def commit(self) -> None:
+        self.undo = []
+
+    def rollback(self) -> None:
+        while self.undo:
+            self.undo.pop()()
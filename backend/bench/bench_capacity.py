@@ -0,0 +1,193 @@
+# bench/bench_capacity.py
+"""
+Concurrent booking verifications against slot capacity.
+
+    python -m bench.bench_capacity
+    python -m bench.bench_capacity --verifications 800 --threads 200 --seats 40
+
+Hundreds of threads run routes.public.booking._insert_booking for the
+same few slots at once, with random party sizes and a small delay inside
+each transaction to widen the race window. The stand-in connection below
+row-locks a slot counter from its UPDATE until commit or rollback, the
+way InnoDB does. Afterwards no slot may hold more guests than seats, and
+each slot's counter must equal the guests of the bookings that committed
+for it.
+
+The old code, which inserts with no capacity check, is run the same way
+for comparison.
+"""
+from __future__ import annotations
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots: Dict[Tuple[Any, Any], List[int]] = {}  # key -> [capacity, reserved]
+        self.row_locks: Dict[Tuple[Any, Any], threading.Lock] = {}
+        self.bookings: List[Tuple[Any, ...]] = []
+
+    def row_lock(self, key) -> threading.Lock:
+        with self.lock:
+            return self.row_locks.setdefault(key, threading.Lock())
+
+
+class _Cursor:
+    def __init__(self, conn: "_Connection"):
+        self._conn = conn
+        self._rows: List[Any] = []
+        self.rowcount = 0
+
+    def _lock(self, key) -> None:
+        if key not in self._conn.locked:
+            lock = self._conn.store.row_lock(key)
+            lock.acquire()
+            self._conn.locked[key] = lock
+
+    def execute(self, sql: str, params: Any = ()) -> None:
+        s = " ".join(sql.split()).lower()
+        store = self._conn.store
+        self._rows, self.rowcount = [], 0
+        if s.startswith("select seats"):
+            return  # no per-restaurant row: defaults apply
+        if s.startswith("insert ignore into newestone.booking_slots"):
+            with store.lock:
+                if (params[0], params[1]) not in store.slots:
+                    store.slots[(params[0], params[1])] = [params[2], 0]
+                    self.rowcount = 1
+        elif s.startswith("update newestone.booking_slots set reserved = reserved +"):
+            guests, key = params[0], (params[1], params[2])
+            self._lock(key)
+            time.sleep(self._conn.latency)
+            slot = store.slots[key]
+            if "<= capacity" in s and slot[1] + guests > slot[0]:
+                return
+            slot[1] += guests
+            self._conn.undo.append((key, guests))
+            self.rowcount = 1
+        elif s.startswith("insert into newestone.bookings"):
+            self._conn.pending.append(tuple(params))
+            self.rowcount = 1
+
+    def fetchone(self) -> Any:
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self) -> None:
+        pass
+
+
+class _Connection:
+    def __init__(self, store: _Store, latency: float):
+        self.store = store
+        self.latency = latency
+        self.locked: Dict[Any, threading.Lock] = {}
+        self.undo: List[Tuple[Any, int]] = []
+        self.pending: List[Tuple[Any, ...]] = []
+
+    def cursor(self, dictionary: bool = False) -> _Cursor:
+        return _Cursor(self)
+
+    def _end(self, keep: bool) -> None:
+        if keep:
+            with self.store.lock:
+                self.store.bookings.extend(self.pending)
+        else:
+            for key, guests in self.undo:
+                self.store.slots[key][1] -= guests
+        for lock in self.locked.values():
+            lock.release()
+        self.locked, self.undo, self.pending = {}, [], []
+
+    def commit(self) -> None:
+        self._end(True)
+
+    def rollback(self) -> None:
+        self._end(False)
+
+
+def _unchecked_insert(db, payload: Dict[str, Any], idem_key=None) -> str:
+    cur = db.cursor()
+    cur.execute(
+        "INSERT INTO newestone.bookings (order_id, restaurant_id, number_of_guests, booking_datetime, status) VALUES (%s, %s, %s, %s, %s)",
+        ("x", payload["restaurant_id"], int(payload["people"]), payload["booking_datetime"], "confirmed"),
+    )
+    db.commit()
+    return "x"
+
+
+def _run(insert, args, slots: List[str]) -> Tuple[_Store, int, int, float]:
+    from models import capacity
+
+    store = _Store()
+    rnd = random.Random(11)
+    plan = [
+        {"restaurant_id": 1, "people": rnd.randint(1, 6), "booking_datetime": rnd.choice(slots)}
+        for _ in range(args.verifications)
+    ]
+    barrier = threading.Barrier(min(args.threads, len(plan)))
+
+    def verify(i: int, payload: Dict[str, Any]) -> bool:
+        if i < barrier.parties:
+            barrier.wait()
+        try:
+            insert(_Connection(store, args.latency), payload, None)
+            return True
+        except capacity.SlotFullError:
+            return False
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(verify, range(len(plan)), plan))
+    took = time.perf_counter() - t0
+    return store, sum(results), len(results) - sum(results), took
+
+
+def _guests_by_slot(store: _Store, slot_of) -> Dict[Any, int]:
+    out: Dict[Any, int] = {}
+    for _, rid, people, when, _ in store.bookings:
+        key = slot_of(when)
+        out[key] = out.get(key, 0) + people
+    return out
+
+
+def main(args) -> None:
+    from config.settings import reload_settings
+    from models import booking_rollups, capacity
+    from routes.public import booking
+
+    reload_settings(reread_env_file=False, CAPACITY_DEFAULT_SEATS=args.seats)
+    booking_rollups.apply_booking = lambda *a, **k: None  # not what is measured here
+    cfg = capacity.default_config()
+    slots = [f"2030-06-01 {h}:{m:02d}:00" for h in (18, 19) for m in (0, 15)]
+    slot_of = lambda when: cfg.slot_of(capacity.parse_when(when))
+
+    print(f"{args.verifications} verifications, {args.threads} threads, {args.seats} seats per "
+          f"{cfg.slot_minutes}-minute slot, {len({slot_of(s) for s in slots})} slots")
+
+    store, ok, _, took = _run(_unchecked_insert, args, slots)
+    worst = max(_guests_by_slot(store, slot_of).values())
+    print(f"  without capacity   {ok} booked, fullest slot {worst}/{args.seats} guests, {took * 1000:.0f}ms")
+
+    store, ok, full, took = _run(booking._insert_booking, args, slots)
+    guests = _guests_by_slot(store, slot_of)
+    worst = max(guests.values()) if guests else 0
+    print(f"  with capacity      {ok} booked, {full} turned away, fullest slot {worst}/{args.seats} guests, {took * 1000:.0f}ms")
+    assert len(store.bookings) == ok
+    for (rid, slot), (cap, reserved) in store.slots.items():
+        assert reserved <= cap, f"slot {slot} overbooked: {reserved}/{cap}"
+        assert reserved == guests.get(slot, 0), f"slot {slot} counter {reserved} != booked guests {guests.get(slot, 0)}"
+    print("  no slot overbooked; counters match committed bookings")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--verifications", type=int, default=600)
+    ap.add_argument("--threads", type=int, default=200)
+    ap.add_argument("--seats", type=int, default=40)
+    ap.add_argument("--latency", type=float, default=0.001, help="seconds spent inside each transaction")
+    main(ap.parse_args())
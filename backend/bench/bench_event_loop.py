@@ -0,0 +1,95 @@
+# bench/bench_event_loop.py
+"""
+/healthz latency while /userdash is under load.
+
+Runs the app in-process against a fake connection whose queries sleep, so
+the numbers show whether slow DB work stalls the event loop. Compare:
+
+    python -m bench.bench_event_loop            # DB work on the DB executor
+    python -m bench.bench_event_loop --inline   # DB work run on the event loop (old behaviour)
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def _pct(samples, p):
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * p))] * 1000
+
+
+async def _probe(client: httpx.AsyncClient, seconds: float):
+    lat = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        t0 = time.perf_counter()
+        await client.get("/healthz")
+        lat.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.005)
+    return lat
+
+
+async def _load(client: httpx.AsyncClient, stop: asyncio.Event, done: list):
+    while not stop.is_set():
+        r = await client.get("/userdash")
+        r.raise_for_status()
+        done.append(1)
+        # In-process transport: without a real suspension point a fully
+        # blocking request would never hand the loop back to the prober.
+        await asyncio.sleep(0)
+
+
+async def main(args) -> None:
+    from app import app
+    from models.database import get_db_connection
+    from bench._fakedb import FakeConnection, make_restaurants
+
+    rows = make_restaurants(args.restaurants)
+
+    async def fake_db():
+        yield FakeConnection(rows, latency=args.query_ms / 1000)
+
+    app.dependency_overrides[get_db_connection] = fake_db
+
+    if args.inline:
+        import routes.public.userdb as userdb
+
+        async def inline(fn, *a, **kw):
+            return fn(*a, **kw)
+
+        userdb.run_in_db = inline
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await _probe(client, args.seconds)
+
+        stop, done = asyncio.Event(), []
+        t0 = time.perf_counter()
+        workers = [asyncio.create_task(_load(client, stop, done)) for _ in range(args.concurrency)]
+        loaded = await _probe(client, args.seconds)
+        stop.set()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - t0
+
+    mode = "inline" if args.inline else "executor"
+    print(f"mode={mode} restaurants={args.restaurants} query_ms={args.query_ms} concurrency={args.concurrency}")
+    for name, s in (("idle", idle), ("under load", loaded)):
+        print(
+            f"  /healthz {name:<10} n={len(s):<5} p50={_pct(s, .5):7.2f}ms "
+            f"p99={_pct(s, .99):7.2f}ms mean={statistics.mean(s) * 1000:7.2f}ms"
+        )
+    print(f"  /userdash completed: {len(done)} in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--restaurants", type=int, default=50)
+    ap.add_argument("--query-ms", type=float, default=2.0)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--inline", action="store_true")
+    asyncio.run(main(ap.parse_args()))
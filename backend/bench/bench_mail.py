@@ -0,0 +1,131 @@
+# bench/bench_mail.py
+"""
+Messages per second: per-message SMTP connections vs the pooled mail worker.
+
+    python -m bench.bench_mail
+    python -m bench.bench_mail --messages 400 --handshake-ms 80 --rtt-ms 2
+
+Runs a local fake SMTP server that waits `handshake-ms` before its
+greeting (standing in for TCP + STARTTLS + AUTH to a real provider) and
+`rtt-ms` before every reply. The old path opens, greets, sends and quits
+once per message, `--threads` at a time (what BackgroundTasks did); the
+new path enqueues everything on a MailWorker whose pool keeps
+`--threads` sessions open.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import smtplib
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        time.sleep(self.server.rtt)
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self) -> None:
+        self.server.connections += 1
+        time.sleep(self.server.handshake)
+        self._reply("220 fake ESMTP")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            cmd = raw.decode("ascii", "replace").strip().upper()
+            if cmd.startswith("EHLO"):
+                self._reply("250-fake\r\n250 8BITMIME")
+            elif cmd.startswith("HELO"):
+                self._reply("250 fake")
+            elif cmd.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self._reply("250 OK")
+            elif cmd == "DATA":
+                self._reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                self._reply("250 queued")
+            elif cmd == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("502 not implemented")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake: float, rtt: float):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.handshake = handshake
+        self.rtt = rtt
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.connections = 0
+
+    def reset(self) -> None:
+        self.messages = self.connections = 0
+
+
+def _per_message(port: int, n: int, threads: int) -> float:
+    from utils.mailer import build_message
+
+    def send(i: int) -> None:
+        msg = build_message("bench@example.com", f"user{i}@example.com", "Your code", f"Code {i:06d}")
+        with smtplib.SMTP("127.0.0.1", port, timeout=20) as s:
+            s.ehlo()
+            s.send_message(msg)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(send, range(n)))
+    return time.perf_counter() - t0
+
+
+async def _pooled(port: int, n: int, threads: int, batch: int) -> Tuple[float, dict]:
+    from utils.mailer import MailWorker, SMTPConfig, SMTPPool
+
+    cfg = SMTPConfig(host="127.0.0.1", port=port, security="none", user="", password="", sender="bench@example.com")
+    worker = MailWorker(SMTPPool(cfg, size=threads), maxsize=n, concurrency=threads, batch=batch)
+    await worker.start()
+    t0 = time.perf_counter()
+    for i in range(n):
+        assert worker.enqueue(f"user{i}@example.com", "Your code", f"Code {i:06d}")
+    await worker._queue.join()
+    took = time.perf_counter() - t0
+    stats = worker.pool.stats()
+    await worker.stop()
+    return took, stats
+
+
+def main(args) -> None:
+    server = FakeSMTPServer(args.handshake_ms / 1000, args.rtt_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    print(f"{args.messages} messages, {args.threads} senders, handshake {args.handshake_ms}ms, rtt {args.rtt_ms}ms")
+
+    took = _per_message(port, args.messages, args.threads)
+    assert server.messages == args.messages
+    print(f"  connect per message  {args.messages / took:8.1f} msg/s  ({server.connections} connections, {took:.2f}s)")
+
+    server.reset()
+    took, stats = asyncio.run(_pooled(port, args.messages, args.threads, args.batch))
+    assert server.messages == args.messages, (server.messages, stats)
+    print(f"  pooled worker        {args.messages / took:8.1f} msg/s  ({server.connections} connections, {took:.2f}s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=300)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--batch", type=int, default=20)
+    ap.add_argument("--handshake-ms", type=float, default=60.0)
+    ap.add_argument("--rtt-ms", type=float, default=1.0)
+    main(ap.parse_args())
@@ -0,0 +1,86 @@
+# bench/bench_memory.py
+"""
+Memory held by a cached catalog of N restaurants, per representation.
+
+    python -m bench.bench_memory                 # 100k restaurants
+    python -m bench.bench_memory --restaurants 20000
+
+Measured with tracemalloc, so the numbers are Python heap bytes (what a
+worker's catalog cache actually keeps alive), not process RSS.
+"""
+from __future__ import annotations
+import argparse
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Tuple
+
+
+def _measure(build: Callable[[], Any]) -> Tuple[Any, int, float]:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size, elapsed * 1000
+
+
+def _time(fn: Callable[[], Any], repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(args) -> None:
+    from bench._fakedb import make_restaurants
+    from models.catalog import RestaurantTable
+    from routes.public.userdb import ALLOWED_TAGS, CatalogSnapshot, RestaurantRepository
+    from utils.facets import FacetIndex
+
+    n = args.restaurants
+    rows = make_restaurants(n)
+    repo = RestaurantRepository(db=None)
+
+    restaurants, entities, t_entities = _measure(lambda: [repo._row_to_restaurant(r) for r in rows])
+    _, dicts, t_dicts = _measure(lambda: [r.to_dict() for r in restaurants])
+    table, columns, t_table = _measure(lambda: RestaurantTable(restaurants, ALLOWED_TAGS))
+
+    print(f"restaurants={n}")
+    for name, size, ms in (
+        ("entities (slots)", entities, t_entities),
+        ("to_dict() copies", dicts, t_dicts),
+        ("RestaurantTable columns", columns, t_table),
+    ):
+        print(f"  {name:<26} {size / 2**20:8.1f} MiB  {size / n:6.0f} B/row  build {ms:7.1f}ms")
+    print(f"  column payload             {table.nbytes() / 2**20:8.1f} MiB")
+
+    snap = CatalogSnapshot(restaurants)
+    snap._table = table
+    by_objects = lambda: FacetIndex(
+        snap.restaurants,
+        {"tag": lambda r: r.tag, "price_range": lambda r: r.price_range, "rating": lambda r: int(r.ratings)},
+    )
+    by_columns = lambda: FacetIndex.from_columns(
+        snap.restaurants,
+        {
+            "tag": map(table.tags.__getitem__, table.tag_code),
+            "price_range": (p or None for p in table.price_range),
+            "rating": map(int, table.ratings),
+        },
+    )
+    assert by_objects().bitsets == by_columns().bitsets
+    print(f"  facet build from objects  {_time(by_objects, 3):8.1f}ms")
+    print(f"  facet build from columns  {_time(by_columns, 3):8.1f}ms")
+    print(f"  ratings >= 4 over objects {_time(lambda: sum(1 for r in restaurants if r.ratings >= 4)):8.1f}ms")
+    print(f"  ratings >= 4 over columns {_time(lambda: sum(1 for v in table.ratings if v >= 4)):8.1f}ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--restaurants", type=int, default=100000)
+    main(ap.parse_args())
@@ -0,0 +1,183 @@
+# bench/bench_order_ids.py
+"""
+Order id generation and idempotent booking inserts under concurrency.
+
+    python -m bench.bench_order_ids
+    python -m bench.bench_order_ids --threads 32 --processes 4 --ids 50000
+
+1. Every thread of every process takes ids from its process's generator;
+   all ids must be distinct and each thread must see them strictly
+   increasing. The old NB{ts}{random 100-999} scheme is run the same way
+   for comparison.
+2. Many threads submit bookings through routes.public.userdb._insert_booking
+   in parallel, a share of them retrying the same idempotency key. The
+   stand-in connection below locks a claimed key until its transaction
+   ends, the way InnoDB does, so exactly one row per key must come out.
+"""
+from __future__ import annotations
+import argparse
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+
+def _old_order_id() -> str:
+    return f"NB{int(time.time())}{random.randint(100, 999)}"
+
+
+def _take(gen_fn, threads: int, per_thread: int) -> Tuple[List[str], bool]:
+    def run(_):
+        ids = [gen_fn() for _ in range(per_thread)]
+        return ids, all(a < b for a, b in zip(ids, ids[1:]))
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(run, range(threads)))
+    return [i for ids, _ in results for i in ids], all(ok for _, ok in results)
+
+
+def _process_ids(args: Tuple[int, int, int]) -> Tuple[List[str], bool]:
+    worker_id, threads, per_thread = args
+    from utils.ids import IdGenerator
+
+    gen = IdGenerator(worker_id, prefix="NB")
+    return _take(gen.next_id, threads, per_thread)
+
+
+class _Store:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+        self.key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self.bookings: List[Tuple[Any, ...]] = []
+
+
+class _Cursor:
+    def __init__(self, conn: "_Connection"):
+        self._conn = conn
+        self._rows: List[Any] = []
+        self.rowcount = 0
+
+    def execute(self, sql: str, params: Any = ()) -> None:
+        s = " ".join(sql.split()).lower()
+        store = self._conn.store
+        self._rows, self.rowcount = [], 0
+        if s.startswith("insert ignore into newestone.idempotency_keys"):
+            key = (params[0], params[1])
+            with store.lock:
+                lock = store.key_locks.setdefault(key, threading.Lock())
+            lock.acquire()  # a racing claim waits for the owner's commit or rollback
+            if key in store.keys:
+                lock.release()
+            else:
+                self._conn.held.append((key, lock, (params[2], params[3])))
+                self.rowcount = 1
+        elif s.startswith("select order_id, fingerprint from newestone.idempotency_keys"):
+            with store.lock:
+                found = store.keys.get((params[0], params[1]))
+            self._rows = [found] if found else []
+        elif s.startswith("insert into newestone.bookings"):
+            self._conn.pending.append(tuple(params))
+            self.rowcount = 1
+
+    def fetchone(self) -> Any:
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self) -> None:
+        pass
+
+
+class _Connection:
+    def __init__(self, store: _Store):
+        self.store = store
+        self.held: List[Tuple[Tuple[str, str], threading.Lock, Tuple[str, Any]]] = []
+        self.pending: List[Tuple[Any, ...]] = []
+
+    def cursor(self, dictionary: bool = False) -> _Cursor:
+        return _Cursor(self)
+
+    def _end(self, keep: bool) -> None:
+        with self.store.lock:
+            if keep:
+                self.store.bookings.extend(self.pending)
+                for key, _, claimed in self.held:
+                    self.store.keys[key] = claimed
+        for _, lock, _ in self.held:
+            lock.release()
+        self.held, self.pending = [], []
+
+    def commit(self) -> None:
+        self._end(True)
+
+    def rollback(self) -> None:
+        self._end(False)
+
+
+def _idempotent_inserts(threads: int, submissions: int, keys: int) -> None:
+    from routes.public import userdb
+    from models import booking_rollups, capacity
+    from utils.ids import order_ids
+
+    # Rollups and seat counting are not what is measured here
+    booking_rollups.apply_booking = lambda *a, **k: None
+    capacity.reserve = lambda *a, **k: True
+    store = _Store()
+    plan = [f"key-{random.randrange(keys)}" for _ in range(submissions)]
+
+    def submit(key: str):
+        conn = _Connection(store)
+        return userdb._insert_booking(conn, order_ids.next_id(), 1, 2, "2025-01-01 19:00:00", "pending", key)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(submit, plan))
+    took = time.perf_counter() - t0
+
+    created = sum(1 for _, c in results if c)
+    by_key: Dict[str, set] = {}
+    for key, (order_id, _) in zip(plan, results):
+        by_key.setdefault(key, set()).add(order_id)
+    order_col = [b[0] for b in store.bookings]
+    assert len(store.bookings) == len(by_key) == created, (len(store.bookings), len(by_key), created)
+    assert all(len(ids) == 1 for ids in by_key.values()), "a key resolved to more than one order id"
+    assert len(set(order_col)) == len(order_col), "duplicate order ids"
+    print(
+        f"  {submissions} submissions over {len(by_key)} keys, {threads} threads: "
+        f"{created} rows, {submissions - created} retries deduplicated, {took * 1000:.0f}ms"
+    )
+
+
+def main(args) -> None:
+    per_thread = max(1, args.ids // args.threads)
+    print(f"order ids: {args.processes} processes x {args.threads} threads x {per_thread} ids")
+
+    for name, fn in (("old NB{ts}{rand}", _old_order_id),):
+        t0 = time.perf_counter()
+        ids, _ = _take(fn, args.threads, per_thread)
+        took = time.perf_counter() - t0
+        print(f"  {name:18s} {len(ids)} ids, {len(ids) - len(set(ids))} collisions, {took * 1000:.0f}ms")
+
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        results = pool.map(_process_ids, [(w, args.threads, per_thread) for w in range(args.processes)])
+    took = time.perf_counter() - t0
+    ids = [i for part, _ in results for i in part]
+    ordered = all(ok for _, ok in results)
+    print(f"  {'snowflake':18s} {len(ids)} ids, {len(ids) - len(set(ids))} collisions, "
+          f"per-thread ordered={ordered}, {took * 1000:.0f}ms")
+    assert len(ids) == len(set(ids)) and ordered
+
+    print("idempotent inserts:")
+    _idempotent_inserts(args.threads, args.submissions, args.keys)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=16)
+    ap.add_argument("--processes", type=int, default=4)
+    ap.add_argument("--ids", type=int, default=40000, help="ids per process")
+    ap.add_argument("--submissions", type=int, default=5000)
+    ap.add_argument("--keys", type=int, default=1500)
+    main(ap.parse_args())
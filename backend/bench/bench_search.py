@@ -0,0 +1,115 @@
+# bench/bench_search.py
+"""
+Server-side cost of /search, /search/suggest and /menu/search over a
+synthetic catalog.
+
+    python -m bench.bench_search --restaurants 50000 --menu-items 300000
+"""
+from __future__ import annotations
+import argparse
+import random
+import statistics
+import time
+
+WORDS = [
+    "golden", "lotus", "angkor", "mekong", "spicy", "noodle", "ramen", "sushi", "grill", "garden",
+    "bamboo", "river", "night", "market", "street", "kitchen", "house", "tavern", "bistro", "corner",
+    "dragon", "phoenix", "smoky", "urban", "royal", "happy", "little", "seoul", "tokyo", "saigon",
+]
+
+
+def _catalog(n: int, seed: int = 11):
+    from bench._fakedb import make_restaurants
+    from routes.public.userdb import RestaurantRepository, CatalogSnapshot
+
+    rnd = random.Random(seed)
+    rows = make_restaurants(n, seed)
+    for row in rows:
+        row["name"] = " ".join(rnd.sample(WORDS, 2)).title() + f" {row['id']}"
+        row["description"] = " ".join(rnd.sample(WORDS, 5))
+    repo = RestaurantRepository(db=None)
+    return CatalogSnapshot([repo._row_to_restaurant(r) for r in rows])
+
+
+DISHES = ["ramen", "pho", "fried rice", "sushi roll", "curry", "lok lak", "amok", "bibimbap", "burger", "pizza"]
+
+
+def _menu(n: int, restaurants: int, seed: int = 13):
+    from routes.public.userdb import MenuItem, MenuSnapshot
+
+    rnd = random.Random(seed)
+    items = [
+        MenuItem(
+            i,
+            f"{rnd.choice(WORDS)} {rnd.choice(DISHES)}".title(),
+            " ".join(rnd.sample(WORDS, 4)),
+            round(rnd.uniform(1, 30), 2),
+            None,
+            rnd.randint(1, restaurants),
+        )
+        for i in range(1, n + 1)
+    ]
+    return MenuSnapshot(items)
+
+
+def _time(fn, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for q in queries:
+            t0 = time.perf_counter()
+            fn(q)
+            samples.append(time.perf_counter() - t0)
+    s = sorted(samples)
+    return s[len(s) // 2] * 1000, s[int(len(s) * .99)] * 1000, statistics.mean(s) * 1000
+
+
+def main(args) -> None:
+    snap = _catalog(args.restaurants)
+    t0 = time.perf_counter()
+    index = snap.search
+    t1 = time.perf_counter()
+    names = snap.names
+    t2 = time.perf_counter()
+    print(
+        f"restaurants={args.restaurants} build: search index={(t1 - t0) * 1000:.0f}ms "
+        f"name index={(t2 - t1) * 1000:.0f}ms"
+    )
+
+    keystrokes = []
+    for word in ("golden lotus", "ramen", "angkor grill", "seoul", "river kitchen"):
+        keystrokes += [word[:i] for i in range(1, len(word) + 1)]
+    typos = ["raemn", "golden lotsu", "angkr", "sushy bistro", "khmre"]
+    full = ["ramen", "golden lotus", "bar", "river kitchen", "noodle"]
+
+    needle = "ramen"
+    naive = lambda q: [r for r in snap.restaurants if q in r.name.lower()]
+    for name, fn, qs in (
+        ("suggest (per keystroke)", lambda q: names.suggest(q, limit=8), keystrokes),
+        ("search", index.search, full),
+        ("search, top 50", lambda q: index.search(q, limit=50), full),
+        ("search with typos", index.search, typos),
+        ("substring scan (old)", naive, [needle]),
+    ):
+        p50, p99, mean = _time(fn, qs, args.repeat)
+        print(f"  {name:<24} n={len(qs) * args.repeat:<5} p50={p50:7.3f}ms p99={p99:7.3f}ms mean={mean:7.3f}ms")
+    print("  'raemn' ->", [r.name for r, _ in index.search("raemn", limit=3)])
+
+    t0 = time.perf_counter()
+    menu = _menu(args.menu_items, args.restaurants)
+    print(f"menu items={args.menu_items} index build={(time.perf_counter() - t0) * 1000:.0f}ms")
+    scan = lambda q: [m for m in menu.items if q in m.item_name.lower() and m.price <= 8]
+    for name, fn, qs in (
+        ("dish + max_price", lambda q: menu.search(q, max_price=8), ["amok", "spicy ramen", "lok lak", "bibimbap"]),
+        ("max_price only", lambda q: menu.search("", max_price=q), [2.0, 5.0]),
+        ("substring scan", scan, ["amok"]),
+    ):
+        p50, p99, mean = _time(fn, qs, args.repeat)
+        print(f"  {name:<24} n={len(qs) * args.repeat:<5} p50={p50:7.3f}ms p99={p99:7.3f}ms mean={mean:7.3f}ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--restaurants", type=int, default=50000)
+    ap.add_argument("--menu-items", type=int, default=300000)
+    ap.add_argument("--repeat", type=int, default=5)
+    main(ap.parse_args())
@@ -0,0 +1,130 @@
+# bench/bench_sessions.py
+"""
+Session middleware overhead and cookie size on the booking flow.
+
+    python -m bench.bench_sessions
+    python -m bench.bench_sessions --flows 5000 --browses 4
+
+Replays the session traffic of one booking per flow straight through the
+ASGI stack: POST /booking/start stores the pending booking, idempotency
+key and OTP; GET /booking/confirm reads them (plus `--browses` more page
+views carrying the cookie); POST /booking/verify clears them. The
+endpoints do nothing else, so the timings are the middleware's own cost
+per request. Run once with Starlette's signed-cookie SessionMiddleware
+(the old setup) and once with ServerSessionMiddleware on the memory
+store.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import time
+import uuid
+from http.cookies import SimpleCookie
+from typing import Any, Dict, List, Tuple
+
+from starlette.middleware.sessions import SessionMiddleware
+
+
+async def _endpoint(scope, receive, send) -> None:
+    session = scope["session"]
+    path = scope["path"]
+    if path == "/booking/start":
+        session["pending_booking"] = {
+            "email": "someone.with.a.long.address@example.com",
+            "restaurant_id": "42",
+            "people": 4,
+            "booking_datetime": "2030-06-01 19:30:00",
+            "idempotency_key": uuid.uuid4().hex,
+        }
+        session["booking_otp"] = "123456"
+        session["booking_otp_exp"] = int(time.time()) + 300
+    elif path == "/booking/verify":
+        for k in ("pending_booking", "booking_otp", "booking_otp_exp"):
+            session.pop(k, None)
+    else:
+        session.get("pending_booking")
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _receive() -> Dict[str, Any]:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+class _Browser:
+    def __init__(self, app, name: str):
+        self.app = app
+        self.name = name
+        self.jar: Dict[str, str] = {}
+        self.sent_bytes = 0
+        self.set_bytes = 0
+        self.requests = 0
+
+    async def request(self, method: str, path: str) -> None:
+        headers: List[Tuple[bytes, bytes]] = []
+        if self.jar:
+            cookie = "; ".join(f"{k}={v}" for k, v in self.jar.items())
+            headers.append((b"cookie", cookie.encode("latin-1")))
+            self.sent_bytes += len(cookie)
+        scope = {"type": "http", "method": method, "path": path, "headers": headers, "query_string": b""}
+        start: Dict[str, Any] = {}
+
+        async def send(message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+
+        await self.app(scope, _receive, send)
+        self.requests += 1
+        for name, value in start.get("headers", []):
+            if name == b"set-cookie":
+                self.set_bytes += len(value)
+                morsel = SimpleCookie(value.decode("latin-1"))[self.name]
+                if morsel["max-age"] == "0":
+                    self.jar.pop(self.name, None)
+                else:
+                    self.jar[self.name] = morsel.value
+
+
+async def _flows(app, args) -> Tuple[float, _Browser]:
+    browser = _Browser(app, "nb_session")
+    t0 = time.perf_counter()
+    for _ in range(args.flows):
+        await browser.request("POST", "/booking/start")
+        for _ in range(1 + args.browses):
+            await browser.request("GET", "/booking/confirm")
+        await browser.request("POST", "/booking/verify")
+    return time.perf_counter() - t0, browser
+
+
+def _report(label: str, took: float, browser: _Browser, flows: int) -> None:
+    print(
+        f"  {label:<22} {took / browser.requests * 1e6:7.1f} us/request   "
+        f"cookie sent {browser.sent_bytes / flows:6.0f} B/flow   "
+        f"set-cookie {browser.set_bytes / flows:6.0f} B/flow"
+    )
+
+
+def main(args) -> None:
+    from utils.sessions import MemorySessionStore, ServerSessionMiddleware
+
+    per_flow = 3 + args.browses
+    print(f"{args.flows} booking flows, {per_flow} requests each")
+
+    signed = SessionMiddleware(_endpoint, secret_key="x" * 43, session_cookie="nb_session")
+    took, browser = asyncio.run(_flows(signed, args))
+    _report("signed cookie", took, browser, args.flows)
+
+    store = MemorySessionStore(maxsize=args.flows)
+    server = ServerSessionMiddleware(_endpoint, store=store, session_cookie="nb_session", max_age=86400)
+    took, browser = asyncio.run(_flows(server, args))
+    _report("server-side (memory)", took, browser, args.flows)
+    stats = store.stats()
+    assert stats["sessions"] == 0, stats  # every verify emptied and deleted its session
+    print(f"  store: {stats['reads']} reads, {stats['writes']} writes, {stats['deletes']} deletes")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--flows", type=int, default=3000)
+    ap.add_argument("--browses", type=int, default=3, help="extra page views per flow while the booking is pending")
+    main(ap.parse_args())
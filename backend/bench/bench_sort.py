@@ -0,0 +1,99 @@
+# bench/bench_sort.py
+"""
+The old O(n^2) bubble_sort against utils.sorting on dashboard-shaped rows.
+
+    python -m bench.bench_sort                      # 1k / 10k / 100k rows
+    python -m bench.bench_sort --bubble-max 10000   # actually run bubble sort up to 10k
+
+Bubble sort is only run up to --bubble-max rows; above that its time is
+extrapolated from the largest measured size (it grows with n^2).
+"""
+from __future__ import annotations
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from utils.sorting import SortKey, SortSpec
+
+
+def legacy_bubble_sort(items: List[Dict[str, Any]], key: str, reverse: bool = False) -> List[Dict[str, Any]]:
+    """routes/public/userdb.bubble_sort as it was before the sort engine."""
+    n = len(items)
+    while True:
+        swapped = False
+        for i in range(1, n):
+            a = items[i-1].get(key, None)
+            b = items[i].get(key, None)
+            if a is None: a = float("inf") if not reverse else float("-inf")
+            if b is None: b = float("inf") if not reverse else float("-inf")
+            if (a < b) if reverse else (a > b):
+                items[i-1], items[i] = items[i], items[i-1]
+                swapped = True
+        n -= 1
+        if not swapped or n <= 1:
+            break
+    return items
+
+
+def _rows(n: int, seed: int = 3) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "name": f"restaurant {rnd.randrange(n):07d}",
+            "ratings": round(rnd.uniform(0, 5), 1),
+            "price_range": rnd.choice([1, 2, 3, 4, None]),
+            "distance_km": round(rnd.uniform(0, 30), 3) if rnd.random() > 0.1 else None,
+            "popularity": rnd.randrange(500),
+        }
+        for i in range(n)
+    ]
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(args) -> None:
+    single = SortSpec([SortKey("distance_km")])
+    composite = SortSpec.parse("distance_km,-ratings,price_range:nulls_first,name,id", [
+        "distance_km", "ratings", "price_range", "name", "id",
+    ])
+    print(f"{'rows':>7} {'bubble_sort':>14} {'sort 1 key':>11} {'sort 5 keys':>12} {'top-' + str(args.k) + ' 5 keys':>13}")
+    measured = None
+    for n in args.sizes:
+        rows = _rows(n)
+        if n <= args.bubble_max:
+            bubble = _time(lambda: legacy_bubble_sort(list(rows), "distance_km"), 1)
+            measured = (n, bubble)
+            bubble_s = f"{bubble:11.1f}ms"
+        elif measured:
+            m, t = measured
+            bubble_s = f"~{t * (n / m) ** 2:.0f}ms"
+        else:
+            bubble_s = f"{'skipped':>13}"
+        repeat = 3 if n <= 10000 else 1
+        one = _time(lambda: single.sort(rows), repeat)
+        many = _time(lambda: composite.sort(rows), repeat)
+        top = _time(lambda: composite.top(rows, args.k), repeat)
+        print(f"{n:>7} {bubble_s:>14} {one:9.1f}ms {many:10.1f}ms {top:11.1f}ms")
+
+    # Same order as the old helper on its own single-key case.
+    rows = _rows(2000)
+    assert [r["id"] for r in legacy_bubble_sort(list(rows), "distance_km")] == [r["id"] for r in single.sort(rows)]
+    assert composite.sort(rows) == sorted(rows, key=composite.key) and composite.top(rows, args.k) == composite.sort(rows)[:args.k]
+    print("single-key order matches bubble_sort; sort, top and the composite key agree")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--bubble-max", type=int, default=5000)
+    ap.add_argument("-k", type=int, default=24)
+    main(ap.parse_args())
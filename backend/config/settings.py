@@ -1,13 +1,363 @@
-from dotenv import load_dotenv
+# config/settings.py
+"""
+Application settings, read from the environment (and one .env file) once.
+
+`settings` always points at the current immutable Settings snapshot; code
+reads `settings.DB_POOL_SIZE` etc. and never touches os.environ or the
+.env file itself. `reload_settings()` re-reads both, validates, and swaps
+the snapshot in one step. Values that sized something at startup (the DB
+pool and executor, thread pools) still need a restart to change.
+"""
+from __future__ import annotations
 import os
+import re
+import threading
+from dataclasses import dataclass, fields
+from datetime import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from dotenv import load_dotenv
+
+# Same shape utils/ratelimit.parse_rate accepts: "10/minute", "3/15m"
+_RATE_SPEC = re.compile(r"^\d+\s*/\s*(\d*(\.\d+)?)\s*(s|sec|second|m|min|minute|h|hr|hour|d|day)s?$")
+
+DEFAULT_ENV_PATH = "/Users/cheapanharith/developer/OOPproject/password.env"
+
+
+def _env_file_candidates() -> List[Path]:
+    here = Path(__file__).resolve().parent  # backend/config
+    candidates = [Path(os.getenv("ENV_FILE", DEFAULT_ENV_PATH)).expanduser()]
+    candidates += [here.parent / ".env", here.parents[1] / ".env", Path.cwd() / ".env"]
+    candidates += [up / ".env" for up in list(here.parents)[2:6]]
+    return list(dict.fromkeys(candidates))
+
+
+def load_env_file() -> Optional[Path]:
+    """Load the first .env found (ENV_FILE first); returns its path, or None."""
+    tried = []
+    for p in _env_file_candidates():
+        tried.append(str(p))
+        try:
+            if p.exists():
+                load_dotenv(dotenv_path=p, override=True)
+                print(f"[ENV] Loaded {p}")
+                return p
+        except OSError:
+            pass
+    print(f"[ENV] .env not found. Tried: {tried}")
+    return None
+
+
+_TRUE = ("1", "true", "yes", "on")
+
 
-load_dotenv()
+def _cast(kind: str, name: str, raw: str) -> Any:
+    raw = raw.strip()
+    try:
+        if kind == "bool":
+            return raw.lower() in _TRUE
+        if kind in ("int", "Optional[int]"):
+            return int(raw)
+        if kind == "float":
+            return float(raw)
+        return raw
+    except ValueError:
+        raise ValueError(f"{name}={raw!r} is not a valid {kind}") from None
 
+
+@dataclass(frozen=True)
 class Settings:
-    DB_HOST = os.getenv("DB_HOST")
-    DB_USER = os.getenv("DB_USER")
-    DB_PASSWORD = os.getenv("DB_PASSWORD")
-    DB_NAME = os.getenv("DB_NAME")
-    UPLOAD_FOLDER = "../frontend/static/uploads"
+    DB_HOST: Optional[str] = None
+    DB_USER: Optional[str] = None
+    DB_PASSWORD: Optional[str] = None
+    DB_NAME: Optional[str] = None
+    UPLOAD_FOLDER: str = "../frontend/static/uploads"
+
+    # Connection pool (see models/database.py)
+    DB_POOL_SIZE: int = 10
+    DB_POOL_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Only ping connections that sat idle longer than this many seconds
+    DB_POOL_PING_AFTER: float = 10.0
+    # Threads running blocking DB calls for async routes; defaults to pool capacity
+    DB_EXECUTOR_WORKERS: Optional[int] = None
+
+    # Sessions and CORS (see app.py). Without SECRET_KEY an ephemeral key is
+    # generated, which logs everyone out on restart.
+    SECRET_KEY: Optional[str] = None
+    SESSION_COOKIE: str = "nb_session"
+    SESSION_MAX_AGE: int = 60 * 60 * 24
+    SESSION_SAME_SITE: str = "lax"
+    SESSION_HTTPS_ONLY: bool = False
+    # Where session data lives (see utils/sessions.py): "cookie" (the whole
+    # session signed into the cookie), "db" (newestone.web_sessions, shared
+    # by every worker) or "memory" (one process only: lost on restart and
+    # not seen by other uvicorn workers)
+    SESSION_BACKEND: str = "cookie"
+    SESSION_MEMORY_MAX_ENTRIES: int = 10000
+    # Seconds between sweeps of expired server-side sessions
+    SESSION_SWEEP_INTERVAL: float = 300.0
+    CORS_ALLOW_ORIGINS: str = "http://localhost:5173,http://127.0.0.1:5173"
+
+    # OTP codes in the server log / on the confirm page, for local development
+    PRINT_OTP: bool = True
+    DEBUG_SHOW_OTP: bool = False
+
+    # Seconds before the in-process geo index is reloaded from the DB, so
+    # writes made through other workers become visible
+    GEO_INDEX_MAX_AGE: int = 300
+
+    # In-process catalog cache (see models/catalog.py)
+    CATALOG_CACHE_TTL: float = 60.0
+    CATALOG_CACHE_MAX_ENTRIES: int = 4096
+
+    # Keyset pagination for listings (?limit=&after=)
+    PAGE_SIZE: int = 24
+    PAGE_SIZE_MAX: int = 100
+
+    # Cache-Control max-age (seconds) on /api/v1 responses; they always carry an ETag
+    API_MAX_AGE: int = 0
+
+    # Shared Jinja environment (see utils/templating.py). Leave auto-reload
+    # off in production; turn it on while editing templates locally.
+    TEMPLATES_AUTO_RELOAD: bool = False
+    # Compiled-template cache directory; empty means Jinja's per-user temp dir
+    TEMPLATES_BYTECODE_CACHE_DIR: str = ""
+    TEMPLATES_PRECOMPILE: bool = True
+    # Renders slower than this many milliseconds are logged
+    TEMPLATES_SLOW_MS: float = 50.0
+
+    # Rendered /userdash pages for anonymous filter combinations (see
+    # utils/page_cache.py): fresh for PAGE_CACHE_TTL seconds, then served
+    # stale for up to PAGE_CACHE_STALE_TTL while being re-rendered
+    PAGE_CACHE_TTL: float = 30.0
+    PAGE_CACHE_STALE_TTL: float = 300.0
+    PAGE_CACHE_MAX_ENTRIES: int = 512
+    # Re-render every tag x price x sort page in the background after a catalog write
+    PAGE_CACHE_PRERENDER: bool = False
+
+    # Worker id (0-1023) baked into booking order ids (see utils/ids.py). Each
+    # app process leases its own from newestone.worker_ids for
+    # WORKER_ID_LEASE seconds at a time (renewed while it runs), so any
+    # number of uvicorn workers and hosts get distinct ids. WORKER_ID is
+    # only the fallback while no lease is held; -1 derives one from the
+    # hostname and process id.
+    WORKER_ID: int = -1
+    WORKER_ID_LEASE: float = 60.0
+    # Idempotency keys are kept this many days before purge()
+    IDEMPOTENCY_KEY_DAYS: int = 7
+
+    # Seats and slots for restaurants without a row in newestone.restaurant_capacity
+    # (see models/capacity.py). Empty opening hours mean open all day.
+    CAPACITY_DEFAULT_SEATS: int = 40
+    CAPACITY_SLOT_MINUTES: int = 30
+    CAPACITY_OPENS: str = ""
+    CAPACITY_CLOSES: str = ""
+
+    # SMTP server (see utils/mailer.py). SMTP_SECURITY is starttls, ssl or
+    # none; when unset, the older SMTP_USE_SSL / SMTP_STARTTLS flags decide.
+    SMTP_HOST: str = "smtp.gmail.com"
+    SMTP_PORT: Optional[int] = None
+    SMTP_SECURITY: str = ""
+    SMTP_USE_SSL: bool = False
+    SMTP_STARTTLS: bool = True
+    SMTP_USER: str = ""
+    SMTP_PASS: str = ""
+    SMTP_FROM: str = ""
+    EMAIL_FROM: str = ""
+    SMTP_TIMEOUT: float = 20.0
+    SMTP_DEBUG: bool = False
+
+    # Outgoing mail (see utils/mailer.py): SMTP sessions kept open, queued
+    # messages, and how many queued messages one session sends per checkout
+    MAIL_POOL_SIZE: int = 2
+    MAIL_QUEUE_MAX: int = 1000
+    MAIL_BATCH: int = 20
+    # Idle sessions are probed with NOOP after this many seconds
+    MAIL_NOOP_AFTER: float = 30.0
+    MAIL_MAX_MESSAGES_PER_SESSION: int = 100
+
+    # Durable outbox (see models/outbox.py). MAIL_OUTBOX_INPROCESS=0 leaves
+    # delivery to separate `python -m models.outbox` workers.
+    MAIL_OUTBOX_INPROCESS: bool = True
+    MAIL_OUTBOX_BATCH: int = 50
+    MAIL_OUTBOX_POLL: float = 2.0
+    # Seconds a claimed message is reserved for its worker before another may retry it
+    MAIL_OUTBOX_LEASE: float = 120.0
+    MAIL_OUTBOX_MAX_ATTEMPTS: int = 6
+    # Retry n waits MAIL_OUTBOX_BACKOFF * 2^(n-1) seconds, at most MAIL_OUTBOX_BACKOFF_MAX
+    MAIL_OUTBOX_BACKOFF: float = 30.0
+    MAIL_OUTBOX_BACKOFF_MAX: float = 3600.0
+    MAIL_OUTBOX_KEEP_DAYS: int = 14
+
+    # Token-bucket rate limits (see utils/ratelimit.py), each "N/period"
+    # such as "10/minute" or "3/15m"; empty disables that bucket.
+    # RATE_LIMIT_BACKEND=db shares the buckets between uvicorn workers
+    # through newestone.rate_buckets instead of counting per process.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_MAX_BUCKETS: int = 100000
+    # Take the client address from X-Forwarded-For (only behind a proxy that sets it)
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    RATE_LIMIT_LOGIN_IP: str = "10/minute"
+    RATE_LIMIT_LOGIN_EMAIL: str = "5/15m"
+    RATE_LIMIT_BOOKING_IP: str = "20/minute"
+    RATE_LIMIT_BOOKING_SESSION: str = "5/minute"
+    # OTP emails per recipient, shared by /booking/start and /booking/resend
+    RATE_LIMIT_OTP_EMAIL: str = "5/hour"
+    RATE_LIMIT_SEARCH_IP: str = "60/minute"
+
+    def __post_init__(self):
+        if self.DB_EXECUTOR_WORKERS is None:
+            object.__setattr__(self, "DB_EXECUTOR_WORKERS", self.DB_POOL_SIZE + self.DB_POOL_MAX_OVERFLOW)
+        if self.SMTP_PORT is None:
+            object.__setattr__(self, "SMTP_PORT", 465 if self.smtp_security == "ssl" else 587)
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ, **overrides: Any) -> "Settings":
+        values: Dict[str, Any] = {}
+        errors: List[str] = []
+        for f in fields(cls):
+            raw = env.get(f.name)
+            # An empty number or flag (DB_POOL_SIZE=) means "not set": keep the default
+            if raw is None or (not raw.strip() and "str" not in str(f.type)):
+                continue
+            try:
+                values[f.name] = _cast(str(f.type), f.name, raw)
+            except ValueError as e:
+                errors.append(str(e))
+        if errors:
+            raise ValueError("Invalid settings:\n  - " + "\n  - ".join(errors))
+        values.update(overrides)
+        return cls(**values)
+
+    @property
+    def smtp_security(self) -> str:
+        if self.SMTP_SECURITY:
+            return self.SMTP_SECURITY.lower()
+        if self.SMTP_USE_SSL:
+            return "ssl"
+        return "starttls" if self.SMTP_STARTTLS else "none"
+
+    @property
+    def smtp_sender(self) -> str:
+        return self.SMTP_FROM or self.EMAIL_FROM or self.SMTP_USER or "no-reply@example.com"
+
+    @property
+    def cors_origins(self) -> List[str]:
+        return [o.strip() for o in self.CORS_ALLOW_ORIGINS.split(",") if o.strip()]
+
+    def problems(self) -> List[str]:
+        out = []
+        for name in (
+            "DB_POOL_SIZE", "DB_EXECUTOR_WORKERS", "PAGE_SIZE", "PAGE_SIZE_MAX", "CATALOG_CACHE_MAX_ENTRIES",
+            "PAGE_CACHE_MAX_ENTRIES", "CAPACITY_DEFAULT_SEATS", "MAIL_POOL_SIZE", "MAIL_QUEUE_MAX", "MAIL_BATCH",
+            "MAIL_OUTBOX_BATCH", "MAIL_OUTBOX_MAX_ATTEMPTS", "IDEMPOTENCY_KEY_DAYS", "SESSION_MAX_AGE",
+            "SESSION_MEMORY_MAX_ENTRIES", "SESSION_SWEEP_INTERVAL", "RATE_LIMIT_MAX_BUCKETS",
+        ):
+            if getattr(self, name) < 1:
+                out.append(f"{name} must be at least 1")
+        for name in ("DB_POOL_MAX_OVERFLOW", "DB_POOL_TIMEOUT", "API_MAX_AGE", "PAGE_CACHE_TTL", "MAIL_OUTBOX_POLL"):
+            if getattr(self, name) < 0:
+                out.append(f"{name} must not be negative")
+        if self.PAGE_SIZE > self.PAGE_SIZE_MAX:
+            out.append("PAGE_SIZE must not exceed PAGE_SIZE_MAX")
+        if not -1 <= self.WORKER_ID <= 1023:
+            out.append("WORKER_ID must be -1 or between 0 and 1023")
+        if self.CAPACITY_SLOT_MINUTES < 5:
+            out.append("CAPACITY_SLOT_MINUTES must be at least 5")
+        for name in ("CAPACITY_OPENS", "CAPACITY_CLOSES"):
+            value = getattr(self, name)
+            try:
+                if value:
+                    time.fromisoformat(value)
+            except ValueError:
+                out.append(f"{name}={value!r} is not a HH:MM time")
+        if self.CAPACITY_CLOSES and self.CAPACITY_CLOSES == (self.CAPACITY_OPENS or "00:00"):
+            out.append("CAPACITY_CLOSES must differ from CAPACITY_OPENS (an earlier time closes after midnight)")
+        if self.smtp_security not in ("starttls", "ssl", "none"):
+            out.append("SMTP_SECURITY must be starttls, ssl or none")
+        if not 0 < self.SMTP_PORT < 65536:
+            out.append("SMTP_PORT must be a TCP port")
+        if self.SESSION_SAME_SITE.lower() not in ("lax", "strict", "none"):
+            out.append("SESSION_SAME_SITE must be lax, strict or none")
+        if self.SESSION_BACKEND not in ("memory", "db", "cookie"):
+            out.append("SESSION_BACKEND must be memory, db or cookie")
+        if self.RATE_LIMIT_BACKEND not in ("memory", "db"):
+            out.append("RATE_LIMIT_BACKEND must be memory or db")
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.name.startswith("RATE_LIMIT_") and isinstance(value, str) and f.name != "RATE_LIMIT_BACKEND":
+                if value.strip() and not _RATE_SPEC.match(value.strip().lower()):
+                    out.append(f"{f.name}={value!r} is not a rate like 10/minute")
+        return out
+
+    def validate(self) -> "Settings":
+        problems = self.problems()
+        if problems:
+            raise ValueError("Invalid settings:\n  - " + "\n  - ".join(problems))
+        return self
+
+
+class _SettingsHandle:
+    """
+    The module-level `settings`: attribute reads go to the current
+    snapshot, writes are refused. Swapped only by reload_settings().
+    """
+
+    __slots__ = ("_current",)
+
+    def __init__(self, current: Settings):
+        object.__setattr__(self, "_current", current)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._current, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("settings are read-only; use reload_settings() to change them")
+
+    def __repr__(self) -> str:
+        return f"<settings {len(fields(Settings))} values>"
+
+
+_reload_lock = threading.Lock()
+_listeners: List[Callable[[Settings, Settings], None]] = []
+
+
+def on_settings_reload(fn: Callable[[Settings, Settings], None]) -> Callable[[Settings, Settings], None]:
+    """Register `fn(old, new)` to run after every successful reload_settings()."""
+    _listeners.append(fn)
+    return fn
+
+
+def get_settings() -> Settings:
+    """The current snapshot; usable as a FastAPI dependency."""
+    return settings._current
+
+
+def reload_settings(reread_env_file: bool = True, **overrides: Any) -> List[str]:
+    """
+    Build and validate a new snapshot (optionally re-reading the .env file
+    first) and make it current; returns the names of the values that
+    changed. On a validation error nothing changes.
+    """
+    with _reload_lock:
+        if reread_env_file:
+            load_env_file()
+        old = settings._current
+        new = Settings.from_env(os.environ, **overrides).validate()
+        object.__setattr__(settings, "_current", new)
+    changed = [f.name for f in fields(Settings) if getattr(old, f.name) != getattr(new, f.name)]
+    for fn in list(_listeners):
+        try:
+            fn(old, new)
+        except Exception as e:
+            print(f"[SETTINGS] reload listener {getattr(fn, '__name__', fn)} failed: {e}")
+    return changed
+
 
-settings = Settings()
\ No newline at end of file
+load_env_file()
+settings = _SettingsHandle(Settings.from_env().validate())
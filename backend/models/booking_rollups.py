@@ -0,0 +1,298 @@
+# models/booking_rollups.py
+"""
+Pre-aggregated booking counts for the admin KPIs and occupancy heatmap.
+
+Two tables, both keyed by restaurant and status, hold booking and guest
+totals:
+
+  booking_rollup_daily   per calendar day of booking_datetime
+  booking_rollup_hourly  per hour of the week (WEEKDAY 0 = Monday, HOUR 0..23)
+
+They are kept in step by the code that writes bookings, inside the same
+transaction as the write (apply_booking / move_booking_status), and can
+be rebuilt from newestone.bookings at any time:
+
+    python -m models.booking_rollups --batch-size 5000
+
+The app runs backfill() at startup, which does that rebuild once when
+the tables are still empty but bookings exist (the first start after
+they were added).
+"""
+from __future__ import annotations
+import argparse
+import time
+from typing import Any, Dict, Optional, Tuple
+
+DAILY = "newestone.booking_rollup_daily"
+HOURLY = "newestone.booking_rollup_hourly"
+
+DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {DAILY} (
+        restaurant_id INT NOT NULL,
+        day DATE NOT NULL,
+        status VARCHAR(16) NOT NULL,
+        bookings INT NOT NULL DEFAULT 0,
+        guests INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (restaurant_id, day, status),
+        KEY idx_day (day)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {HOURLY} (
+        restaurant_id INT NOT NULL,
+        weekday TINYINT NOT NULL,
+        hour TINYINT NOT NULL,
+        status VARCHAR(16) NOT NULL,
+        bookings INT NOT NULL DEFAULT 0,
+        guests INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (restaurant_id, weekday, hour, status)
+    )
+    """,
+]
+
+# Incremental upserts, one per table.
+_UPSERT = [
+    f"""
+    INSERT INTO {DAILY} (restaurant_id, day, status, bookings, guests)
+    VALUES (%s, DATE(%s), %s, %s, %s)
+    ON DUPLICATE KEY UPDATE bookings = bookings + VALUES(bookings), guests = guests + VALUES(guests)
+    """,
+    f"""
+    INSERT INTO {HOURLY} (restaurant_id, weekday, hour, status, bookings, guests)
+    VALUES (%s, WEEKDAY(%s), HOUR(%s), %s, %s, %s)
+    ON DUPLICATE KEY UPDATE bookings = bookings + VALUES(bookings), guests = guests + VALUES(guests)
+    """,
+]
+
+
+def _status(status: Optional[str]) -> str:
+    # Spaces only, like SQL TRIM(): must agree with _STATUS_SQL used by rebuild()
+    return (status or "unknown").strip(" ").lower()[:16] or "unknown"
+
+
+# _status() in SQL, so a rebuild files every booking where the live counters did
+_STATUS_SQL = "COALESCE(NULLIF(LEFT(LOWER(TRIM(status)), 16), ''), 'unknown')"
+
+
+def ensure_tables(db) -> None:
+    cur = db.cursor()
+    for stmt in DDL:
+        cur.execute(stmt)
+    db.commit()
+    cur.close()
+
+
+def apply_booking(cur, restaurant_id: Optional[int], booking_datetime: Any, status: Optional[str], guests: int, sign: int = 1) -> None:
+    """
+    Add (sign=1) or remove (sign=-1) one booking from the rollups using the
+    caller's cursor, so it commits or rolls back with the booking write.
+    """
+    rid = int(restaurant_id or 0)
+    st = _status(status)
+    n = int(guests or 0)
+    cur.execute(_UPSERT[0], (rid, booking_datetime, st, sign, sign * n))
+    cur.execute(_UPSERT[1], (rid, booking_datetime, booking_datetime, st, sign, sign * n))
+
+
+def move_booking_status(cur, booking_id: int, new_status: str) -> Optional[Tuple[Any, Any, Any, Any, Any]]:
+    """
+    Set a booking's status and move it between rollup buckets. Locks the
+    row first so two concurrent status changes cannot both count the old
+    status. Returns the booking's (restaurant_id, booking_datetime, guests,
+    old status, order_id), or None when it does not exist.
+    """
+    cur.execute(
+        "SELECT restaurant_id, booking_datetime, number_of_guests, status, order_id FROM newestone.bookings WHERE id = %s FOR UPDATE",
+        (booking_id,),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return None
+    restaurant_id, at, guests, old, _ = row
+    cur.execute("UPDATE newestone.bookings SET status = %s WHERE id = %s", (new_status, booking_id))
+    if _status(old) != _status(new_status) and at is not None:
+        apply_booking(cur, restaurant_id, at, old, guests, sign=-1)
+        apply_booking(cur, restaurant_id, at, new_status, guests)
+    return row
+
+
+def status_totals(db) -> Dict[str, int]:
+    """Bookings per status, all time: a sum over the hourly rollup (at most 168 rows per restaurant and status)."""
+    cur = db.cursor()
+    cur.execute(f"SELECT status, SUM(bookings) FROM {HOURLY} GROUP BY status")
+    totals = {st: int(n) for st, n in cur.fetchall() if n}
+    cur.close()
+    return totals
+
+
+def clear(cur) -> None:
+    cur.execute(f"DELETE FROM {DAILY}")
+    cur.execute(f"DELETE FROM {HOURLY}")
+
+
+def rebuild(db, batch_size: int = 5000, log=print) -> Dict[str, Any]:
+    """
+    Recompute both tables from newestone.bookings, `batch_size` bookings
+    (by id) per statement and commit.
+
+    The tables are emptied and the highest booking id read in one
+    transaction; bookings inserted after that keep their incremental
+    updates, older ones are recounted here. Status changes made while the
+    rebuild runs can be counted twice, so run it with the admin idle (it
+    is safe to run again).
+    """
+    t0 = time.perf_counter()
+    ensure_tables(db)
+    cur = db.cursor()
+    clear(cur)
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM newestone.bookings")
+    high = int(cur.fetchone()[0])
+    db.commit()
+
+    grouped = [
+        f"""
+        INSERT INTO {DAILY} (restaurant_id, day, status, bookings, guests)
+        SELECT COALESCE(restaurant_id, 0), DATE(booking_datetime), {_STATUS_SQL},
+               COUNT(*), COALESCE(SUM(number_of_guests), 0)
+        FROM newestone.bookings
+        WHERE id > %s AND id <= %s AND booking_datetime IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON DUPLICATE KEY UPDATE bookings = bookings + VALUES(bookings), guests = guests + VALUES(guests)
+        """,
+        f"""
+        INSERT INTO {HOURLY} (restaurant_id, weekday, hour, status, bookings, guests)
+        SELECT COALESCE(restaurant_id, 0), WEEKDAY(booking_datetime), HOUR(booking_datetime),
+               {_STATUS_SQL}, COUNT(*), COALESCE(SUM(number_of_guests), 0)
+        FROM newestone.bookings
+        WHERE id > %s AND id <= %s AND booking_datetime IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        ON DUPLICATE KEY UPDATE bookings = bookings + VALUES(bookings), guests = guests + VALUES(guests)
+        """,
+    ]
+    after, batches = 0, 0
+    while after < high:
+        cur.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM newestone.bookings WHERE id > %s AND id <= %s ORDER BY id LIMIT %s) b",
+            (after, high, int(batch_size)),
+        )
+        upto = cur.fetchone()[0]
+        if upto is None:
+            break
+        for stmt in grouped:
+            cur.execute(stmt, (after, int(upto)))
+        db.commit()
+        batches += 1
+        log(f"[ROLLUPS] batch {batches}: bookings {after + 1}..{upto}")
+        after = int(upto)
+    cur.close()
+    took = time.perf_counter() - t0
+    log(f"[ROLLUPS] rebuilt from {high} bookings in {batches} batches, {took:.1f}s")
+    return {"max_booking_id": high, "batches": batches, "seconds": round(took, 3)}
+
+
+_BACKFILL_LOCK = "newestone.booking_rollups.backfill"
+
+
+def backfill(db, batch_size: int = 5000, log=print) -> Optional[Dict[str, Any]]:
+    """
+    rebuild() if the rollups are empty and newestone.bookings is not;
+    otherwise (or when another process is already at it) do nothing and
+    return None. A named lock keeps app processes that start together from
+    rebuilding at the same time.
+    """
+    cur = db.cursor()
+    cur.execute("SELECT GET_LOCK(%s, 0)", (_BACKFILL_LOCK,))
+    if not cur.fetchone()[0]:
+        cur.close()
+        return None
+    try:
+        cur.execute(
+            f"SELECT EXISTS(SELECT 1 FROM {HOURLY}), "
+            f"EXISTS(SELECT 1 FROM newestone.bookings WHERE booking_datetime IS NOT NULL)"
+        )
+        have_rollups, have_bookings = cur.fetchone()
+        db.commit()
+        if have_rollups or not have_bookings:
+            return None
+        log("[ROLLUPS] rollup tables are empty; backfilling from newestone.bookings")
+        return rebuild(db, batch_size=batch_size, log=log)
+    finally:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (_BACKFILL_LOCK,))
+        cur.fetchone()
+        cur.close()
+
+
+def _where(date_from=None, date_to=None, restaurant_id: Optional[int] = None) -> Tuple[str, list]:
+    clauses, params = [], []
+    if date_from is not None:
+        clauses.append("day >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        clauses.append("day <= %s")
+        params.append(date_to)
+    if restaurant_id is not None:
+        clauses.append("restaurant_id = %s")
+        params.append(restaurant_id)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def kpis(db, *, date_from=None, date_to=None, restaurant_id: Optional[int] = None, top: int = 10) -> Dict[str, Any]:
+    """Totals, status split, busiest restaurants and a per-day series, from booking_rollup_daily only."""
+    where, params = _where(date_from, date_to, restaurant_id)
+    cur = db.cursor()
+    cur.execute(f"SELECT status, SUM(bookings), SUM(guests) FROM {DAILY}{where} GROUP BY status", params)
+    by_status = {st: {"bookings": int(b or 0), "guests": int(g or 0)} for st, b, g in cur.fetchall()}
+    cur.execute(
+        f"SELECT restaurant_id, SUM(bookings) AS n, SUM(guests) FROM {DAILY}{where} "
+        f"GROUP BY restaurant_id ORDER BY n DESC, restaurant_id LIMIT %s",
+        (*params, int(top)),
+    )
+    restaurants = [{"restaurant_id": rid, "bookings": int(b or 0), "guests": int(g or 0)} for rid, b, g in cur.fetchall()]
+    cur.execute(f"SELECT day, SUM(bookings), SUM(guests) FROM {DAILY}{where} GROUP BY day ORDER BY day", params)
+    days = [{"day": str(d), "bookings": int(b or 0), "guests": int(g or 0)} for d, b, g in cur.fetchall()]
+    cur.close()
+    bookings = sum(s["bookings"] for s in by_status.values())
+    guests = sum(s["guests"] for s in by_status.values())
+    return {
+        "bookings": bookings,
+        "guests": guests,
+        "avg_party_size": round(guests / bookings, 2) if bookings else 0.0,
+        "by_status": by_status,
+        "top_restaurants": restaurants,
+        "days": days,
+    }
+
+
+def heatmap(db, *, restaurant_id: Optional[int] = None, status: Optional[str] = None) -> Dict[str, Any]:
+    """7 x 24 bookings and guests by weekday (0 = Monday) and hour, from booking_rollup_hourly only."""
+    clauses, params = [], []
+    if restaurant_id is not None:
+        clauses.append("restaurant_id = %s")
+        params.append(restaurant_id)
+    if status:
+        clauses.append("status = %s")
+        params.append(_status(status))
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    cur = db.cursor()
+    cur.execute(f"SELECT weekday, hour, SUM(bookings), SUM(guests) FROM {HOURLY}{where} GROUP BY weekday, hour", params)
+    bookings = [[0] * 24 for _ in range(7)]
+    guests = [[0] * 24 for _ in range(7)]
+    for wd, hr, b, g in cur.fetchall():
+        bookings[int(wd)][int(hr)] = int(b or 0)
+        guests[int(wd)][int(hr)] = int(g or 0)
+    cur.close()
+    return {"weekdays": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"], "bookings": bookings, "guests": guests}
+
+
+if __name__ == "__main__":
+    from models.database import _connect
+
+    ap = argparse.ArgumentParser(description="Rebuild the booking rollup tables from newestone.bookings.")
+    ap.add_argument("--batch-size", type=int, default=5000)
+    args = ap.parse_args()
+    conn = _connect()
+    try:
+        rebuild(conn, batch_size=args.batch_size)
+    finally:
+        conn.close()
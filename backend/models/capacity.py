@@ -0,0 +1,314 @@
+# models/capacity.py
+"""
+Seat capacity per restaurant and time slot.
+
+Each restaurant has a number of seats and a slot length (and optionally
+opening hours) in newestone.restaurant_capacity; restaurants without a
+row use the CAPACITY_* settings. A booking takes `guests` seats in the
+slot its booking_datetime falls in.
+
+Opening hours may run past midnight (opens 18:00, closes 02:00): the
+slots after midnight belong to the evening they started on.
+
+newestone.booking_slots holds one counter row per (restaurant, slot) that
+has bookings, and newestone.booking_slot_holds remembers which slot each
+order took, so releasing it later frees that slot even if the slot
+length or opening time has changed since. Seats are taken with a single conditional UPDATE
+
+    UPDATE ... SET reserved = reserved + n WHERE ... AND reserved + n <= capacity
+
+which either succeeds (rowcount 1) or leaves the counter alone, so
+concurrent verifications cannot overbook and only that slot's row is
+locked, until the caller's transaction ends.
+"""
+from __future__ import annotations
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from config.settings import settings
+
+CONFIG = "newestone.restaurant_capacity"
+SLOTS = "newestone.booking_slots"
+HOLDS = "newestone.booking_slot_holds"
+
+DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {CONFIG} (
+        restaurant_id INT NOT NULL PRIMARY KEY,
+        seats INT NOT NULL,
+        slot_minutes INT NOT NULL DEFAULT 30,
+        opens TIME NULL,
+        closes TIME NULL
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {SLOTS} (
+        restaurant_id INT NOT NULL,
+        slot_start DATETIME NOT NULL,
+        capacity INT NOT NULL,
+        reserved INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (restaurant_id, slot_start)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {HOLDS} (
+        order_id VARCHAR(32) NOT NULL PRIMARY KEY,
+        restaurant_id INT NOT NULL,
+        slot_start DATETIME NOT NULL,
+        guests INT NOT NULL
+    )
+    """,
+]
+
+# Statuses whose seats are not held
+RELEASED_STATUSES = frozenset({"cancelled"})
+
+
+class SlotFullError(Exception):
+    """The requested slot is closed or has fewer free seats than the party."""
+
+
+class SlotConfig(NamedTuple):
+    seats: int
+    slot_minutes: int
+    opens: dtime
+    closes: Optional[dtime]  # None = until midnight; before `opens` = the next morning
+
+    @property
+    def overnight(self) -> bool:
+        return self.closes is not None and self.closes < self.opens
+
+    def service_end(self, day: date) -> datetime:
+        if self.closes is None or self.overnight:
+            return datetime.combine(day + timedelta(days=1), self.closes or dtime())
+        return datetime.combine(day, self.closes)
+
+    def slot_of(self, at: datetime) -> datetime:
+        """Start of the slot holding `at`; slots are laid out from the opening time."""
+        origin = datetime.combine(at.date(), self.opens)
+        if at < origin and self.overnight and at.time() < self.closes:
+            origin -= timedelta(days=1)  # after midnight, still the previous evening's service
+        minutes = int((at - origin).total_seconds() // 60)
+        return origin + timedelta(minutes=minutes - minutes % self.slot_minutes)
+
+    def slots_on(self, day: date) -> List[datetime]:
+        """Slots of the service opening on `day`, past midnight if it runs that late."""
+        at = datetime.combine(day, self.opens)
+        end = self.service_end(day)
+        step = timedelta(minutes=self.slot_minutes)
+        out = []
+        while at < end:
+            out.append(at)
+            at += step
+        return out
+
+    def is_open(self, slot: datetime) -> bool:
+        t = slot.time()
+        if self.closes is None:
+            return t >= self.opens
+        if self.overnight:
+            return t >= self.opens or t < self.closes
+        return self.opens <= t < self.closes
+
+
+def _parse_time(value: str) -> Optional[dtime]:
+    value = (value or "").strip()
+    return dtime.fromisoformat(value) if value else None
+
+
+def default_config() -> SlotConfig:
+    return SlotConfig(
+        seats=settings.CAPACITY_DEFAULT_SEATS,
+        slot_minutes=settings.CAPACITY_SLOT_MINUTES,
+        opens=_parse_time(settings.CAPACITY_OPENS) or dtime(),
+        closes=_parse_time(settings.CAPACITY_CLOSES),
+    )
+
+
+def _as_time(value: Any) -> Optional[dtime]:
+    # mysql.connector returns TIME columns as timedelta
+    if value is None:
+        return None
+    if isinstance(value, timedelta):
+        secs = int(value.total_seconds()) % 86400
+        return dtime(secs // 3600, secs % 3600 // 60)
+    if isinstance(value, dtime):
+        return value
+    return _parse_time(str(value))
+
+
+def parse_when(value: Union[str, datetime]) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).strip().replace("T", " "))
+
+
+def ensure_tables(db) -> None:
+    cur = db.cursor()
+    for stmt in DDL:
+        cur.execute(stmt)
+    db.commit()
+    cur.close()
+
+
+def get_config(cur, restaurant_id: int) -> SlotConfig:
+    cur.execute(f"SELECT seats, slot_minutes, opens, closes FROM {CONFIG} WHERE restaurant_id = %s", (restaurant_id,))
+    row = cur.fetchone()
+    if not row:
+        return default_config()
+    seats, minutes, opens, closes = row
+    return SlotConfig(int(seats), max(5, int(minutes or 30)), _as_time(opens) or dtime(), _as_time(closes))
+
+
+def set_config(db, restaurant_id: int, seats: int, slot_minutes: int, opens: Optional[str], closes: Optional[str]) -> None:
+    """
+    Store a restaurant's capacity. Existing slot rows keep counting what is
+    already reserved but take the new seat count as their capacity.
+    """
+    if seats < 1 or slot_minutes < 5:
+        raise ValueError("seats must be >= 1 and slot_minutes >= 5")
+    opens_t, closes_t = _parse_time(opens or ""), _parse_time(closes or "")
+    if closes_t is not None and closes_t == (opens_t or dtime()):
+        raise ValueError("closes must differ from opens (use a time before opens to close after midnight)")
+    cur = db.cursor()
+    try:
+        cur.execute(
+            f"""
+            INSERT INTO {CONFIG} (restaurant_id, seats, slot_minutes, opens, closes)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE seats = VALUES(seats), slot_minutes = VALUES(slot_minutes),
+                                    opens = VALUES(opens), closes = VALUES(closes)
+            """,
+            (restaurant_id, seats, slot_minutes, opens_t, closes_t),
+        )
+        cur.execute(f"UPDATE {SLOTS} SET capacity = %s WHERE restaurant_id = %s AND slot_start >= NOW()", (seats, restaurant_id))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _hold(cur, order_id: Optional[str], restaurant_id: int, slot: datetime, guests: int) -> None:
+    if order_id:
+        cur.execute(
+            f"INSERT INTO {HOLDS} (order_id, restaurant_id, slot_start, guests) VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE restaurant_id = VALUES(restaurant_id), slot_start = VALUES(slot_start), guests = VALUES(guests)",
+            (order_id, restaurant_id, slot, guests),
+        )
+
+
+def reserve(
+    cur,
+    restaurant_id: int,
+    when: Union[str, datetime],
+    guests: int,
+    *,
+    order_id: Optional[str] = None,
+    force: bool = False,
+) -> bool:
+    """
+    Take `guests` seats in the slot of `when` using the caller's cursor;
+    commits or rolls back with the booking. False (and nothing changed)
+    when the slot is closed or has fewer free seats. `force` skips both
+    checks, for admins re-instating a cancelled booking. With `order_id`
+    the slot taken is recorded for release().
+    """
+    guests = int(guests)
+    cfg = get_config(cur, restaurant_id)
+    slot = cfg.slot_of(parse_when(when))
+    if not force and (guests < 1 or not cfg.is_open(slot)):
+        return False
+    cur.execute(
+        f"INSERT IGNORE INTO {SLOTS} (restaurant_id, slot_start, capacity, reserved) VALUES (%s, %s, %s, 0)",
+        (restaurant_id, slot, cfg.seats),
+    )
+    if force:
+        cur.execute(
+            f"UPDATE {SLOTS} SET reserved = reserved + %s WHERE restaurant_id = %s AND slot_start = %s",
+            (guests, restaurant_id, slot),
+        )
+        _hold(cur, order_id, restaurant_id, slot, guests)
+        return True
+    cur.execute(
+        f"UPDATE {SLOTS} SET reserved = reserved + %s "
+        f"WHERE restaurant_id = %s AND slot_start = %s AND reserved + %s <= capacity",
+        (guests, restaurant_id, slot, guests),
+    )
+    if cur.rowcount != 1:
+        return False
+    _hold(cur, order_id, restaurant_id, slot, guests)
+    return True
+
+
+def release(cur, restaurant_id: int, when: Union[str, datetime], guests: int, order_id: Optional[str] = None) -> None:
+    """
+    Give back the seats of `order_id` in the slot reserve() recorded for
+    it. Orders without a record (booked before holds were kept) fall back
+    to the slot of `when` under the current configuration.
+    """
+    slot = None
+    if order_id:
+        cur.execute(f"SELECT slot_start, guests FROM {HOLDS} WHERE order_id = %s", (order_id,))
+        row = cur.fetchone()
+        if row is not None:
+            slot, guests = row
+            cur.execute(f"DELETE FROM {HOLDS} WHERE order_id = %s", (order_id,))
+    if slot is None:
+        slot = get_config(cur, restaurant_id).slot_of(parse_when(when))
+    cur.execute(
+        f"UPDATE {SLOTS} SET reserved = GREATEST(reserved - %s, 0) WHERE restaurant_id = %s AND slot_start = %s",
+        (int(guests), restaurant_id, slot),
+    )
+
+
+def clear(cur) -> None:
+    cur.execute(f"DELETE FROM {SLOTS}")
+    cur.execute(f"DELETE FROM {HOLDS}")
+
+
+def availability(db, restaurant_id: int, day: date, guests: int = 1) -> Dict[str, Any]:
+    """Every slot of the service opening on `day` with its free seats; two indexed reads, no locks."""
+    cur = db.cursor()
+    cfg = get_config(cur, restaurant_id)
+    start = datetime.combine(day, cfg.opens)
+    cur.execute(
+        f"SELECT slot_start, capacity, reserved FROM {SLOTS} WHERE restaurant_id = %s AND slot_start >= %s AND slot_start < %s",
+        (restaurant_id, start, cfg.service_end(day)),
+    )
+    taken = {parse_when(s): (int(c), int(r)) for s, c, r in cur.fetchall()}
+    cur.close()
+    now = datetime.now()
+    slots = []
+    for slot in cfg.slots_on(day):
+        capacity, reserved = taken.get(slot, (cfg.seats, 0))
+        free = max(capacity - reserved, 0)
+        slots.append({
+            "start": slot.strftime("%H:%M"),
+            "free": free,
+            "available": free >= guests and slot > now,
+        })
+    return {
+        "restaurant_id": restaurant_id,
+        "date": day.isoformat(),
+        "guests": guests,
+        "seats": cfg.seats,
+        "slot_minutes": cfg.slot_minutes,
+        "slots": slots,
+    }
+
+
+def has_room(db, restaurant_id: int, when: Union[str, datetime], guests: int) -> bool:
+    """Advisory read used before the OTP is sent; reserve() is what actually decides."""
+    at = parse_when(when)
+    cur = db.cursor()
+    cfg = get_config(cur, restaurant_id)
+    slot = cfg.slot_of(at)
+    if not cfg.is_open(slot) or guests > cfg.seats:
+        cur.close()
+        return False
+    cur.execute(f"SELECT capacity, reserved FROM {SLOTS} WHERE restaurant_id = %s AND slot_start = %s", (restaurant_id, slot))
+    row = cur.fetchone()
+    cur.close()
+    return row is None or int(row[1]) + guests <= int(row[0])
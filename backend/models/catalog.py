@@ -0,0 +1,124 @@
+# models/catalog.py
+from __future__ import annotations
+import math
+import threading
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from config.settings import settings
+from utils.cache import TTLCache
+
+# Restaurants, images, menus and facet counts for the public read path.
+# Entries are dropped by notify_catalog_changed() after an admin write and
+# expire after CATALOG_CACHE_TTL so writes made by other workers show up.
+catalog_cache = TTLCache(
+    maxsize=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl=settings.CATALOG_CACHE_TTL,
+    name="catalog",
+)
+
+_listeners: List[Callable[[Optional[int]], None]] = []
+_version = 0
+_version_lock = threading.Lock()
+
+
+def on_catalog_change(fn: Callable[[Optional[int]], None]) -> Callable[[Optional[int]], None]:
+    """Register `fn(restaurant_id)` to run after every catalog write; usable as a decorator."""
+    _listeners.append(fn)
+    return fn
+
+
+def notify_catalog_changed(restaurant_id: Optional[int] = None) -> None:
+    """
+    Call after committing a write to restaurants, images or menu items.
+
+    `restaurant_id` narrows what is dropped (None means "anything may have
+    changed"); restaurant-wide data such as listings and counts is always
+    invalidated.
+    """
+    global _version
+    with _version_lock:
+        _version += 1
+    for fn in list(_listeners):
+        try:
+            fn(restaurant_id)
+        except Exception as e:
+            print(f"[CATALOG] listener {getattr(fn, '__name__', fn)} failed: {e}")
+
+
+def catalog_version() -> int:
+    return _version
+
+
+@on_catalog_change
+def _drop_cached_catalog(restaurant_id: Optional[int]) -> None:
+    if restaurant_id is None:
+        catalog_cache.clear()
+        return
+    catalog_cache.invalidate_where(
+        lambda key: not (isinstance(key, tuple) and key[0] == "menu" and key[1] != restaurant_id)
+    )
+
+
+class RestaurantTable:
+    """
+    Column-oriented copy of the scalar restaurant fields.
+
+    One typed `array` per column (8 bytes per id / coordinate / rating, one
+    byte per price range and tag code) instead of an object per row, so the
+    facet, geo and sort code can scan every restaurant without touching the
+    entity objects. Row i matches position i of the list it was built from.
+    Missing coordinates are NaN, a missing price range is 0 and a missing
+    tag is code 0; `tags[code]` maps codes back to names.
+    """
+
+    __slots__ = ("ids", "lat", "lng", "ratings", "price_range", "tag_code", "tags", "_row_of")
+
+    def __init__(self, rows: Iterable[Any], tags: Sequence[str] = ()):
+        self.tags: List[Optional[str]] = [None, *tags]
+        codes = {t: i for i, t in enumerate(self.tags) if t is not None}
+        self.ids = array("q")
+        self.lat = array("d")
+        self.lng = array("d")
+        self.ratings = array("d")
+        self.price_range = array("b")
+        self.tag_code = array("B")
+        for r in rows:
+            loc = r.location
+            self.ids.append(r.id)
+            self.lat.append(loc.lat if loc.lat is not None else math.nan)
+            self.lng.append(loc.lng if loc.lng is not None else math.nan)
+            self.ratings.append(r.ratings)
+            self.price_range.append(r.price_range or 0)
+            if r.tag is not None and r.tag not in codes:
+                codes[r.tag] = len(self.tags)
+                self.tags.append(r.tag)
+            self.tag_code.append(codes.get(r.tag, 0) if r.tag is not None else 0)
+        self._row_of: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row_of(self, entity_id: int) -> Optional[int]:
+        if self._row_of is None:
+            self._row_of = {rid: i for i, rid in enumerate(self.ids)}
+        return self._row_of.get(int(entity_id))
+
+    def tag(self, row: int) -> Optional[str]:
+        return self.tags[self.tag_code[row]]
+
+    def price(self, row: int) -> Optional[int]:
+        return self.price_range[row] or None
+
+    def coordinates(self) -> Iterator[Tuple[int, Optional[float], Optional[float]]]:
+        """(id, lat, lng) per row with None for a missing coordinate, for the geo index."""
+        for rid, lat, lng in zip(self.ids, self.lat, self.lng):
+            yield rid, (None if lat != lat else lat), (None if lng != lng else lng)
+
+    def nbytes(self) -> int:
+        cols = (self.ids, self.lat, self.lng, self.ratings, self.price_range, self.tag_code)
+        return sum(c.itemsize * len(c) for c in cols)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {"version": _version, **catalog_cache.stats()}
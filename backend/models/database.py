@@ -1,35 +1,277 @@
+from __future__ import annotations
+import asyncio
+import contextlib
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
 
 import mysql.connector
 # This relative import is correct for the file's location in models/
 from config.settings import settings
 
 
-def get_db_connection():
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the pool timeout."""
+
+
+class ConnectionPool:
     """
-    Creates and returns a new database connection instance.
+    Bounded pool of MySQL connections.
 
-    IMPORTANT: The part of your code that calls this function is now
-    responsible for closing the connection when it's done.
-    Failure to close connections will lead to resource leaks.
-    
-    Example:
-        db = get_db_connection()
-        # ... do work ...
-        db.close()
+    Keeps up to `size` idle connections around and allows `max_overflow`
+    extra ones under bursts; overflow connections are closed on return
+    instead of being kept idle. Callers that find the pool exhausted wait
+    up to `timeout` seconds before PoolTimeout is raised.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        *,
+        size: int = 10,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        recycle: int = 1800,
+        pre_ping: bool = True,
+        ping_after: float = 0.0,
+    ):
+        self._factory = factory
+        self.size = max(1, int(size))
+        self.max_overflow = max(0, int(max_overflow))
+        self.timeout = float(timeout)
+        self.recycle = int(recycle)
+        self.pre_ping = pre_ping
+        self.ping_after = float(ping_after)
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()              # (conn, created_at, idle_since)
+        self._created: Dict[int, float] = {}     # id(conn) -> created_at
+        self._in_use = 0
+        self._waiting = 0
+
+        self._started = time.monotonic()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent: deque = deque()            # monotonic checkout times, last 60s
+
+    # ---------- internals ----------
+    def _total(self) -> int:
+        return self._in_use + len(self._idle)
+
+    def _close(self, conn: Any) -> None:
+        self._created.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_stale(self, conn: Any, created_at: float, idle_since: float) -> bool:
+        now = time.monotonic()
+        if self.recycle > 0 and now - created_at > self.recycle:
+            return True
+        # Recently returned connections skip the ping round trip.
+        if self.pre_ping and now - idle_since >= self.ping_after:
+            try:
+                return not conn.is_connected()
+            except Exception:
+                return True
+        return False
+
+    def _record_checkout(self, waited: float) -> None:
+        now = time.monotonic()
+        self._checkouts += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._recent.append(now)
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+
+    # ---------- public API ----------
+    def checkout(self) -> Any:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            with self._cond:
+                while not self._idle and self._total() >= self.size + self.max_overflow:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"no connection available after {self.timeout:.1f}s "
+                            f"(size={self.size}, overflow={self.max_overflow})"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                self._in_use += 1
+                idle = self._idle.pop() if self._idle else None
+
+            # Network I/O (ping / connect) happens outside the lock.
+            if idle is not None:
+                conn, created_at, idle_since = idle
+                if not self._is_stale(conn, created_at, idle_since):
+                    break
+                self._close(conn)
+            try:
+                conn = self._factory()
+            except Exception:
+                with self._cond:
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            self._created[id(conn)] = time.monotonic()
+            break
+
+        with self._cond:
+            self._record_checkout(time.monotonic() - start)
+        return conn
+
+    def release(self, conn: Any) -> None:
+        """Return a connection; any open transaction is rolled back first."""
+        broken = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            broken = True
+        with self._cond:
+            self._in_use -= 1
+            created_at = self._created.get(id(conn))
+            if broken or created_at is None or len(self._idle) >= self.size:
+                self._close(conn)
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def dispose(self) -> None:
+        with self._cond:
+            while self._idle:
+                conn = self._idle.pop()[0]
+                self._close(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            window = min(60.0, max(now - self._started, 1e-9))
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "checkouts_per_sec": round(len(self._recent) / window, 3),
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+def _connect():
+    return mysql.connector.connect(
+        host=settings.DB_HOST,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database=settings.DB_NAME
+    )
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    size=settings.DB_POOL_SIZE,
+                    max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+                    timeout=settings.DB_POOL_TIMEOUT,
+                    recycle=settings.DB_POOL_RECYCLE,
+                    pre_ping=settings.DB_POOL_PRE_PING,
+                    ping_after=settings.DB_POOL_PING_AFTER,
+                )
+    return _pool
+
+
+def pool_stats() -> Dict[str, Any]:
+    return get_pool().stats()
+
+
+# ---------- executor for blocking DB work ----------
+R = TypeVar("R")
+
+_executor = ThreadPoolExecutor(max_workers=settings.DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+# Checkouts may block waiting for a release; they get their own threads so a
+# burst of waiters can never occupy the executor the releases run on.
+_checkout_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE + settings.DB_POOL_MAX_OVERFLOW,
+    thread_name_prefix="db-checkout",
+)
+
+
+async def run_in_db(fn: Callable[..., R], *args, **kwargs) -> R:
+    """
+    Run a blocking DB function on the dedicated DB executor and await it.
+
+    Async routes must never touch a cursor directly; they hand the work to
+    this executor so the event loop stays free for other requests.
     """
-    db_connection = None
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _checkout_executor.shutdown(wait=False, cancel_futures=True)
+
+
+@contextlib.asynccontextmanager
+async def db_connection():
+    """
+    Pooled database connection for code outside a FastAPI dependency, e.g.
+    a route that only needs the database on a cache miss:
+
+        async with db_connection() as db:
+            rows = await run_in_db(fetch_rows, db)
+    """
+    pool = get_pool()
+    loop = asyncio.get_running_loop()
     try:
-        # Establish the connection using your settings
-        db_connection = mysql.connector.connect(
-            host=settings.DB_HOST,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            database=settings.DB_NAME
-        )
-        # Return the connection object
-        return db_connection
-    except mysql.connector.Error as err:
-        # If the connection fails, print an error and return None
+        conn = await loop.run_in_executor(_checkout_executor, pool.checkout)
+    except (mysql.connector.Error, PoolTimeout) as err:
         print(f"Error connecting to database: {err}")
-        return None
+        raise
+    try:
+        yield conn
+    finally:
+        await run_in_db(pool.release, conn)
+
 
+async def get_db_connection():
+    """
+    FastAPI dependency yielding a pooled database connection.
+
+    Checkout and return run in worker threads, so waiting for a free
+    connection never blocks the event loop. The connection is returned to
+    the pool once the request is done, also when the route raises;
+    uncommitted work is rolled back on return.
+
+    Example:
+        db: mysql.connector.MySQLConnection = Depends(get_db_connection)
+        rows = await run_in_db(fetch_rows, db)
+    """
+    async with db_connection() as conn:
+        yield conn
@@ -0,0 +1,105 @@
+# models/idempotency.py
+"""
+Idempotency keys for booking submissions.
+
+A client (or the booking session) sends the same key with every retry of
+one submission. The first request to claim a key inserts its booking in
+the same transaction as the claim; a retry, or a concurrent duplicate,
+finds the key taken and gets the original order id back instead of a
+second row. InnoDB makes the duplicate INSERT wait for the first
+transaction, so two racing requests cannot both win.
+
+Keys are stored per owner (the booking's email, or the browser session),
+hashed together with it, so two clients that happen to send the same key
+never see each other's orders. Each claim also stores a fingerprint of
+what was asked for; a key sent again with a different booking raises
+KeyReused instead of replaying the first order.
+"""
+from __future__ import annotations
+import hashlib
+import json
+from typing import Any, Optional
+
+TABLE = "newestone.idempotency_keys"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    scope VARCHAR(32) NOT NULL,
+    idem_key VARCHAR(64) NOT NULL,
+    order_id VARCHAR(32) NOT NULL,
+    fingerprint CHAR(64) NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (scope, idem_key),
+    KEY idx_created (created_at)
+)
+"""
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 64
+
+
+class KeyReused(Exception):
+    """The idempotency key was already used for a different booking."""
+
+
+def ensure_table(db) -> None:
+    cur = db.cursor()
+    cur.execute(DDL)
+    # Tables created before fingerprints were stored
+    cur.execute(f"SHOW COLUMNS FROM {TABLE} LIKE 'fingerprint'")
+    if not cur.fetchall():
+        cur.execute(f"ALTER TABLE {TABLE} ADD COLUMN fingerprint CHAR(64) NULL AFTER order_id")
+    db.commit()
+    cur.close()
+
+
+def normalize_key(value: Optional[str]) -> Optional[str]:
+    key = (value or "").strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency key longer than {MAX_KEY_LENGTH} characters")
+    return key
+
+
+def fingerprint_of(*parts: Any) -> str:
+    """Hash of what a request asks for, to tell a retry from a different request reusing its key."""
+    raw = json.dumps([str(p).strip() for p in parts], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _stored_key(owner: str, key: str) -> str:
+    return hashlib.sha256(f"{owner}\n{key}".encode("utf-8")).hexdigest()
+
+
+def claim(cur, scope: str, key: str, order_id: str, *, owner: str = "", fingerprint: Optional[str] = None) -> Optional[str]:
+    """
+    Reserve `owner`'s `key` for `order_id` using the caller's cursor.
+    Returns None if this call claimed it (go ahead and insert), else the
+    order id that owns it. Raises KeyReused when the key was claimed with a
+    different fingerprint. Must run before the booking insert, in the same
+    transaction.
+    """
+    stored = _stored_key(owner, key)
+    cur.execute(
+        f"INSERT IGNORE INTO {TABLE} (scope, idem_key, order_id, fingerprint) VALUES (%s, %s, %s, %s)",
+        (scope, stored, order_id, fingerprint),
+    )
+    if cur.rowcount == 1:
+        return None
+    cur.execute(f"SELECT order_id, fingerprint FROM {TABLE} WHERE scope = %s AND idem_key = %s", (scope, stored))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    if fingerprint is not None and row[1] is not None and row[1] != fingerprint:
+        raise KeyReused(key)
+    return row[0]
+
+
+def purge(db, older_than_days: int = 7) -> int:
+    cur = db.cursor()
+    cur.execute(f"DELETE FROM {TABLE} WHERE created_at < NOW() - INTERVAL %s DAY", (int(older_than_days),))
+    deleted = cur.rowcount
+    db.commit()
+    cur.close()
+    return deleted
@@ -0,0 +1,448 @@
+# models/outbox.py
+"""
+Durable mail outbox.
+
+Routes write each email to newestone.mail_outbox (enqueue) instead of
+handing it to an in-process queue, so a restart or crash cannot lose it.
+Workers claim pending rows in batches with SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of them (the app's own drainer and/or separate
+processes) can run side by side:
+
+    python -m models.outbox                 # drain forever
+    python -m models.outbox --once          # one pass, e.g. from cron
+
+A claimed row is leased for MAIL_OUTBOX_LEASE seconds; if its worker dies
+the lease runs out and another worker picks it up. Failures are retried
+with exponential backoff and the row is moved to 'dead' after
+MAIL_OUTBOX_MAX_ATTEMPTS tries.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import settings
+
+TABLE = "newestone.mail_outbox"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    recipient VARCHAR(320) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    text_body TEXT NOT NULL,
+    html_body TEXT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    last_error VARCHAR(500) NULL,
+    created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    sent_at DATETIME(6) NULL,
+    KEY idx_due (status, next_attempt_at)
+)
+"""
+
+PENDING, SENDING, SENT, DEAD = "pending", "sending", "sent", "dead"
+
+
+def ensure_table(db) -> None:
+    cur = db.cursor()
+    cur.execute(DDL)
+    db.commit()
+    cur.close()
+
+
+def enqueue(db, to: str, subject: str, text: str, html: Optional[str] = None) -> int:
+    """Store one email for delivery and commit; returns its outbox id."""
+    cur = db.cursor()
+    try:
+        cur.execute(
+            f"INSERT INTO {TABLE} (recipient, subject, text_body, html_body) VALUES (%s, %s, %s, %s)",
+            (to, subject, text or "", html),
+        )
+        outbox_id = cur.lastrowid
+        db.commit()
+        return outbox_id
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def claim(db, limit: int, lease: float) -> List[Dict[str, Any]]:
+    """
+    Lease up to `limit` due rows: pending ones whose backoff has passed and
+    'sending' ones whose worker let the lease expire. A row whose lease ran
+    out on its last attempt is dead-lettered here instead of retried.
+    """
+    max_attempts = int(settings.MAIL_OUTBOX_MAX_ATTEMPTS)
+    cur = db.cursor(dictionary=True)
+    try:
+        cur.execute(
+            f"UPDATE {TABLE} SET status = '{DEAD}', last_error = 'lease expired on the last attempt' "
+            f"WHERE status = '{SENDING}' AND next_attempt_at <= NOW(6) AND attempts >= %s",
+            (max_attempts,),
+        )
+        cur.execute(
+            f"""
+            SELECT id, recipient, subject, text_body, html_body, attempts, created_at
+            FROM {TABLE}
+            WHERE next_attempt_at <= NOW(6)
+              AND (status = '{PENDING}' OR (status = '{SENDING}' AND attempts < %s))
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (max_attempts, int(limit)),
+        )
+        rows = cur.fetchall()
+        if rows:
+            ids = [r["id"] for r in rows]
+            marks = ", ".join(["%s"] * len(ids))
+            cur.execute(
+                f"UPDATE {TABLE} SET status = '{SENDING}', attempts = attempts + 1, "
+                f"next_attempt_at = NOW(6) + INTERVAL %s SECOND WHERE id IN ({marks})",
+                (int(lease), *ids),
+            )
+        db.commit()
+        for r in rows:
+            r["attempts"] += 1
+        return rows
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def backoff_seconds(attempts: int) -> int:
+    base = settings.MAIL_OUTBOX_BACKOFF
+    return int(min(base * 2 ** max(attempts - 1, 0), settings.MAIL_OUTBOX_BACKOFF_MAX))
+
+
+def mark_sent(db, ids: List[int]) -> None:
+    if not ids:
+        return
+    marks = ", ".join(["%s"] * len(ids))
+    cur = db.cursor()
+    cur.execute(
+        f"UPDATE {TABLE} SET status = '{SENT}', sent_at = NOW(6), last_error = NULL WHERE id IN ({marks})",
+        tuple(ids),
+    )
+    db.commit()
+    cur.close()
+
+
+def mark_failed(db, outbox_id: int, attempts: int, error: str) -> str:
+    """Schedule a retry, or dead-letter the row after the last attempt; returns the new status."""
+    status = DEAD if attempts >= settings.MAIL_OUTBOX_MAX_ATTEMPTS else PENDING
+    cur = db.cursor()
+    cur.execute(
+        f"UPDATE {TABLE} SET status = %s, last_error = %s, next_attempt_at = NOW(6) + INTERVAL %s SECOND WHERE id = %s",
+        (status, (error or "")[:500], backoff_seconds(attempts), outbox_id),
+    )
+    db.commit()
+    cur.close()
+    return status
+
+
+def requeue_dead(db, ids: Optional[List[int]] = None) -> int:
+    """Give dead-lettered rows (all, or `ids`) a fresh set of attempts."""
+    sql = f"UPDATE {TABLE} SET status = '{PENDING}', attempts = 0, next_attempt_at = NOW(6) WHERE status = '{DEAD}'"
+    params: tuple = ()
+    if ids:
+        sql += f" AND id IN ({', '.join(['%s'] * len(ids))})"
+        params = tuple(ids)
+    cur = db.cursor()
+    cur.execute(sql, params)
+    n = cur.rowcount
+    db.commit()
+    cur.close()
+    return n
+
+
+def purge(db, older_than_days: int) -> int:
+    cur = db.cursor()
+    cur.execute(
+        f"DELETE FROM {TABLE} WHERE status = '{SENT}' AND sent_at < NOW() - INTERVAL %s DAY",
+        (int(older_than_days),),
+    )
+    n = cur.rowcount
+    db.commit()
+    cur.close()
+    return n
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def stats(db, sample: int = 1000) -> Dict[str, Any]:
+    """Rows per status and enqueue-to-sent latency over the last `sample` sent messages."""
+    cur = db.cursor()
+    cur.execute(f"SELECT status, COUNT(*) FROM {TABLE} GROUP BY status")
+    by_status = {st: int(n) for st, n in cur.fetchall()}
+    cur.execute(
+        f"SELECT TIMESTAMPDIFF(MICROSECOND, created_at, sent_at) / 1000, attempts FROM {TABLE} "
+        f"WHERE status = '{SENT}' ORDER BY id DESC LIMIT %s",
+        (int(sample),),
+    )
+    rows = cur.fetchall()
+    cur.execute(f"SELECT MIN(created_at) FROM {TABLE} WHERE status = '{PENDING}'")
+    oldest = cur.fetchone()[0]
+    cur.close()
+    latency = [float(ms) for ms, _ in rows if ms is not None]
+    return {
+        "by_status": by_status,
+        "oldest_pending": str(oldest) if oldest else None,
+        "latency_ms": {
+            "sample": len(latency),
+            "avg": round(sum(latency) / len(latency), 1) if latency else 0.0,
+            "p50": round(_percentile(latency, 0.5), 1),
+            "p95": round(_percentile(latency, 0.95), 1),
+            "max": round(max(latency), 1) if latency else 0.0,
+        },
+        "retried": sum(1 for _, attempts in rows if attempts and attempts > 1),
+    }
+
+
+class OutboxWorker:
+    """
+    Claims a batch, sends it over one pooled SMTP session and records each
+    message's outcome. `drain(db)` is blocking; run it on a thread.
+    """
+
+    def __init__(self, pool=None, batch: Optional[int] = None, lease: Optional[float] = None, log: Callable[[str], None] = print):
+        self._pool = pool
+        self.batch = batch or settings.MAIL_OUTBOX_BATCH
+        self.lease = lease or settings.MAIL_OUTBOX_LEASE
+        self.log = log
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.passes = 0
+        self.last_send_ms = 0.0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            from utils.mailer import get_pool
+
+            self._pool = get_pool()
+        return self._pool
+
+    def send(self, rows: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        """
+        SMTP only, no database: one result per claimed row, None if it was
+        accepted. A row whose message cannot be built (e.g. a malformed
+        recipient) fails on its own; the others still go out together.
+        """
+        from utils.mailer import build_message
+
+        results: List[Optional[Exception]] = [None] * len(rows)
+        messages, built = [], []
+        sender = self.pool.config.sender
+        for i, r in enumerate(rows):
+            try:
+                messages.append(build_message(sender, r["recipient"], r["subject"], r["text_body"], r["html_body"]))
+                built.append(i)
+            except Exception as e:
+                results[i] = e
+        if messages:
+            t0 = time.perf_counter()
+            try:
+                sent = self.pool.send_batch(messages)
+            except Exception as e:
+                sent = [e] * len(messages)
+            with self._lock:
+                self.last_send_ms = (time.perf_counter() - t0) * 1000 / len(messages)
+            for i, err in zip(built, sent):
+                results[i] = err
+        return results
+
+    def record(self, db, rows: List[Dict[str, Any]], results: List[Optional[Exception]]) -> int:
+        """Mark each row sent, due for a retry or dead; returns how many were sent."""
+        ok = [r["id"] for r, err in zip(rows, results) if err is None]
+        mark_sent(db, ok)
+        retried = dead = 0
+        for r, err in zip(rows, results):
+            if err is None:
+                continue
+            if mark_failed(db, r["id"], r["attempts"], f"{type(err).__name__}: {err}") == DEAD:
+                dead += 1
+                self.log(f"[OUTBOX] #{r['id']} to {r['recipient']!r} dead after {r['attempts']} attempts: {err}")
+            else:
+                retried += 1
+        with self._lock:
+            self.sent += len(ok)
+            self.retried += retried
+            self.dead += dead
+        return len(ok)
+
+    def drain(self, db) -> int:
+        """Send batches until nothing is due; returns how many were sent."""
+        total = 0
+        while True:
+            rows = claim(db, self.batch, self.lease)
+            if not rows:
+                break
+            total += self.record(db, rows, self.send(rows))
+            if len(rows) < self.batch:
+                break
+        with self._lock:
+            self.passes += 1
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "passes": self.passes,
+                "sent": self.sent,
+                "retried": self.retried,
+                "dead": self.dead,
+                "last_send_ms_per_message": round(self.last_send_ms, 2),
+            }
+
+
+class OutboxRunner:
+    """
+    Drains the outbox from inside the app: wakes on `poke()` (called right
+    after a route enqueues) or every MAIL_OUTBOX_POLL seconds, whichever
+    comes first. Separate `python -m models.outbox` processes can run
+    alongside it.
+
+    Only claim() and the marks run on the DB executor, each with its own
+    pooled connection; the SMTP sends run on this runner's own thread with
+    no connection held, so a slow mail server never ties up the DB pool.
+    """
+
+    def __init__(self, worker: Optional[OutboxWorker] = None):
+        self.worker = worker or OutboxWorker()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def poke(self) -> None:
+        if self._wake is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox-mail")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def drain(self) -> int:
+        """One pass, like OutboxWorker.drain but never holding a connection while sending."""
+        from models.database import db_connection, run_in_db
+
+        worker, total = self.worker, 0
+        while True:
+            async with db_connection() as db:
+                rows = await run_in_db(claim, db, worker.batch, worker.lease)
+            if not rows:
+                break
+            results = await self._loop.run_in_executor(self._executor, worker.send, rows)
+            async with db_connection() as db:
+                total += await run_in_db(worker.record, db, rows, results)
+            if len(rows) < worker.batch:
+                break
+        with worker._lock:
+            worker.passes += 1
+        return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.MAIL_OUTBOX_POLL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.drain()
+            except Exception as e:
+                print(f"[OUTBOX] drain failed: {type(e).__name__}: {e}")
+
+
+outbox_runner = OutboxRunner()
+
+
+async def queue_email(db, to: str, subject: str, text: str, html: Optional[str] = None) -> bool:
+    """
+    Write an email to the outbox from a route and wake the in-app drainer.
+    False if the write failed, so the caller can fall back to sending it
+    from this process.
+    """
+    from models.database import run_in_db
+
+    try:
+        await run_in_db(enqueue, db, to, subject, text, html)
+    except Exception as e:
+        print(f"[OUTBOX] could not queue mail to {to}: {type(e).__name__}: {e}")
+        return False
+    outbox_runner.poke()
+    return True
+
+
+def _main() -> None:
+    from models.database import _connect
+
+    ap = argparse.ArgumentParser(description="Deliver queued emails from newestone.mail_outbox.")
+    ap.add_argument("--once", action="store_true", help="drain what is due and exit")
+    ap.add_argument("--poll", type=float, default=settings.MAIL_OUTBOX_POLL)
+    ap.add_argument("--requeue-dead", action="store_true", help="retry every dead-lettered message, then exit")
+    args = ap.parse_args()
+
+    worker = OutboxWorker()
+    conn = _connect()
+    try:
+        ensure_table(conn)
+        if args.requeue_dead:
+            print(f"[OUTBOX] requeued {requeue_dead(conn)} dead messages")
+            return
+        while True:
+            try:
+                n = worker.drain(conn)
+                if n:
+                    print(f"[OUTBOX] sent {n} ({worker.stats()})")
+            except Exception as e:
+                print(f"[OUTBOX] drain failed: {type(e).__name__}: {e}")
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                time.sleep(args.poll)
+                conn = _connect()
+                continue
+            if args.once:
+                break
+            time.sleep(args.poll)
+    finally:
+        worker.pool.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    _main()
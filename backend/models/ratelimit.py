@@ -0,0 +1,90 @@
+# models/ratelimit.py
+"""
+Token buckets shared by every worker process.
+
+One row per bucket holds its tokens and when they were last counted, in
+the database's clock so workers on different hosts agree. take() refills
+and spends in a single upsert: the row lock it takes serialises
+concurrent requests for the same bucket, and `granted` records whether
+this request got its tokens. A row idle for longer than its period is
+full again, so purge() can drop rows idle for a day (the longest
+configured period).
+"""
+from __future__ import annotations
+from typing import Any, Dict, Tuple
+
+TABLE = "newestone.rate_buckets"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    bucket VARCHAR(191) NOT NULL,
+    tokens DOUBLE NOT NULL,
+    granted TINYINT(1) NOT NULL,
+    updated_at DOUBLE NOT NULL,
+    PRIMARY KEY (bucket),
+    KEY idx_updated (updated_at)
+)
+"""
+
+# MySQL applies ON DUPLICATE KEY assignments left to right, so `granted`
+# is decided on the refilled balance before `tokens` is spent and
+# `updated_at` is moved on.
+_TAKE = f"""
+INSERT INTO {TABLE} (bucket, tokens, granted, updated_at)
+VALUES (%(bucket)s, IF(%(cost)s <= %(limit)s, %(limit)s - %(cost)s, %(limit)s), %(cost)s <= %(limit)s, UNIX_TIMESTAMP(NOW(6)))
+ON DUPLICATE KEY UPDATE
+    granted = LEAST(%(limit)s, tokens + (UNIX_TIMESTAMP(NOW(6)) - updated_at) * %(rate)s) >= %(cost)s,
+    tokens = LEAST(%(limit)s, tokens + (UNIX_TIMESTAMP(NOW(6)) - updated_at) * %(rate)s) - IF(granted, %(cost)s, 0),
+    updated_at = UNIX_TIMESTAMP(NOW(6))
+"""
+
+
+def ensure_table(db) -> None:
+    cur = db.cursor()
+    cur.execute(DDL)
+    db.commit()
+    cur.close()
+
+
+def take(db, bucket: str, limit: int, per_second: float, cost: int = 1) -> Tuple[bool, float]:
+    """(granted, tokens left) after taking `cost` tokens from `bucket`, in one transaction."""
+    cur = db.cursor()
+    try:
+        cur.execute(_TAKE, {"bucket": bucket, "limit": limit, "rate": per_second, "cost": cost})
+        cur.execute(f"SELECT granted, tokens FROM {TABLE} WHERE bucket = %s", (bucket,))
+        row = cur.fetchone()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+    return bool(row[0]), float(row[1])
+
+
+def purge(db, idle_seconds: int = 86400) -> int:
+    cur = db.cursor()
+    cur.execute(f"DELETE FROM {TABLE} WHERE updated_at < UNIX_TIMESTAMP() - %s", (int(idle_seconds),))
+    deleted = cur.rowcount
+    db.commit()
+    cur.close()
+    return deleted
+
+
+class DatabaseBucketStore:
+    """Bucket store on the table above; costs one pooled round trip per check."""
+
+    name = "db"
+
+    def __init__(self):
+        self.takes = 0
+
+    async def take(self, bucket: str, rate: Any, cost: int = 1) -> Tuple[bool, float]:
+        from models.database import db_connection, run_in_db
+
+        self.takes += 1
+        async with db_connection() as db:
+            return await run_in_db(take, db, bucket, rate.limit, rate.per_second, cost)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "takes": self.takes}
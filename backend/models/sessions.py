@@ -0,0 +1,124 @@
+# models/sessions.py
+"""
+Server-side session rows, shared by every worker process.
+
+The cookie carries only the session id; the JSON session dict lives
+here with an absolute expiry (unix seconds). Expired rows are ignored on
+read and deleted by purge(), which the app's session sweeper runs
+periodically (see utils/sessions.py).
+"""
+from __future__ import annotations
+import time
+from typing import Any, Dict, Optional, Tuple
+
+TABLE = "newestone.web_sessions"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    sid CHAR(43) NOT NULL,
+    data MEDIUMTEXT NOT NULL,
+    expires_at BIGINT NOT NULL,
+    PRIMARY KEY (sid),
+    KEY idx_expires (expires_at)
+)
+"""
+
+
+def ensure_table(db) -> None:
+    cur = db.cursor()
+    cur.execute(DDL)
+    db.commit()
+    cur.close()
+
+
+def load(db, sid: str) -> Optional[Tuple[str, float]]:
+    """(data, expires_at) for a live session, else None."""
+    cur = db.cursor()
+    cur.execute(f"SELECT data, expires_at FROM {TABLE} WHERE sid = %s AND expires_at > %s", (sid, int(time.time())))
+    row = cur.fetchone()
+    cur.close()
+    return (row[0], float(row[1])) if row else None
+
+
+def save(db, sid: str, data: str, expires_at: float) -> None:
+    cur = db.cursor()
+    cur.execute(
+        f"INSERT INTO {TABLE} (sid, data, expires_at) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE data = VALUES(data), expires_at = VALUES(expires_at)",
+        (sid, data, int(expires_at)),
+    )
+    db.commit()
+    cur.close()
+
+
+def delete(db, sid: str) -> None:
+    cur = db.cursor()
+    cur.execute(f"DELETE FROM {TABLE} WHERE sid = %s", (sid,))
+    db.commit()
+    cur.close()
+
+
+def purge(db, batch: int = 5000) -> int:
+    """Delete expired sessions, `batch` rows per statement; returns how many."""
+    cur = db.cursor()
+    deleted = 0
+    while True:
+        cur.execute(f"DELETE FROM {TABLE} WHERE expires_at <= %s LIMIT %s", (int(time.time()), int(batch)))
+        db.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch:
+            break
+    cur.close()
+    return deleted
+
+
+def count(db) -> int:
+    cur = db.cursor()
+    cur.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE expires_at > %s", (int(time.time()),))
+    row = cur.fetchone()
+    cur.close()
+    return int(row[0]) if row else 0
+
+
+class DatabaseSessionStore:
+    """Session store on the table above, for more than one worker process."""
+
+    name = "db"
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.deletes = 0
+        self.swept = 0
+
+    async def load(self, sid: str) -> Optional[Tuple[str, float]]:
+        from models.database import db_connection, run_in_db
+
+        self.reads += 1
+        async with db_connection() as db:
+            return await run_in_db(load, db, sid)
+
+    async def save(self, sid: str, data: str, expires_at: float) -> None:
+        from models.database import db_connection, run_in_db
+
+        self.writes += 1
+        async with db_connection() as db:
+            await run_in_db(save, db, sid, data, expires_at)
+
+    async def delete(self, sid: str) -> None:
+        from models.database import db_connection, run_in_db
+
+        self.deletes += 1
+        async with db_connection() as db:
+            await run_in_db(delete, db, sid)
+
+    async def sweep(self) -> int:
+        from models.database import db_connection, run_in_db
+
+        async with db_connection() as db:
+            n = await run_in_db(purge, db)
+        self.swept += n
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "reads": self.reads, "writes": self.writes, "deletes": self.deletes, "swept": self.swept}
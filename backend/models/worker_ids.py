@@ -0,0 +1,156 @@
+# models/worker_ids.py
+"""
+Leased worker ids for utils/ids.py.
+
+Every app process (each `uvicorn --workers N` child, on every host) takes
+one of the 1024 rows of newestone.worker_ids for itself at startup and
+keeps it by renewing the lease every WORKER_ID_LEASE / 3 seconds. A
+process that dies stops renewing, and its id is free again once the lease
+has run out. While a process holds no lease (no database at startup) its
+order ids fall back to WORKER_ID or the host/pid derived id.
+"""
+from __future__ import annotations
+import asyncio
+import os
+import secrets
+import socket
+import time
+from typing import Optional
+
+from config.settings import settings
+from utils.ids import MAX_WORKER, IdGenerator
+
+TABLE = "newestone.worker_ids"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    worker_id SMALLINT NOT NULL PRIMARY KEY,
+    owner VARCHAR(100) NULL,
+    expires_at DATETIME(6) NOT NULL DEFAULT '1970-01-01 00:00:01'
+)
+"""
+
+
+def ensure_table(db) -> None:
+    cur = db.cursor()
+    cur.execute(DDL)
+    cur.execute(f"SELECT COUNT(*) FROM {TABLE}")
+    if cur.fetchone()[0] <= MAX_WORKER:
+        cur.execute(
+            f"INSERT IGNORE INTO {TABLE} (worker_id) VALUES " + ", ".join(["(%s)"] * (MAX_WORKER + 1)),
+            tuple(range(MAX_WORKER + 1)),
+        )
+    db.commit()
+    cur.close()
+
+
+def lease(db, owner: str, seconds: float) -> Optional[int]:
+    """Take a free worker id for `owner` for `seconds`; None when all 1024 are leased."""
+    cur = db.cursor()
+    try:
+        cur.execute(
+            f"UPDATE {TABLE} SET owner = %s, expires_at = NOW(6) + INTERVAL %s SECOND "
+            f"WHERE expires_at < NOW(6) ORDER BY worker_id LIMIT 1",
+            (owner, int(seconds)),
+        )
+        cur.execute(f"SELECT worker_id FROM {TABLE} WHERE owner = %s AND expires_at >= NOW(6) LIMIT 1", (owner,))
+        row = cur.fetchone()
+        db.commit()
+        return int(row[0]) if row else None
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def renew(db, worker_id: int, owner: str, seconds: float) -> bool:
+    """Extend `owner`'s lease; False if it ran out and the id may belong to someone else now."""
+    cur = db.cursor()
+    cur.execute(
+        f"UPDATE {TABLE} SET expires_at = NOW(6) + INTERVAL %s SECOND "
+        f"WHERE worker_id = %s AND owner = %s AND expires_at >= NOW(6)",
+        (int(seconds), worker_id, owner),
+    )
+    ok = cur.rowcount == 1
+    db.commit()
+    cur.close()
+    return ok
+
+
+def release(db, worker_id: int, owner: str) -> None:
+    cur = db.cursor()
+    cur.execute(
+        f"UPDATE {TABLE} SET owner = NULL, expires_at = '1970-01-01 00:00:01' WHERE worker_id = %s AND owner = %s",
+        (worker_id, owner),
+    )
+    db.commit()
+    cur.close()
+
+
+class WorkerIdLease:
+    """
+    Holds this process's worker id lease and hands the id to `generator`.
+    Renews every `seconds / 3`; a lost lease (the process stalled past its
+    expiry) is replaced with a fresh one before the next id is needed.
+    """
+
+    def __init__(self, generator: IdGenerator, seconds: Optional[float] = None):
+        self.generator = generator
+        self.seconds = max(3.0, float(seconds or settings.WORKER_ID_LEASE))
+        self.owner = ""
+        self.worker_id: Optional[int] = None
+        self._held_until = 0.0  # monotonic; past it the id may have been leased to another process
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            # pid and host make the owner readable in the table; the token makes it unique
+            self.owner = f"{socket.gethostname()[:60]}:{os.getpid()}:{secrets.token_hex(8)}"
+            await self._tick()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        from models.database import db_connection, run_in_db
+
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.worker_id is not None:
+            try:
+                async with db_connection() as db:
+                    await run_in_db(release, db, self.worker_id, self.owner)
+            except Exception as e:
+                print(f"[WORKER-ID] could not release {self.worker_id}: {type(e).__name__}: {e}")
+            self.worker_id = None
+            self.generator.assign(None)
+
+    async def _tick(self) -> None:
+        from models.database import db_connection, run_in_db
+
+        asked = time.monotonic()
+        try:
+            async with db_connection() as db:
+                if self.worker_id is not None and await run_in_db(renew, db, self.worker_id, self.owner, self.seconds):
+                    self._held_until = asked + self.seconds
+                    return
+                if self.worker_id is not None:
+                    print(f"[WORKER-ID] lease on {self.worker_id} was lost, taking a new one")
+                self.worker_id = await run_in_db(lease, db, self.owner, self.seconds)
+        except Exception as e:
+            print(f"[WORKER-ID] lease failed: {type(e).__name__}: {e}")
+            if self.worker_id is not None and time.monotonic() >= self._held_until:
+                # Could not renew in time: stop using an id that is free for others again
+                self.worker_id = None
+                self.generator.assign(None)
+            return
+        self._held_until = asked + self.seconds
+        if self.worker_id is None:
+            print("[WORKER-ID] every worker id is leased; using the fallback id")
+        self.generator.assign(self.worker_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.seconds / 3)
+            await self._tick()
@@ -1,23 +1,31 @@
 # auth_routes.py
 from fastapi import APIRouter, Depends, Form, Request, status
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from typing import Annotated
-from pathlib import Path
-import os, random, time
+import random, time
 import mysql.connector
 
-from models.database import get_db_connection
-from .smtp_helper import send_email
+from models.database import get_db_connection, run_in_db
+from models import outbox
+from config.settings import settings
+from utils.templating import templates
+from utils.mailer import mailer, send_email, valid_address
+from utils.ratelimit import client_ip, limiter
+from utils.sessions import rotate_session
 
 router = APIRouter()
 
-# Resolve templates as <project-root>/frontend/templates
-PROJECT_ROOT = Path(__file__).resolve().parents[2].parent
-TEMPLATES_DIR = (PROJECT_ROOT / "frontend" / "templates").resolve()
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
-
-PRINT_OTP = os.getenv("PRINT_OTP", "1") == "1"
+def _check_credentials(db: mysql.connector.MySQLConnection, email: str, password: str) -> bool:
+    # Validate credentials (plain-text compare with encrypted_password)
+    cur = db.cursor()
+    cur.execute(
+        "SELECT 1 FROM newestone.users WHERE email=%s AND encrypted_password=%s LIMIT 1",
+        (email, password),
+    )
+    ok = cur.fetchone()
+    cur.close()
+    return bool(ok)
 
 @router.get("/admin")
 async def admin(request: Request):
@@ -30,15 +38,14 @@ async def login_user(
     password: Annotated[str, Form()],
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    # Validate credentials (plain-text compare with encrypted_password)
-    cur = db.cursor()
-    cur.execute(
-        "SELECT 1 FROM newestone.users WHERE email=%s AND encrypted_password=%s LIMIT 1",
-        (email, password),
+    # Before the password check: caps guessing as well as OTP mail
+    await limiter.enforce(
+        ("login-ip", client_ip(request), settings.RATE_LIMIT_LOGIN_IP),
+        ("login-email", email.strip(), settings.RATE_LIMIT_LOGIN_EMAIL),
     )
-    ok = cur.fetchone()
-    cur.close()
-
+    if not valid_address(email):
+        return RedirectResponse(url="/admin?err=badcreds", status_code=status.HTTP_303_SEE_OTHER)
+    ok = await run_in_db(_check_credentials, db, email, password)
     if not ok:
         return RedirectResponse(url="/admin?err=badcreds", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -48,18 +55,16 @@ async def login_user(
     request.session["otp_exp"] = int(time.time()) + 300  # 5 minutes
     request.session["otp_email"] = email
 
-    if PRINT_OTP:
+    if settings.PRINT_OTP:
         print(f"[DEV OTP] {code} -> {email}")
 
     # Send email (do not clear OTP if it fails)
-    try:
-        send_email(
-            to=email,
-            subject="Your login code",
-            text=f"Your OTP is {code}. It expires in 5 minutes."
-        )
-    except Exception as e:
-        print(f"[EMAIL ERROR] {e}")
+    subject, text = "Your login code", f"Your OTP is {code}. It expires in 5 minutes."
+    if not await outbox.queue_email(db, email, subject, text) and not mailer.enqueue(email, subject, text):
+        try:
+            await run_in_threadpool(send_email, to=email, subject=subject, text=text)
+        except Exception as e:
+            print(f"[EMAIL ERROR] {e}")
 
     return RedirectResponse(url="/auth", status_code=status.HTTP_303_SEE_OTHER)
 
@@ -90,18 +95,19 @@ async def otp_verify(
     request.session.pop("otp", None)
     request.session.pop("otp_exp", None)
     request.session["user_email"] = otp_email
+    # New session id at login: an id fixed on the victim beforehand stays anonymous
+    rotate_session(request)
     request.session.pop("otp_email", None)
 
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.get("/mail-debug")
 async def mail_debug():
-    import os
     return {
-        "SMTP_USER": os.getenv("SMTP_USER"),
-        "EMAIL_FROM": os.getenv("EMAIL_FROM"),
-        "SMTP_HOST": os.getenv("SMTP_HOST"),
-        "SMTP_PORT": os.getenv("SMTP_PORT"),
-        "SMTP_SECURITY": os.getenv("SMTP_SECURITY"),
+        "SMTP_USER": settings.SMTP_USER or None,
+        "EMAIL_FROM": settings.smtp_sender,
+        "SMTP_HOST": settings.SMTP_HOST,
+        "SMTP_PORT": settings.SMTP_PORT,
+        "SMTP_SECURITY": settings.smtp_security,
     }
  
\ No newline at end of file
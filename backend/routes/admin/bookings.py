@@ -8,11 +8,12 @@ from fastapi import (
     status,
     UploadFile
 )
-from fastapi.templating import Jinja2Templates
-from models.database import get_db_connection
+from models.database import get_db_connection, run_in_db
+from models import booking_rollups, capacity
 import mysql.connector
 from fastapi.responses import RedirectResponse
 from config.settings import settings
+from utils.templating import templates
 import os
 import shutil
 from typing import List, Annotated
@@ -25,17 +26,40 @@ router = APIRouter(
     tags=["bookings"]
 )
 
-templates = Jinja2Templates(directory="../frontend/templates")
+def _set_booking_status(db: mysql.connector.MySQLConnection, id: int, status: str) -> None:
+    cursor = db.cursor()
+    try:
+        row = booking_rollups.move_booking_status(cursor, id, status)
+        if row is not None and row[1] is not None and row[0] is not None:
+            restaurant_id, at, guests, old, order_id = row
+            was_held = (old or "").lower() not in capacity.RELEASED_STATUSES
+            held = status.lower() not in capacity.RELEASED_STATUSES
+            if was_held and not held:
+                capacity.release(cursor, restaurant_id, at, guests or 0, order_id)
+            elif held and not was_held:
+                # An admin re-instating a booking may go over capacity
+                capacity.reserve(cursor, restaurant_id, at, guests or 0, order_id=order_id, force=True)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def _remove_all_bookings(db: mysql.connector.MySQLConnection) -> None:
+    cursor = db.cursor()
+    cursor.execute("delete from newestone.bookings")
+    booking_rollups.clear(cursor)
+    capacity.clear(cursor)
+    db.commit()
+    cursor.close()
 
 @router.post("/confirm-booking")
 async def confirm_booking(
     id : Annotated[int, Form()],     
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor()
-    cursor.execute ("Update newestone.bookings set status = 'confirmed' where id = %s",(id,) )
-    db.commit()
-    cursor.close()
+    await run_in_db(_set_booking_status, db, id, "confirmed")
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/pend-booking")
@@ -43,10 +67,7 @@ async def cancel_booking(
     id : Annotated[int, Form()],     
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor()
-    cursor.execute("Update newestone.bookings set status = 'pending' where id = %s",(id,) )
-    db.commit()
-    cursor.close()
+    await run_in_db(_set_booking_status, db, id, "pending")
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/cancel-booking")
@@ -54,10 +75,7 @@ async def cancel_booking(
     id : Annotated[int, Form()],     
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor()
-    cursor.execute("Update newestone.bookings set status = 'cancelled' where id = %s",(id,) )
-    db.commit()
-    cursor.close()
+    await run_in_db(_set_booking_status, db, id, "cancelled")
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 @router.post("/remove_all_bookings")
@@ -65,12 +83,8 @@ async def remove_all_bookings(
     confirm : Annotated[str, Form()],
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor()
-    
     if(confirm == "confirm"):
-        cursor.execute("delete from newestone.bookings")
-        db.commit()
-        cursor.close()
+        await run_in_db(_remove_all_bookings, db)
         return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
     else:
         return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
\ No newline at end of file
@@ -8,14 +8,18 @@ from fastapi import (
     status,
     UploadFile
 )
-from fastapi.templating import Jinja2Templates
-from models.database import get_db_connection
+from models.database import get_db_connection, run_in_db
+from models import booking_rollups
 import mysql.connector
+from fastapi import HTTPException, Query
 from fastapi.responses import RedirectResponse
 from config.settings import settings
+from utils.pagination import Page, encode_cursor, decode_cursor, with_query
+from utils.templating import templates
 import os
 import shutil
-from typing import List, Annotated
+from typing import Any, List, Annotated, Dict, Optional, Tuple
+from datetime import date, timedelta
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -25,36 +29,200 @@ router = APIRouter(
     tags=["dashboard"]
 )
 
-templates = Jinja2Templates(directory="../frontend/templates")
+# Dashboard sections: each one is fetched on demand, a page at a time,
+# keyed on the primary key (the order `select *` returned before). Menu
+# items are managed per restaurant (Manage Menu), not as a section.
+SECTIONS = {
+    "bookings": "newestone.bookings",
+    "restaurants": "newestone.restaurants",
+    "events": "newestone.events",
+}
+BOOKING_STATUSES = ["pending", "confirmed", "cancelled"]
+
+def _section_where(section: str, filters: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    """SQL conditions for the filters that apply to `section`; others are ignored."""
+    where: List[str] = []
+    params: List[Any] = []
+    if filters.get("restaurant_id") is not None and section in ("bookings", "events"):
+        where.append("restaurant_id = %s")
+        params.append(filters["restaurant_id"])
+    if section == "bookings":
+        statuses = [st for st in filters.get("status") or [] if st in BOOKING_STATUSES]
+        if statuses:
+            where.append(f"status IN ({', '.join(['%s'] * len(statuses))})")
+            params += statuses
+        if filters.get("date_from"):
+            where.append("booking_datetime >= %s")
+            params.append(filters["date_from"])
+        if filters.get("date_to"):
+            # Inclusive end date: everything before the following midnight.
+            where.append("booking_datetime < %s")
+            params.append(filters["date_to"] + timedelta(days=1))
+    elif section == "restaurants":
+        if filters.get("q"):
+            where.append("name LIKE %s")
+            params.append(f"%{filters['q']}%")
+        if filters.get("tag"):
+            where.append("LOWER(tag) = %s")
+            params.append(filters["tag"].strip().lower())
+    elif section == "events":
+        if filters.get("upcoming"):
+            where.append("event_datetime >= NOW()")
+    return where, params
+
+def _fetch_section(
+    db: mysql.connector.MySQLConnection,
+    section: str,
+    after_id: int,
+    limit: int,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Page[dict]:
+    where, params = _section_where(section, filters or {})
+    where.insert(0, "id > %s")
+    params.insert(0, after_id)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        f"select * from {SECTIONS[section]} where {' and '.join(where)} order by id limit %s",
+        (*params, limit + 1),
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return Page(rows, limit, encode_cursor([rows[-1]["id"]]))
+    return Page(rows, limit)
+
+def _fetch_summary(db: mysql.connector.MySQLConnection) -> Dict[str, Any]:
+    """
+    Counts shown above the sections; aggregates only, no rows. Booking
+    totals come from the rollups, so they cost the same however many
+    bookings there are.
+    """
+    by_status = booking_rollups.status_totals(db)
+    cursor = db.cursor()
+    cursor.execute("select count(*) from newestone.restaurants")
+    restaurants = int(cursor.fetchone()[0])
+    cursor.execute("select count(*) from newestone.menu_items")
+    menu_items = int(cursor.fetchone()[0])
+    cursor.execute("select count(*) from newestone.events where event_datetime >= NOW()")
+    upcoming_events = int(cursor.fetchone()[0])
+    cursor.close()
+    return {
+        "bookings": sum(by_status.values()),
+        "bookings_by_status": by_status,
+        "restaurants": restaurants,
+        "menu_items": menu_items,
+        "upcoming_events": upcoming_events,
+    }
+
+def _after_id(token: Optional[str]) -> int:
+    try:
+        key = decode_cursor(token)
+        return int(key[0]) if key else 0
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _section_filters(
+    status_: List[str] = Query([], alias="status"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    restaurant_id: Optional[int] = Query(None),
+    q: Optional[str] = Query(None, max_length=100),
+    tag: Optional[str] = Query(None, max_length=50),
+    upcoming: bool = Query(False),
+) -> Dict[str, Any]:
+    return {
+        "status": [st.strip().lower() for st in status_ if st and st.strip()],
+        "date_from": date_from,
+        "date_to": date_to,
+        "restaurant_id": restaurant_id,
+        "q": (q or "").strip() or None,
+        "tag": tag,
+        "upcoming": upcoming,
+    }
+
+def _check_section(section: str) -> None:
+    if section not in SECTIONS:
+        raise HTTPException(status_code=404, detail=f"section must be one of {', '.join(SECTIONS)}")
 
 @router.get("/dashboard")
 async def dashboard(
     request: Request,
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor(dictionary=True)
-    
-    q = "select * from newestone.restaurants"
-    cursor.execute(q)
-    restaurant_data = cursor.fetchall()
-    
-    q2 = "select * from newestone.menu_items"
-    cursor.execute(q2)
-    menu_data = cursor.fetchall()
-    
-    cursor.execute("select * from newestone.events")
-    events = cursor.fetchall()
-    
-    cursor.execute("select * from newestone.bookings") 
-    bookings = cursor.fetchall()
-    cursor.close() 
+    # Only the summary is rendered here; db.html loads each section's rows
+    # from /dashboard/section/{section} when it is first shown.
+    summary = await run_in_db(_fetch_summary, db)
     return templates.TemplateResponse(
         "db.html",
         {
             "request": request,
-            "restaurants": restaurant_data,
-            "menu_data": menu_data,
-            "bookings": bookings,
-            "events" : events
+            "summary": summary,
+            "booking_statuses": BOOKING_STATUSES,
+            "page_size": settings.PAGE_SIZE,
         },
-    )
\ No newline at end of file
+    )
+
+@router.get("/dashboard/section/{section}")
+async def dashboard_section(
+    request: Request,
+    section: str,
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None),
+    filters: Dict[str, Any] = Depends(_section_filters),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    """One page of a section as table rows (HTML), ending in a "load more" row if there is more."""
+    _check_section(section)
+    page = await run_in_db(_fetch_section, db, section, _after_id(after), limit, filters)
+    next_url = with_query(request.url.path, request.query_params.multi_items(), after=page.next_cursor) if page.next_cursor else None
+    return templates.TemplateResponse(
+        "db_section.html",
+        {"request": request, "section": section, "rows": page.items, "next_url": next_url},
+    )
+
+@router.get("/dashboard/data")
+async def dashboard_data(
+    request: Request,
+    section: str = Query(...),
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None),
+    filters: Dict[str, Any] = Depends(_section_filters),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    _check_section(section)
+    page = await run_in_db(_fetch_section, db, section, _after_id(after), limit, filters)
+    return {
+        "section": section,
+        "count": len(page.items),
+        "limit": limit,
+        "next_cursor": page.next_cursor,
+        "next": with_query("/dashboard/data", request.query_params.multi_items(), after=page.next_cursor) if page.next_cursor else None,
+        "results": page.items,
+    }
+
+@router.get("/dashboard/summary")
+async def dashboard_summary(db: mysql.connector.MySQLConnection = Depends(get_db_connection)):
+    return await run_in_db(_fetch_summary, db)
+
+@router.get("/dashboard/kpis")
+async def dashboard_kpis(
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    restaurant_id: Optional[int] = Query(None),
+    top: int = Query(10, ge=1, le=100),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    """Booking KPIs read from the daily rollup, never from newestone.bookings."""
+    return await run_in_db(
+        booking_rollups.kpis, db, date_from=date_from, date_to=date_to, restaurant_id=restaurant_id, top=top
+    )
+
+@router.get("/dashboard/heatmap")
+async def dashboard_heatmap(
+    restaurant_id: Optional[int] = Query(None),
+    status_: Optional[str] = Query(None, alias="status", max_length=16),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    """Weekday x hour occupancy read from the hourly rollup."""
+    return await run_in_db(booking_rollups.heatmap, db, restaurant_id=restaurant_id, status=status_)
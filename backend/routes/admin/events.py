@@ -8,11 +8,11 @@ from fastapi import (
     status,
     UploadFile
 )
-from fastapi.templating import Jinja2Templates
-from models.database import get_db_connection
+from models.database import get_db_connection, run_in_db
 import mysql.connector
 from fastapi.responses import RedirectResponse
 from config.settings import settings
+from utils.templating import templates
 import os
 import shutil
 from typing import List, Annotated
@@ -26,8 +26,19 @@ router = APIRouter(
     tags=["index"]
 )
 
-templates = Jinja2Templates(directory="../frontend/templates")
+def _add_event(db: mysql.connector.MySQLConnection, restaurant_id: int, name: str, event_description: str, datetime: str) -> None:
+    cursor = db.cursor()
+    update_query = "insert into newestone.events (event_name,event_description,event_datetime, restaurant_id) values (%s,%s,%s,%s) "
+    cursor.execute(update_query, (name, event_description, datetime, restaurant_id))
+    db.commit()
+    cursor.close()
 
+def _clear_event(db: mysql.connector.MySQLConnection, id: int) -> None:
+    cursor = db.cursor()
+    clear_query = "delete from newestone.events WHERE id = %s"
+    cursor.execute(clear_query, (id,))
+    db.commit()
+    cursor.close()
 
 @router.post("/add-event")
 async def add_event(
@@ -37,11 +48,7 @@ async def add_event(
     datetime: Annotated[str, Form()],
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor()
-    update_query = "insert into newestone.events (event_name,event_description,event_datetime, restaurant_id) values (%s,%s,%s,%s) "
-    cursor.execute(update_query, (name, event_description, datetime, restaurant_id))
-    db.commit()
-    cursor.close()
+    await run_in_db(_add_event, db, restaurant_id, name, event_description, datetime)
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
 
@@ -50,10 +57,6 @@ async def clear_event(
     id: Annotated[int, Form()],
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor()
-    clear_query = "delete from newestone.events WHERE id = %s"
-    cursor.execute(clear_query, (id,))
-    db.commit()
-    cursor.close()
+    await run_in_db(_clear_event, db, id)
     return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
     
\ No newline at end of file
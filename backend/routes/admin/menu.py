@@ -1,13 +1,14 @@
 # routes/admin/menu.py
 from fastapi import APIRouter, Depends, File, Form, Request, UploadFile, status
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 from pathlib import Path
 from typing import Annotated, Optional
 import mysql.connector
 import os, shutil, uuid
 
-from models.database import get_db_connection
+from models.database import get_db_connection, run_in_db
+from models.catalog import notify_catalog_changed
+from utils.templating import templates
 
 router = APIRouter(tags=["menu"])
 
@@ -15,24 +16,11 @@ router = APIRouter(tags=["menu"])
 # This file lives at .../backend/routes/admin/menu.py
 BACKEND_DIR = Path(__file__).resolve().parents[2]           # .../backend
 FRONTEND_DIR = BACKEND_DIR.parent / "frontend"              # .../frontend
-TEMPLATES_DIR = FRONTEND_DIR / "templates"
 STATIC_DIR = FRONTEND_DIR / "static"                        # <— where we will save images
 STATIC_DIR.mkdir(parents=True, exist_ok=True)
 
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
-
-@router.post("/admin_menu")
-async def admin_menu_post(id: Annotated[int, Form()], request: Request):
-    return RedirectResponse(url=f"/admin_menu/{id}", status_code=status.HTTP_303_SEE_OTHER)
-
-
-@router.get("/admin_menu/{restaurant_id}")
-async def admin_menu(
-    request: Request,
-    restaurant_id: int,
-    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
-):
+def _fetch_menu_page(db: mysql.connector.MySQLConnection, restaurant_id: int):
     cur = db.cursor(dictionary=True)
     cur.execute("SELECT * FROM newestone.restaurants WHERE id = %s", (restaurant_id,))
     restaurant = cur.fetchone()
@@ -40,29 +28,17 @@ async def admin_menu(
     cur.execute("SELECT * FROM newestone.menu_items WHERE restaurant_id = %s", (restaurant_id,))
     menu_items = cur.fetchall()
     cur.close()
+    return restaurant, menu_items
 
-    if not restaurant:
-        return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
-    return templates.TemplateResponse(
-        "menu.html",
-        {"request": request, "restaurant": restaurant, "menu_items": menu_items},
-    )
-
-
-@router.post("/add-menu-item")
-async def add_menu_item(
-    restaurant_id: Annotated[int, Form(...)],
-    name: Annotated[str, Form(...)],
-    description: Annotated[str, Form(...)],
-    price: Annotated[float, Form(...)],
-    picture: Optional[UploadFile] = File(None),
-    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
-):
-    """
-    Saves the uploaded picture into frontend/static and writes '/static/<filename>'
-    into newestone.menu_items.image_url.
-    """
+def _insert_menu_item(
+    db: mysql.connector.MySQLConnection,
+    restaurant_id: int,
+    name: str,
+    description: str,
+    price: float,
+    picture: Optional[UploadFile],
+) -> None:
     image_url_path: Optional[str] = None
 
     if picture and picture.filename:
@@ -90,15 +66,8 @@ async def add_menu_item(
     db.commit()
     cur.close()
 
-    # Go back to this restaurant's menu page
-    return RedirectResponse(url=f"/admin_menu/{restaurant_id}?msg=added", status_code=status.HTTP_303_SEE_OTHER)
-
 
-@router.post("/delete-menu-item")
-async def delete_item(
-    id: Annotated[int, Form(...)],
-    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
-):
+def _delete_menu_item(db: mysql.connector.MySQLConnection, id: int) -> Optional[int]:
     cur = db.cursor()
 
     # Optional: fetch image path to delete file from disk too
@@ -118,6 +87,58 @@ async def delete_item(
     cur.execute("DELETE FROM newestone.menu_items WHERE id=%s", (id,))
     db.commit()
     cur.close()
+    return restaurant_id
+
+
+@router.post("/admin_menu")
+async def admin_menu_post(id: Annotated[int, Form()], request: Request):
+    return RedirectResponse(url=f"/admin_menu/{id}", status_code=status.HTTP_303_SEE_OTHER)
+
+
+@router.get("/admin_menu/{restaurant_id}")
+async def admin_menu(
+    request: Request,
+    restaurant_id: int,
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    restaurant, menu_items = await run_in_db(_fetch_menu_page, db, restaurant_id)
+
+    if not restaurant:
+        return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
+
+    return templates.TemplateResponse(
+        "menu.html",
+        {"request": request, "restaurant": restaurant, "menu_items": menu_items},
+    )
+
+
+@router.post("/add-menu-item")
+async def add_menu_item(
+    restaurant_id: Annotated[int, Form(...)],
+    name: Annotated[str, Form(...)],
+    description: Annotated[str, Form(...)],
+    price: Annotated[float, Form(...)],
+    picture: Optional[UploadFile] = File(None),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    """
+    Saves the uploaded picture into frontend/static and writes '/static/<filename>'
+    into newestone.menu_items.image_url.
+    """
+    await run_in_db(_insert_menu_item, db, restaurant_id, name, description, price, picture)
+    notify_catalog_changed(restaurant_id)
+
+    # Go back to this restaurant's menu page
+    return RedirectResponse(url=f"/admin_menu/{restaurant_id}?msg=added", status_code=status.HTTP_303_SEE_OTHER)
+
+
+@router.post("/delete-menu-item")
+async def delete_item(
+    id: Annotated[int, Form(...)],
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    restaurant_id = await run_in_db(_delete_menu_item, db, id)
+    notify_catalog_changed(restaurant_id)
 
     # If we know the restaurant, take the user back there; else go to dashboard
     if restaurant_id:
@@ -1,22 +1,24 @@
 from typing import List, Annotated, Optional
-from fastapi import APIRouter, Depends, File, Form, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
 from fastapi.responses import RedirectResponse
 import mysql.connector, os, shutil
-from models.database import get_db_connection
+from models.database import get_db_connection, run_in_db
+from models.catalog import notify_catalog_changed
+from models import capacity
+from utils.geo_index import restaurant_geo_index
 
 router = APIRouter(tags=["restaurants"])
 
-@router.post("/send")
-async def send_data_of_restaurant(
-    name: Annotated[str, Form()],
-    description: Annotated[str, Form()],
-    longitude: Annotated[float, Form()],
-    latitude: Annotated[float, Form()],
-    tag: Annotated[Optional[str], Form()] = None,
-    price_range: Annotated[str, Form()] = "1",            # <- accept "$", "$$", or "1".."4"
-    pictures: Optional[List[UploadFile]] = File(None),
-    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
-):
+def _upsert_restaurant(
+    db: mysql.connector.MySQLConnection,
+    name: str,
+    description: str,
+    longitude: float,
+    latitude: float,
+    tag: Optional[str],
+    price_range: str,
+    pictures: Optional[List[UploadFile]],
+) -> int:
     pr = price_range
     tag = tag or None
 
@@ -56,28 +58,24 @@ async def send_data_of_restaurant(
             cur.execute(
                 "INSERT INTO newestone.image_for_restaurant (restaurant_id, image_url) VALUES (%s,%s)",
                 (restaurant_id, f"/static/{picture.filename}"),
-                
-                
             )
 
-    
     db.commit()
     cur.close()
-    return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
-
-
-@router.post("/editrestaurant")
-async def edit_restaurant(
-    id: Annotated[int, Form()],
-    name: Annotated[str, Form()],
-    description: Annotated[str, Form()],
-    longitude: Annotated[float, Form()],
-    latitude: Annotated[float, Form()],
-    tag: Annotated[Optional[str], Form()] = None,
-    price_range: Annotated[str, Form()] = "1",            # <- accept "$", "$$", or "1".."4"
-    pictures: Optional[List[UploadFile]] = File(None),
-    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
-):
+    return restaurant_id
+
+
+def _update_restaurant(
+    db: mysql.connector.MySQLConnection,
+    id: int,
+    name: str,
+    description: str,
+    longitude: float,
+    latitude: float,
+    tag: Optional[str],
+    price_range: str,
+    pictures: Optional[List[UploadFile]],
+) -> None:
     pr = price_range
     tag = tag or None
 
@@ -107,13 +105,9 @@ async def edit_restaurant(
 
     db.commit()
     cur.close()
-    return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
 
-@router.post("/delete-restaurant", name="delete_restaurant")
-async def delete_restaurant(
-    id: Annotated[int, Form()],
-    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
-):
+
+def _delete_restaurant(db: mysql.connector.MySQLConnection, id: int) -> int:
     cur = db.cursor()
     try:
         # delete children first (adjust table names to your schema)
@@ -127,15 +121,80 @@ async def delete_restaurant(
 
         if affected == 0:
             db.rollback()
-            # redirect with a message (or raise 404 if you prefer JSON)
-            return RedirectResponse("/dashboard?msg=notfound", status_code=status.HTTP_303_SEE_OTHER)
+            return 0
 
         db.commit()
-    except mysql.connector.Error as e:
+        return affected
+    except mysql.connector.Error:
         db.rollback()
-        # If you still hit FK issues, your FKs don’t reference the tables above—inspect e.errno.
-        raise HTTPException(status_code=409, detail=f"Delete failed: {e.msg}")
+        raise
     finally:
         cur.close()
 
-    return RedirectResponse("/dashboard?msg=deleted", status_code=status.HTTP_303_SEE_OTHER)
\ No newline at end of file
+
+@router.post("/send")
+async def send_data_of_restaurant(
+    name: Annotated[str, Form()],
+    description: Annotated[str, Form()],
+    longitude: Annotated[float, Form()],
+    latitude: Annotated[float, Form()],
+    tag: Annotated[Optional[str], Form()] = None,
+    price_range: Annotated[str, Form()] = "1",            # <- accept "$", "$$", or "1".."4"
+    pictures: Optional[List[UploadFile]] = File(None),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    restaurant_id = await run_in_db(_upsert_restaurant, db, name, description, longitude, latitude, tag, price_range, pictures)
+    restaurant_geo_index.upsert(restaurant_id, latitude, longitude)
+    notify_catalog_changed(restaurant_id)
+    return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
+
+
+@router.post("/editrestaurant")
+async def edit_restaurant(
+    id: Annotated[int, Form()],
+    name: Annotated[str, Form()],
+    description: Annotated[str, Form()],
+    longitude: Annotated[float, Form()],
+    latitude: Annotated[float, Form()],
+    tag: Annotated[Optional[str], Form()] = None,
+    price_range: Annotated[str, Form()] = "1",            # <- accept "$", "$$", or "1".."4"
+    pictures: Optional[List[UploadFile]] = File(None),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    await run_in_db(_update_restaurant, db, id, name, description, longitude, latitude, tag, price_range, pictures)
+    restaurant_geo_index.upsert(id, latitude, longitude)
+    notify_catalog_changed(id)
+    return RedirectResponse(url="/dashboard", status_code=status.HTTP_303_SEE_OTHER)
+
+@router.post("/delete-restaurant", name="delete_restaurant")
+async def delete_restaurant(
+    id: Annotated[int, Form()],
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    try:
+        affected = await run_in_db(_delete_restaurant, db, id)
+    except mysql.connector.Error as e:
+        # If you still hit FK issues, your FKs don’t reference the tables above—inspect e.errno.
+        raise HTTPException(status_code=409, detail=f"Delete failed: {e.msg}")
+    if affected == 0:
+        # redirect with a message (or raise 404 if you prefer JSON)
+        return RedirectResponse("/dashboard?msg=notfound", status_code=status.HTTP_303_SEE_OTHER)
+    restaurant_geo_index.remove(id)
+    notify_catalog_changed(id)
+
+    return RedirectResponse("/dashboard?msg=deleted", status_code=status.HTTP_303_SEE_OTHER)
+
+@router.post("/restaurant-capacity")
+async def set_restaurant_capacity(
+    restaurant_id: Annotated[int, Form()],
+    seats: Annotated[int, Form()],
+    slot_minutes: Annotated[int, Form()] = 30,
+    opens: Annotated[Optional[str], Form()] = None,
+    closes: Annotated[Optional[str], Form()] = None,
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    try:
+        await run_in_db(capacity.set_config, db, restaurant_id, seats, slot_minutes, opens, closes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RedirectResponse("/dashboard?msg=capacity", status_code=status.HTTP_303_SEE_OTHER)
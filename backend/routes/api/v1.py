@@ -0,0 +1,155 @@
+# routes/api/v1.py
+"""
+Versioned JSON API over the restaurant catalog, for the mobile client.
+
+Encoded bodies are kept in the catalog cache next to their ETag, so they
+are dropped by the same notify_catalog_changed() calls as the data they
+were built from. A request whose If-None-Match names the cached tag gets
+a 304 without a database connection being checked out.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+
+from config.settings import settings
+from models.catalog import catalog_cache
+from models.database import db_connection, run_in_db
+from routes.public.userdb import ALLOWED_TAGS, PRICE_RANGES, CachedRestaurantRepository, RestaurantService
+from utils.json_response import conditional_json, dumps, etag_for
+from utils.pagination import Page, decode_cursor, encode_cursor, with_query
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+Encoded = Tuple[bytes, str]  # (JSON body, ETag)
+
+
+def _build(fn: Callable[[RestaurantService], Any]) -> Callable[[Any], Optional[bytes]]:
+    def run(db: Any) -> Optional[bytes]:
+        data = fn(RestaurantService(CachedRestaurantRepository(db)))
+        return None if data is None else dumps(data)
+    return run
+
+
+async def _respond(request: Request, key: Optional[Hashable], fn: Callable[[RestaurantService], Any]) -> Response:
+    """
+    Serve `fn(service)` as JSON with an ETag. `key` names the body in the
+    catalog cache (None for responses not worth caching); `fn` returning
+    None means 404.
+    """
+    cache_key = ("api", key) if key is not None else None
+    hit: Optional[Encoded] = catalog_cache.get(cache_key) if cache_key else None
+    if hit is None:
+        generation = catalog_cache.generation
+        async with db_connection() as db:
+            try:
+                body = await run_in_db(_build(fn), db)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        if body is None:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        hit = (body, etag_for(body))
+        if cache_key:
+            catalog_cache.set(cache_key, hit, generation=generation)
+    body, etag = hit
+    return conditional_json(request, body, etag, max_age=settings.API_MAX_AGE)
+
+
+def _cursor(after: Optional[str]):
+    try:
+        return decode_cursor(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor")
+
+
+def _normalize_sort(sort: Optional[str]) -> Optional[str]:
+    """Sort spec without blanks or repeated fields (only a field's first key decides)."""
+    parts, seen = [], set()
+    for part in (sort or "").split(","):
+        part = part.strip()
+        field = part.partition(":")[0].lstrip("+-").strip()
+        if part and field not in seen:
+            seen.add(field)
+            parts.append(part)
+    return ",".join(parts) or None
+
+
+def _page_body(request: Request, page: Page, params: List[Tuple[str, Any]]) -> Dict[str, Any]:
+    return {
+        "count": len(page.items),
+        "limit": page.limit,
+        "next_cursor": page.next_cursor,
+        "next": with_query(request.url.path, params, after=page.next_cursor)
+        if page.next_cursor else None,
+        "sort": page.meta.get("sort"),
+        "facets": page.meta.get("facets"),
+        "results": page.items,
+    }
+
+
+@router.get("/restaurants")
+async def list_restaurants(
+    request: Request,
+    sort: Optional[str] = Query(None),
+    price_range: List[int] = Query([]),
+    tag: List[str] = Query([]),
+    min_rating: Optional[int] = Query(None, ge=0, le=5),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lng: Optional[float] = Query(None, ge=-180, le=180),
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None),
+):
+    cursor = _cursor(after)
+    tags = sorted({t.strip().lower() for t in tag if t and t.strip()})
+    prices = sorted({p for p in price_range if p in PRICE_RANGES})
+    sort = _normalize_sort(sort)
+    # Only the parameters this route reads, in one canonical order: they
+    # name the cached body and its `next` link, so unknown or reordered
+    # query parameters cannot fill the catalog cache with copies.
+    params: List[Tuple[str, Any]] = [("sort", sort)] if sort else []
+    params += [("price_range", p) for p in prices] + [("tag", t) for t in tags]
+    if min_rating is not None:
+        params.append(("min_rating", min_rating))
+    params.append(("limit", limit))
+
+    def load(service: RestaurantService) -> Dict[str, Any]:
+        page = service.list_for_dashboard(
+            price_range=prices,
+            tag=tags,
+            min_rating=min_rating,
+            sort=sort,
+            user_lat=lat,
+            user_lng=lng,
+            after=cursor,
+            limit=limit,
+        )
+        here = [(k, v) for k, v in (("lat", lat), ("lng", lng)) if v is not None]
+        return _page_body(request, page, params + here)
+
+    # Per-user coordinates and unknown tags would only churn the cache; those
+    # pages still get an ETag. Cursors are keyed re-encoded, so padding or
+    # other spellings of the same key share one entry.
+    cacheable = lat is None and lng is None and set(tags) <= set(ALLOWED_TAGS)
+    key = ("restaurants", tuple(params), encode_cursor(cursor) if cursor is not None else None) if cacheable else None
+    return await _respond(request, key, load)
+
+
+@router.get("/restaurants/{restaurant_id}")
+async def get_restaurant(request: Request, restaurant_id: int):
+    def load(service: RestaurantService) -> Optional[Dict[str, Any]]:
+        restaurant, _ = service.details(restaurant_id)
+        return restaurant
+
+    return await _respond(request, ("restaurant", restaurant_id), load)
+
+
+@router.get("/restaurants/{restaurant_id}/menu")
+async def get_restaurant_menu(request: Request, restaurant_id: int):
+    def load(service: RestaurantService) -> Optional[Dict[str, Any]]:
+        restaurant, menu = service.details(restaurant_id)
+        if restaurant is None:
+            return None
+        return {"restaurant_id": restaurant_id, "count": len(menu), "results": menu}
+
+    return await _respond(request, ("menu", restaurant_id), load)
@@ -1,26 +1,20 @@
 # routes/public/booking.py
 from __future__ import annotations
 from typing import Optional, Dict, Any
-from pathlib import Path
-import os, random, time, smtplib, ssl, inspect
-from email.message import EmailMessage
+from datetime import date as date_type
+import random, time, uuid
 
 import mysql.connector
 from fastapi import APIRouter, Request, Depends, Form, BackgroundTasks, status, Body, Query
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from models.database import get_db_connection
-
-try:
-    from ..admin.smtp_helper import send_email  # flexible helper (may not match our call sig)
-except Exception:
-    send_email = None  # type: ignore
-
-# ---------- templates ----------
-BACKEND_DIR = Path(__file__).resolve().parents[2]
-FRONTEND_DIR = BACKEND_DIR.parent / "frontend"
-TEMPLATES_DIR = FRONTEND_DIR / "templates"
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+from models.database import get_db_connection, run_in_db
+from models.catalog import notify_catalog_changed
+from models import booking_rollups, capacity, idempotency, outbox
+from utils.ids import order_ids
+from utils.mailer import mailer, send_email, valid_address
+from utils.ratelimit import client_ip, limiter, session_key
+from utils.templating import templates
+from config.settings import settings
 
 # ---------- routers ----------
 router = APIRouter(prefix="/booking", tags=["booking"])
@@ -43,6 +37,13 @@ def _clear_session_payload(request: Request) -> None:
     for k in ("pending_booking", "booking_otp", "booking_otp_exp"):
         request.session.pop(k, None)
 
+async def _limit_booking(request: Request, email: Optional[str] = None) -> None:
+    await limiter.enforce(
+        ("booking-ip", client_ip(request), settings.RATE_LIMIT_BOOKING_IP),
+        ("booking-session", session_key(request), settings.RATE_LIMIT_BOOKING_SESSION),
+        ("otp-email", email, settings.RATE_LIMIT_OTP_EMAIL),
+    )
+
 def _first_non_empty(*values, default=None):
     for v in values:
         if v is not None and str(v).strip() != "":
@@ -79,10 +80,27 @@ def _update_restaurant_rating(db: mysql.connector.MySQLConnection, rid: Any, rat
     finally:
         cur.close()
 
-def _insert_booking(db: mysql.connector.MySQLConnection, payload: Dict[str, Any]) -> None:
+def _insert_booking(db: mysql.connector.MySQLConnection, payload: Dict[str, Any], idem_key: Optional[str] = None) -> str:
+    """
+    Reserve seats and insert the pending booking; returns its order id. A
+    repeated `idem_key` from the same email returns the first order's id,
+    or raises KeyReused if it came with a different booking. Raises
+    SlotFullError (nothing written) when the slot has no room for the party.
+    """
     cur = db.cursor()
     try:
-        order_id = f"NB{_now_ts()}{random.randint(100,999)}"
+        order_id = order_ids.next_id()
+        if idem_key:
+            existing = idempotency.claim(
+                cur, "booking", idem_key, order_id,
+                owner=str(payload.get("email") or "").lower(),
+                fingerprint=idempotency.fingerprint_of(payload["restaurant_id"], payload["people"], payload["booking_datetime"]),
+            )
+            if existing is not None:
+                db.rollback()
+                return existing
+        if not capacity.reserve(cur, payload["restaurant_id"], payload["booking_datetime"], int(payload["people"]), order_id=order_id):
+            raise capacity.SlotFullError(payload["booking_datetime"])
         cur.execute(
             """
             INSERT INTO newestone.bookings
@@ -91,81 +109,25 @@ def _insert_booking(db: mysql.connector.MySQLConnection, payload: Dict[str, Any]
             """,
             (order_id, payload["restaurant_id"], int(payload["people"]), payload["booking_datetime"], "confirmed"),
         )
+        booking_rollups.apply_booking(cur, payload["restaurant_id"], payload["booking_datetime"], "confirmed", int(payload["people"]))
         db.commit()
+        return order_id
+    except Exception:
+        db.rollback()
+        raise
     finally:
         cur.close()
 
-# ---------- SMTP (robust: helper OR direct smtplib) ----------
-def _smtp_send_direct(to: str, subject: str, text: str, html: Optional[str]) -> None:
-    host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    port = int(os.getenv("SMTP_PORT", "587"))
-    user = os.getenv("SMTP_USER", "")
-    pwd = os.getenv("SMTP_PASS", "")
-    from_ = os.getenv("SMTP_FROM") or os.getenv("EMAIL_FROM") or user or "no-reply@example.com"
-    use_ssl = os.getenv("SMTP_USE_SSL", "0") == "1"
-    use_starttls = os.getenv("SMTP_STARTTLS", "1") == "1"
-    debug = os.getenv("SMTP_DEBUG", "0") == "1"
-
-    msg = EmailMessage()
-    msg["Subject"] = subject
-    msg["From"] = from_
-    msg["To"] = to
-    msg.set_content(text or "")
-    if html:
-        msg.add_alternative(html, subtype="html")
-
-    if use_ssl:
-        ctx = ssl.create_default_context()
-        with smtplib.SMTP_SSL(host, port, context=ctx, timeout=20) as s:
-            s.set_debuglevel(1 if debug else 0)
-            s.login(user, pwd)
-            s.send_message(msg)
-    else:
-        with smtplib.SMTP(host, port, timeout=20) as s:
-            s.set_debuglevel(1 if debug else 0)
-            if use_starttls:
-                s.starttls(context=ssl.create_default_context())
-            s.login(user, pwd)
-            s.send_message(msg)
-
-def _try_helper(background: BackgroundTasks, to: str, subject: str, text: str, html: str) -> bool:
-    if not send_email:
-        return False
-    try:
-        sig = inspect.signature(send_email)
-        params = list(sig.parameters.keys())
-        # Prefer kwargs if possible (handles most variants)
-        bound = {}
-        if "to" in params: bound["to"] = to
-        if "email" in params and "to" not in params: bound["email"] = to
-        if "subject" in params: bound["subject"] = subject
-        if "text" in params or "body" in params:
-            key = "text" if "text" in params else "body"
-            bound[key] = text
-        if "html" in params:
-            bound["html"] = html
-        # Fallback to positional based on arity
-        if not bound:
-            arity = len(params)
-            if arity >= 4:
-                background.add_task(send_email, to, subject, text, html)
-            elif arity == 3:
-                background.add_task(send_email, to, subject, html)
-            else:
-                background.add_task(send_email, to, subject)
-        else:
-            background.add_task(send_email, **bound)
-        return True
-    except Exception as e:
-        print(f"[SMTP helper failed] {type(e).__name__}: {e}")
-        return False
-
-def _send_otp_email(background: BackgroundTasks, email: str, code: str) -> None:
+# ---------- mail ----------
+async def _send_otp_email(db: mysql.connector.MySQLConnection, background: BackgroundTasks, email: str, code: str) -> None:
     subject = "Your NIGHTBITE booking code"
     text = f"Your verification code is {code}. It expires in 5 minutes."
     html = f"Your verification code is <b>{code}</b>. It expires in 5 minutes."
-    if not _try_helper(background, email, subject, text, html):
-        background.add_task(_smtp_send_direct, email, subject, text, html)
+    if await outbox.queue_email(db, email, subject, text, html):
+        return
+    # Outbox unavailable: fall back to this process's mail queue, then a direct send
+    if not mailer.enqueue(email, subject, text, html):
+        background.add_task(send_email, email, subject, text, html)
         print(f"[SMTP direct queued] to={email}")
 
 # ---------- Routes ----------
@@ -187,7 +149,9 @@ async def start_booking(
     q_date: Optional[str] = Query(None, alias="date"),
     q_time: Optional[str] = Query(None, alias="time"),
     background: BackgroundTasks = None,
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
+    await _limit_booking(request)
     json_data = body if isinstance(body, dict) else {}
     merged_email = _first_non_empty(email, email_form, json_data.get("email_form"), json_data.get("email"), q_email)
     merged_rid = _first_non_empty(restaurant_id, json_data.get("restaurant_id"), q_restaurant_id)
@@ -210,15 +174,28 @@ async def start_booking(
         "booking_datetime": merged_when,
     }
 
+    bad_email = bool(payload["email"]) and not valid_address(payload["email"])
+    if bad_email:
+        payload["email"] = None  # never stored or mailed: it would end up in a To header
     if not payload["email"] or not payload["restaurant_id"] or not payload["booking_datetime"]:
         _set_session_payload(request, {k: v for k, v in payload.items() if v is not None})
-        return RedirectResponse(url="/booking/confirm", status_code=status.HTTP_303_SEE_OTHER)
+        url = "/booking/confirm?err=email" if bad_email else "/booking/confirm"
+        return RedirectResponse(url=url, status_code=status.HTTP_303_SEE_OTHER)
 
+    # One key per started booking: a double-submitted or retried /verify inserts it once
+    payload["idempotency_key"] = uuid.uuid4().hex
     _set_session_payload(request, payload)
+    try:
+        room = await run_in_db(capacity.has_room, db, int(payload["restaurant_id"]), payload["booking_datetime"], merged_people)
+    except ValueError:
+        return RedirectResponse(url="/booking/confirm?err=when", status_code=status.HTTP_303_SEE_OTHER)
+    if not room:
+        return RedirectResponse(url="/booking/confirm?err=full", status_code=status.HTTP_303_SEE_OTHER)
+    await limiter.enforce(("otp-email", payload["email"], settings.RATE_LIMIT_OTP_EMAIL))
     code = _gen_otp()
     request.session["booking_otp"] = code
     request.session["booking_otp_exp"] = _now_ts() + 300
-    _send_otp_email(background, payload["email"], code)
+    await _send_otp_email(db, background, payload["email"], code)
     return RedirectResponse(url="/booking/confirm", status_code=status.HTTP_303_SEE_OTHER, background=background)
 
 @router.get("/confirm")
@@ -227,10 +204,10 @@ async def confirm_page(request: Request, db: mysql.connector.MySQLConnection = D
     if not pending:
         return RedirectResponse(url="/userdash", status_code=status.HTTP_303_SEE_OTHER)
     rid = pending.get("restaurant_id")
-    restaurant = _fetch_restaurant(db, rid) if rid is not None else None
+    restaurant = await run_in_db(_fetch_restaurant, db, rid) if rid is not None else None
     if not restaurant and rid is not None:
         restaurant = {"restaurant_id": rid, "ratings": None, "name": None}
-    dev_otp = request.session.get("booking_otp") if os.getenv("DEBUG_SHOW_OTP", "0") == "1" else None
+    dev_otp = request.session.get("booking_otp") if settings.DEBUG_SHOW_OTP else None
     return templates.TemplateResponse("booking_confirm.html", {"request": request, "payload": pending, "restaurant": restaurant, "dev_otp": dev_otp})
 
 @router.post("/verify")
@@ -246,20 +223,49 @@ async def verify_code(request: Request, code: str = Form(...), db: mysql.connect
     if code.strip() != str(saved):
         return RedirectResponse(url="/booking/confirm?err=badcode", status_code=status.HTTP_303_SEE_OTHER)
     try:
-        _insert_booking(db, pending)
-    finally:
+        idem_key = idempotency.normalize_key(request.headers.get(idempotency.HEADER) or pending.get("idempotency_key"))
+    except ValueError:
+        return RedirectResponse(url="/booking/confirm?err=badkey", status_code=status.HTTP_303_SEE_OTHER)
+    try:
+        await run_in_db(_insert_booking, db, pending, idem_key)
+    except capacity.SlotFullError:
+        # Keep the pending booking so the page can explain; Cancel clears it
+        return RedirectResponse(url="/booking/confirm?err=full", status_code=status.HTTP_303_SEE_OTHER)
+    except idempotency.KeyReused:
+        return RedirectResponse(url="/booking/confirm?err=badkey", status_code=status.HTTP_303_SEE_OTHER)
+    except ValueError:
+        _clear_session_payload(request)
+        return RedirectResponse(url="/userdash?err=when", status_code=status.HTTP_303_SEE_OTHER)
+    except Exception:
         _clear_session_payload(request)
+        raise
+    _clear_session_payload(request)
     return RedirectResponse(url="/dashboard?msg=booked", status_code=status.HTTP_303_SEE_OTHER)
 
+@router.get("/availability")
+async def availability(
+    restaurant_id: int = Query(...),
+    date: date_type = Query(...),
+    guests: int = Query(1, ge=1, le=100),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    """Slots on `date` and how many seats each has left; `available` means the party fits."""
+    return await run_in_db(capacity.availability, db, restaurant_id, date, guests)
+
 @router.post("/resend")
-async def resend_code(request: Request, background: BackgroundTasks):
+async def resend_code(
+    request: Request,
+    background: BackgroundTasks,
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
     pending = _get_session_payload(request)
     if not pending or not pending.get("email"):
         return RedirectResponse(url="/booking/confirm", status_code=status.HTTP_303_SEE_OTHER)
+    await _limit_booking(request, pending["email"])
     code = _gen_otp()
     request.session["booking_otp"] = code
     request.session["booking_otp_exp"] = _now_ts() + 300
-    _send_otp_email(background, pending["email"], code)
+    await _send_otp_email(db, background, pending["email"], code)
     return RedirectResponse(url="/booking/confirm?msg=resent", status_code=status.HTTP_303_SEE_OTHER, background=background)
 
 @router.post("/cancel")
@@ -281,8 +287,9 @@ async def rate_restaurant(
     except Exception:
         return RedirectResponse(url="/booking/confirm?err=rating", status_code=status.HTTP_303_SEE_OTHER)
 
-    ok = _update_restaurant_rating(db, restaurant_id, rating)
+    ok = await run_in_db(_update_restaurant_rating, db, restaurant_id, rating)
     if not ok:
         return RedirectResponse(url="/booking/confirm?err=rating", status_code=status.HTTP_303_SEE_OTHER)
+    notify_catalog_changed(int(restaurant_id) if str(restaurant_id).isdigit() else None)
 
     return RedirectResponse(url="/booking/confirm?msg=rated", status_code=status.HTTP_303_SEE_OTHER)
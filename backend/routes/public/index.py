@@ -8,11 +8,11 @@ from fastapi import (
     status,
     UploadFile
 )
-from fastapi.templating import Jinja2Templates
 from models.database import get_db_connection
 import mysql.connector
 from fastapi.responses import RedirectResponse
 from config.settings import settings
+from utils.templating import templates
 import os
 import shutil
 from typing import List, Annotated
@@ -26,8 +26,6 @@ router = APIRouter(
     tags=["index"]
 )
 
-templates = Jinja2Templates(directory="../frontend/templates")
-
 
 @router.get("/")
 async def get_index_page(request : Request):
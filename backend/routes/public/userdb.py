@@ -1,27 +1,52 @@
 # routes/public/userdb.py
 from __future__ import annotations
 from typing import Optional, Dict, Any, List, Generic, TypeVar, Iterable, Tuple
+import bisect
+import heapq
 from functools import singledispatchmethod
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-import math
 from urllib.parse import quote_plus
+import time
 import mysql.connector
 from fastapi import APIRouter, Request, Depends, Form, Query, HTTPException
-from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from models.database import get_db_connection
-from pathlib import Path
+from fastapi.responses import HTMLResponse, RedirectResponse
+from models.database import db_connection, get_db_connection, run_in_db
+from models import booking_rollups, capacity, idempotency
+from models.catalog import RestaurantTable, catalog_cache, notify_catalog_changed, on_catalog_change
+from utils.helpers import normalize_coords, haversine_km
+from utils.geo_index import restaurant_geo_index
+from utils.facets import FacetIndex, iter_bits
+from utils.search_index import TextSearchIndex
+from utils.page_cache import PageCache
+from utils.pagination import Key, Page, encode_cursor, decode_cursor, page_sorted, with_query
+from utils.singleflight import SingleFlight
+from utils.sorting import SortKey, SortSpec
+from utils.ids import order_ids
+from utils.ratelimit import client_ip, limiter, session_key
+from utils.templating import templates
+from config.settings import settings
 
 router = APIRouter(tags=["dashboard"])
 
-BACKEND_DIR = Path(__file__).resolve().parents[2]
-FRONTEND_DIR = BACKEND_DIR.parent / "frontend"
-TEMPLATES_DIR = FRONTEND_DIR / "templates"
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
-
 STATIC_URL_PREFIX = "/static"
 ALLOWED_TAGS = ["asian", "western", "khmer", "japanese", "korean", "pub", "club", "bar"]
+PRICE_RANGES = [1, 2, 3, 4]
+RATING_BUCKETS = [0, 1, 2, 3, 4, 5]
+
+FacetCounts = Dict[str, Dict[Any, int]]
+
+# ?sort= accepts a composite spec over these fields ("-popularity,price_range:nulls_first,name");
+# the single words the dashboard has always sent keep their meaning.
+SORT_FIELDS = ("distance", "ratings", "price_range", "name", "popularity", "id")
+SORT_ALIASES = {"ratings": "-ratings,name", "distance": "distance,name", "name": "name", "popularity": "-popularity,name"}
+
+# Keyset orderings. Names compare case-insensitively, like the MySQL collation.
+def name_key(r: "Restaurant") -> Key:
+    return (r.name.casefold(), r.id)
+
+def ratings_key(r: "Restaurant") -> Key:
+    return (-r.ratings, r.name.casefold(), r.id)
 
 def to_public_image_url(raw: Optional[str]) -> Optional[str]:
     if not raw:
@@ -39,47 +64,14 @@ def to_public_image_url(raw: Optional[str]) -> Optional[str]:
         return f"{STATIC_URL_PREFIX}/{s}"
     return f"{STATIC_URL_PREFIX}/{s.lstrip('/')}"
 
-def normalize_coords(lat, lng) -> Tuple[Optional[float], Optional[float]]:
-    try:
-        lat = float(lat) if lat is not None else None
-        lng = float(lng) if lng is not None else None
-    except Exception:
-        return (None, None)
-    if lat is None or lng is None:
-        return (None, None)
-    if abs(lat) <= 90 and abs(lng) <= 180:
-        return (lat, lng)
-    if abs(lng) <= 90 and abs(lat) <= 180:
-        return (lng, lat)
-    return (None, None)
-
-def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    R = 6371.0
-    to_rad = math.pi / 180.0
-    dlat = (lat2 - lat1) * to_rad
-    dlon = (lon2 - lon1) * to_rad
-    a = math.sin(dlat/2)**2 + math.cos(lat1*to_rad) * math.cos(lat2*to_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
 def bubble_sort(items: List[Dict[str, Any]], key: str, reverse: bool = False) -> List[Dict[str, Any]]:
-    n = len(items)
-    while True:
-        swapped = False
-        for i in range(1, n):
-            a = items[i-1].get(key, None)
-            b = items[i].get(key, None)
-            if a is None: a = float("inf") if not reverse else float("-inf")
-            if b is None: b = float("inf") if not reverse else float("-inf")
-            if (a < b) if reverse else (a > b):
-                items[i-1], items[i] = items[i], items[i-1]
-                swapped = True
-        n -= 1
-        if not swapped or n <= 1:
-            break
+    """Sort `items` in place by one field, missing values last. Kept for callers of the old helper."""
+    items.sort(key=SortSpec([SortKey(key, descending=reverse)]).key)
     return items
 
 class BaseEntity(ABC):
+    __slots__ = ("_id",)
+
     def __init__(self, entity_id: int):
         self._id = int(entity_id)
 
@@ -91,7 +83,7 @@ class BaseEntity(ABC):
     def to_dict(self) -> Dict[str, Any]:
         ...
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class GeoPoint:
     lat: Optional[float]
     lng: Optional[float]
@@ -100,6 +92,8 @@ class GeoPoint:
         return self.lat is not None and self.lng is not None
 
 class Venue(BaseEntity):
+    __slots__ = ("_name", "_description", "_location")
+
     def __init__(self, entity_id: int, name: str, description: str, location: GeoPoint):
         super().__init__(entity_id)
         self._name = name.strip()
@@ -144,6 +138,8 @@ class Venue(BaseEntity):
         }
 
 class Restaurant(Venue):
+    __slots__ = ("_price_range", "_tag", "_ratings", "_images", "_image_url")
+
     def __init__(
         self,
         entity_id: int,
@@ -154,12 +150,14 @@ class Restaurant(Venue):
         tag: Optional[str],
         ratings: float = 0.0,
         image_url: Optional[str] = None,
+        images: Optional[List[str]] = None,
     ):
         super().__init__(entity_id, name, description, location)
         self._price_range = int(price_range) if price_range is not None else None
         self._tag = (tag or "").strip().lower() or None
         self._ratings = float(ratings or 0.0)
-        self._image_url = to_public_image_url(image_url)
+        self._images = tuple(u for u in (to_public_image_url(i) for i in (images or [])) if u)
+        self._image_url = to_public_image_url(image_url) or (self._images[0] if self._images else None)
 
     @property
     def price_range(self) -> Optional[int]:
@@ -196,6 +194,10 @@ class Restaurant(Venue):
     def image_url(self, raw: Optional[str]) -> None:
         self._image_url = to_public_image_url(raw)
 
+    @property
+    def images(self) -> List[str]:
+        return list(self._images) if self._images else ([self._image_url] if self._image_url else [])
+
     def to_dict(self) -> Dict[str, Any]:
         data = super().to_dict()
         data.update({
@@ -207,8 +209,19 @@ class Restaurant(Venue):
         return data
 
 class MenuItem(BaseEntity):
-    def __init__(self, entity_id: int, item_name: str, description: str, price: float, image_url: Optional[str]):
+    __slots__ = ("restaurant_id", "_item_name", "_description", "_price", "_image_url")
+
+    def __init__(
+        self,
+        entity_id: int,
+        item_name: str,
+        description: str,
+        price: float,
+        image_url: Optional[str],
+        restaurant_id: Optional[int] = None,
+    ):
         super().__init__(entity_id)
+        self.restaurant_id = restaurant_id
         self._item_name = item_name.strip()
         self._description = description or ""
         self._price = float(price)
@@ -216,6 +229,18 @@ class MenuItem(BaseEntity):
             raise ValueError("price cannot be negative")
         self._image_url = to_public_image_url(image_url)
 
+    @property
+    def item_name(self) -> str:
+        return self._item_name
+
+    @property
+    def description(self) -> str:
+        return self._description
+
+    @property
+    def price(self) -> float:
+        return self._price
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "id": self.id,
@@ -229,30 +254,63 @@ T = TypeVar("T", bound=BaseEntity)
 
 class AbstractRepository(ABC, Generic[T]):
     @abstractmethod
-    def get(self, entity_id: int) -> Optional[T]:
+    def get(self, entity_id: int, *, gallery: bool = True) -> Optional[T]:
         ...
 
     @abstractmethod
-    def list(self, *, price_range: Optional[int] = None, tag: Optional[str] = None, order_by_ratings: bool = False) -> List[T]:
+    def list(
+        self,
+        *,
+        price_range: Optional[int] = None,
+        tag: Optional[str] = None,
+        order_by_ratings: bool = False,
+        gallery: bool = False,
+        after: Optional[Key] = None,
+        limit: Optional[int] = None,
+    ) -> List[T]:
         ...
 
     @abstractmethod
-    def search_by_name(self, term: str) -> List[T]:
+    def search_by_name(self, term: str, *, gallery: bool = False, after: Optional[Key] = None, limit: Optional[int] = None) -> List[T]:
         ...
 
+def _is_search_key(key: Key) -> bool:
+    """(-score, -ratings, casefolded name, id), the shape search_page() orders and encodes cursors by."""
+    if len(key) != 4 or not isinstance(key[2], str):
+        return False
+    return all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (key[0], key[1], key[3]))
+
 class RestaurantRepository(AbstractRepository[Restaurant]):
     def __init__(self, db: mysql.connector.MySQLConnection):
         self.db = db
 
-    def _row_to_restaurant(self, row: Dict[str, Any]) -> Restaurant:
-        lat, lng = normalize_coords(row.get("latitude"), row.get("longitude"))
+    def _load_images(self, ids: List[int], *, gallery: bool = False) -> Dict[int, List[str]]:
+        """One round trip for the pictures of all `ids`; only the first one each unless `gallery`."""
+        if not ids:
+            return {}
         cur = self.db.cursor(dictionary=True)
+        placeholders = ", ".join(["%s"] * len(ids))
         cur.execute(
-            "SELECT image_url AS image_path FROM newestone.image_for_restaurant WHERE restaurant_id = %s LIMIT 1",
-            (row["id"],),
+            f"""
+            SELECT restaurant_id, image_url AS image_path
+            FROM newestone.image_for_restaurant
+            WHERE restaurant_id IN ({placeholders})
+            """,
+            tuple(ids),
         )
-        pic = cur.fetchone()
+        rows = cur.fetchall()
         cur.close()
+        images: Dict[int, List[str]] = {}
+        for row in rows:
+            if not row.get("image_path"):
+                continue
+            found = images.setdefault(row["restaurant_id"], [])
+            if gallery or not found:
+                found.append(row["image_path"])
+        return images
+
+    def _row_to_restaurant(self, row: Dict[str, Any], images: Optional[List[str]] = None) -> Restaurant:
+        lat, lng = normalize_coords(row.get("latitude"), row.get("longitude"))
         return Restaurant(
             entity_id=row["id"],
             name=row["name"],
@@ -261,10 +319,14 @@ class RestaurantRepository(AbstractRepository[Restaurant]):
             price_range=row.get("price_range"),
             tag=row.get("tag"),
             ratings=row.get("ratings") or 0.0,
-            image_url=(pic["image_path"] if pic and pic.get("image_path") else None),
+            images=images,
         )
 
-    def get(self, entity_id: int) -> Optional[Restaurant]:
+    def _rows_to_restaurants(self, rows: List[Dict[str, Any]], *, gallery: bool = False) -> List[Restaurant]:
+        images = self._load_images([r["id"] for r in rows], gallery=gallery)
+        return [self._row_to_restaurant(r, images.get(r["id"])) for r in rows]
+
+    def get(self, entity_id: int, *, gallery: bool = True) -> Optional[Restaurant]:
         cur = self.db.cursor(dictionary=True)
         cur.execute(
             """
@@ -276,9 +338,24 @@ class RestaurantRepository(AbstractRepository[Restaurant]):
         )
         row = cur.fetchone()
         cur.close()
-        return self._row_to_restaurant(row) if row else None
+        if not row:
+            return None
+        return self._rows_to_restaurants([row], gallery=gallery)[0]
 
-    def list(self, *, price_range: Optional[int] = None, tag: Optional[str] = None, order_by_ratings: bool = False) -> List[Restaurant]:
+    def list(
+        self,
+        *,
+        price_range: Optional[int] = None,
+        tag: Optional[str] = None,
+        order_by_ratings: bool = False,
+        gallery: bool = False,
+        after: Optional[Key] = None,
+        limit: Optional[int] = None,
+    ) -> List[Restaurant]:
+        """
+        `after` is the ratings_key / name_key of the last row already seen
+        (matching `order_by_ratings`); only rows after it are returned.
+        """
         cur = self.db.cursor(dictionary=True)
         where, params = [], []
         if price_range is not None:
@@ -287,6 +364,17 @@ class RestaurantRepository(AbstractRepository[Restaurant]):
         if tag:
             where.append("LOWER(r.tag) = LOWER(%s)")
             params.append(tag)
+        if after is not None and order_by_ratings:
+            neg_rating, name, rid = after
+            where.append(
+                "(COALESCE(r.ratings,0) < %s OR (COALESCE(r.ratings,0) = %s"
+                " AND (r.name > %s OR (r.name = %s AND r.id > %s))))"
+            )
+            params += [-neg_rating, -neg_rating, name, name, rid]
+        elif after is not None:
+            name, rid = after
+            where.append("(r.name > %s OR (r.name = %s AND r.id > %s))")
+            params += [name, name, rid]
         base_sql = """
             SELECT r.id, r.name, r.description, COALESCE(r.ratings,0) AS ratings,
                    r.price_range, r.tag, r.latitude, r.longitude
@@ -294,27 +382,46 @@ class RestaurantRepository(AbstractRepository[Restaurant]):
         """
         if where:
             base_sql += " WHERE " + " AND ".join(where)
-        base_sql += " ORDER BY r.ratings DESC, r.name ASC" if order_by_ratings else " ORDER BY r.name ASC"
+        base_sql += (
+            " ORDER BY COALESCE(r.ratings,0) DESC, r.name ASC, r.id ASC" if order_by_ratings
+            else " ORDER BY r.name ASC, r.id ASC"
+        )
+        if limit is not None:
+            base_sql += " LIMIT %s"
+            params.append(int(limit))
         cur.execute(base_sql, tuple(params))
         rows = cur.fetchall()
         cur.close()
-        return [self._row_to_restaurant(r) for r in rows]
+        return self._rows_to_restaurants(rows, gallery=gallery)
 
-    def search_by_name(self, term: str) -> List[Restaurant]:
+    def search_by_name(
+        self,
+        term: str,
+        *,
+        gallery: bool = False,
+        after: Optional[Key] = None,
+        limit: Optional[int] = None,
+    ) -> List[Restaurant]:
         cur = self.db.cursor(dictionary=True)
-        cur.execute(
-            """
+        sql = """
             SELECT id, name, description, COALESCE(ratings,0) AS ratings,
                    price_range, tag, latitude, longitude
             FROM newestone.restaurants
             WHERE LOWER(name) LIKE LOWER(%s)
-            ORDER BY name
-            """,
-            (f"%{term}%",),
-        )
+        """
+        params: List[Any] = [f"%{term}%"]
+        if after is not None:
+            name, rid = after
+            sql += " AND (name > %s OR (name = %s AND id > %s))"
+            params += [name, name, rid]
+        sql += " ORDER BY name, id"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(int(limit))
+        cur.execute(sql, tuple(params))
         rows = cur.fetchall()
         cur.close()
-        return [self._row_to_restaurant(r) for r in rows]
+        return self._rows_to_restaurants(rows, gallery=gallery)
 
     def get_menu(self, restaurant_id: int) -> List[MenuItem]:
         cur = self.db.cursor(dictionary=True)
@@ -331,6 +438,63 @@ class RestaurantRepository(AbstractRepository[Restaurant]):
         cur.close()
         return [MenuItem(r["id"], r["item_name"], r.get("description") or "", r["price"], r.get("image_url")) for r in rows]
 
+    def all_menu_items(self) -> List[MenuItem]:
+        """Every menu item of every restaurant, in one round trip (for building the dish index)."""
+        cur = self.db.cursor(dictionary=True)
+        cur.execute(
+            """
+            SELECT id, restaurant_id, item_name, description, price, image_url
+            FROM newestone.menu_items
+            """
+        )
+        rows = cur.fetchall()
+        cur.close()
+        return [
+            MenuItem(r["id"], r["item_name"], r.get("description") or "", r["price"] or 0, r.get("image_url"), r["restaurant_id"])
+            for r in rows
+        ]
+
+    def menu_snapshot(self) -> "MenuSnapshot":
+        return MenuSnapshot(self.all_menu_items())
+
+    def search_menu(self, term: str = "", *, max_price: Optional[float] = None, limit: int = 20) -> List["MenuGroup"]:
+        """Dishes matching `term` (all dishes when empty) priced at or under `max_price`, grouped per restaurant."""
+        return self.menu_snapshot().search(term, max_price=max_price, limit=limit)
+
+    def get_many(self, ids: List[int], *, gallery: bool = False) -> List[Restaurant]:
+        """Restaurants for `ids`, returned in the order of `ids`."""
+        if not ids:
+            return []
+        cur = self.db.cursor(dictionary=True)
+        placeholders = ", ".join(["%s"] * len(ids))
+        cur.execute(
+            f"""
+            SELECT id, name, description, COALESCE(ratings,0) AS ratings,
+                   price_range, tag, latitude, longitude
+            FROM newestone.restaurants WHERE id IN ({placeholders})
+            """,
+            tuple(ids),
+        )
+        rows = cur.fetchall()
+        cur.close()
+        by_id = {r.id: r for r in self._rows_to_restaurants(rows, gallery=gallery)}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def coordinates(self) -> List[Tuple[int, Any, Any]]:
+        cur = self.db.cursor()
+        cur.execute("SELECT id, latitude, longitude FROM newestone.restaurants")
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+
+    def popularity(self) -> Dict[int, int]:
+        """Bookings per restaurant, the `popularity` sort field."""
+        cur = self.db.cursor(dictionary=True)
+        cur.execute("SELECT restaurant_id, COUNT(*) AS n FROM newestone.bookings GROUP BY restaurant_id")
+        rows = cur.fetchall()
+        cur.close()
+        return {int(r["restaurant_id"]): int(r["n"]) for r in rows if r["restaurant_id"] is not None}
+
     def set_rating(self, restaurant_id: int, rating: float) -> None:
         cur = self.db.cursor()
         cur.execute("UPDATE newestone.restaurants SET ratings = %s WHERE id = %s", (rating, restaurant_id))
@@ -353,17 +517,334 @@ class RestaurantRepository(AbstractRepository[Restaurant]):
         counts = { (row["tag"] or "").lower(): int(row["cnt"]) for row in rows }
         return { t: counts.get(t.lower(), 0) for t in ALLOWED_TAGS }
 
+    def catalog_snapshot(self) -> "CatalogSnapshot":
+        return CatalogSnapshot(self.list(gallery=False))
+
+    @staticmethod
+    def _facet_selection(
+        tags: Optional[Iterable[str]],
+        price_ranges: Optional[Iterable[int]],
+        min_rating: Optional[int],
+    ) -> Dict[str, Optional[List[Any]]]:
+        return {
+            "tag": [t.strip().lower() for t in tags or [] if t and t.strip()],
+            "price_range": [int(p) for p in price_ranges or []],
+            "rating": [b for b in RATING_BUCKETS if b >= min_rating] if min_rating else None,
+        }
+
+    @staticmethod
+    def _facet_counts(counts: Dict[str, Dict[Any, int]]) -> FacetCounts:
+        per_bucket = counts["rating"]
+        return {
+            "tag": {t: counts["tag"].get(t, 0) for t in ALLOWED_TAGS},
+            "price_range": {p: counts["price_range"].get(p, 0) for p in PRICE_RANGES},
+            "min_rating": {n: sum(per_bucket.get(b, 0) for b in RATING_BUCKETS if b >= n) for n in RATING_BUCKETS[1:]},
+        }
+
+    def filter(
+        self,
+        *,
+        tags: Optional[Iterable[str]] = None,
+        price_ranges: Optional[Iterable[int]] = None,
+        min_rating: Optional[int] = None,
+        order_by_ratings: bool = False,
+    ) -> Tuple[List[Restaurant], FacetCounts]:
+        """
+        Multi-select filtering: values within a facet are OR-ed, facets are
+        AND-ed. Returns the matches together with the tag / price / rating
+        counts, each computed against the other facets' selections.
+        """
+        snap = self.catalog_snapshot()
+        mask, counts = snap.facets.query(self._facet_selection(tags, price_ranges, min_rating))
+        items = snap.facets.select(mask, snap.ratings_order if order_by_ratings else None)
+        return items, self._facet_counts(counts)
+
+    def filter_rows(
+        self,
+        *,
+        tags: Optional[Iterable[str]] = None,
+        price_ranges: Optional[Iterable[int]] = None,
+        min_rating: Optional[int] = None,
+    ) -> Tuple["CatalogSnapshot", List[int], FacetCounts]:
+        """`filter()` as row numbers into the returned snapshot's `restaurants` and `table`."""
+        snap = self.catalog_snapshot()
+        mask, counts = snap.facets.query(self._facet_selection(tags, price_ranges, min_rating))
+        return snap, iter_bits(mask), self._facet_counts(counts)
+
+    def page(
+        self,
+        *,
+        tags: Optional[Iterable[str]] = None,
+        price_ranges: Optional[Iterable[int]] = None,
+        min_rating: Optional[int] = None,
+        order_by_ratings: bool = False,
+        after: Optional[Key] = None,
+        limit: int = settings.PAGE_SIZE,
+    ) -> Tuple[Page[Restaurant], FacetCounts]:
+        """
+        One keyset page of `filter()`, ordered by ratings_key or name_key.
+        Walks the snapshot's precomputed ordering from the cursor and stops
+        after `limit` matches, so a page costs the same at any catalog size.
+        """
+        snap = self.catalog_snapshot()
+        index = snap.facets
+        mask, counts = index.query(self._facet_selection(tags, price_ranges, min_rating))
+        order, keys = (snap.ratings_order, snap.ratings_keys) if order_by_ratings else (None, snap.name_keys)
+        start = bisect.bisect_right(keys, tuple(after)) if after is not None else 0
+
+        taken: List[int] = []
+        member = index.member_test(mask)
+        for i in range(start, len(keys)):
+            if member(order[i] if order is not None else i):
+                taken.append(i)
+                if len(taken) > limit:
+                    break
+        more = len(taken) > limit
+        taken = taken[:limit]
+        items = [snap.restaurants[order[i] if order is not None else i] for i in taken]
+        cursor = encode_cursor(keys[taken[-1]]) if more else None
+        return Page(items, limit, cursor), self._facet_counts(counts)
+
+    def search(self, term: str, *, limit: Optional[int] = None) -> List[Tuple[Restaurant, float]]:
+        """Ranked, typo-tolerant search over name, tag and description."""
+        return self.catalog_snapshot().search.search(term, limit=limit)
+
+    def search_page(self, term: str, *, after: Optional[Key] = None, limit: int = settings.PAGE_SIZE) -> Page[Restaurant]:
+        """Keyset page of `search()` results, ordered by (relevance, rating, name, id)."""
+        if after is not None and not _is_search_key(after):
+            raise ValueError("cursor does not match this search")
+        hits = self.search(term)
+        keyed = sorted(((-score, -r.ratings, r.name.casefold(), r.id), r) for r, score in hits)
+        return page_sorted([r for _, r in keyed], [k for k, _ in keyed], tuple(after) if after is not None else None, limit)
+
+    def suggest(self, term: str, *, limit: int = 8) -> List[Tuple[Restaurant, float]]:
+        """Typeahead completions of restaurant names; the last word of `term` is matched as a prefix."""
+        return self.catalog_snapshot().names.suggest(term, limit=limit)
+
+def _rating_bucket(ratings: float) -> int:
+    return int(max(0.0, min(5.0, ratings)))
+
+class CatalogSnapshot:
+    """Every restaurant (with its full gallery) as loaded in one pass, ordered by name."""
+
+    def __init__(self, restaurants: List[Restaurant]):
+        self.restaurants = restaurants = sorted(restaurants, key=name_key)
+        self.by_id: Dict[int, Restaurant] = {r.id: r for r in restaurants}
+        self.name_keys = [name_key(r) for r in restaurants]
+        self.ratings_order = sorted(range(len(restaurants)), key=lambda i: ratings_key(restaurants[i]))
+        self.ratings_keys = [ratings_key(restaurants[i]) for i in self.ratings_order]
+        self.by_ratings = [restaurants[i] for i in self.ratings_order]
+        self._table: Optional[RestaurantTable] = None
+        self._facets: Optional[FacetIndex[Restaurant]] = None
+        self._search: Optional[TextSearchIndex[Restaurant]] = None
+        self._names: Optional[TextSearchIndex[Restaurant]] = None
+
+    @property
+    def table(self) -> RestaurantTable:
+        """Columns of id / coordinates / ratings / price / tag, row i = `restaurants[i]`."""
+        if self._table is None:
+            self._table = RestaurantTable(self.restaurants, ALLOWED_TAGS)
+        return self._table
+
+    @property
+    def facets(self) -> FacetIndex[Restaurant]:
+        """Bitmap index over `restaurants` (positions follow name order), built on first use."""
+        if self._facets is None:
+            t = self.table
+            self._facets = FacetIndex.from_columns(
+                self.restaurants,
+                {
+                    "tag": map(t.tags.__getitem__, t.tag_code),
+                    "price_range": (p or None for p in t.price_range),
+                    "rating": map(_rating_bucket, t.ratings),
+                },
+            )
+        return self._facets
+
+    @property
+    def search(self) -> TextSearchIndex[Restaurant]:
+        """Text index over name, tag and description, built on first use."""
+        if self._search is None:
+            self._search = TextSearchIndex(
+                self.restaurants,
+                {"name": lambda r: r.name, "tag": lambda r: r.tag, "description": lambda r: r.description},
+                weights={"name": 3.0, "tag": 2.0, "description": 1.0},
+                rank=lambda r: r.ratings,
+            )
+        return self._search
+
+    @property
+    def names(self) -> TextSearchIndex[Restaurant]:
+        """Name-only text index for typeahead, built on first use."""
+        if self._names is None:
+            self._names = TextSearchIndex(self.restaurants, {"name": lambda r: r.name}, rank=lambda r: r.ratings)
+        return self._names
+
+MenuGroup = Tuple[int, float, List[MenuItem]]  # (restaurant id, best dish score, matching dishes by price)
+
+class MenuSnapshot:
+    """Every menu item with a text index over name/description and a price-sorted index."""
+
+    def __init__(self, items: List[MenuItem]):
+        self.items = items
+        self.text: TextSearchIndex[MenuItem] = TextSearchIndex(
+            items,
+            {"item_name": lambda m: m.item_name, "description": lambda m: m.description},
+            weights={"item_name": 2.0, "description": 1.0},
+        )
+        self.price_of = [m.price for m in items]
+        self.by_price = sorted(range(len(items)), key=self.price_of.__getitem__)
+        self.prices = [self.price_of[i] for i in self.by_price]
+        # Per restaurant: item positions cheapest first, with their prices for bisecting.
+        self.menus: Dict[Any, Tuple[List[int], List[float]]] = {}
+        for pos in self.by_price:
+            positions, prices = self.menus.setdefault(items[pos].restaurant_id, ([], []))
+            positions.append(pos)
+            prices.append(self.price_of[pos])
+
+    def under(self, max_price: float) -> List[int]:
+        """Positions of items priced at or under `max_price`, cheapest first (a bisect, not a scan)."""
+        return self.by_price[:bisect.bisect_right(self.prices, max_price)]
+
+    def _menu_under(self, restaurant_id: Any, max_price: Optional[float]) -> List[int]:
+        positions, prices = self.menus.get(restaurant_id, ([], []))
+        return positions if max_price is None else positions[:bisect.bisect_right(prices, max_price)]
+
+    def search(self, term: str = "", *, max_price: Optional[float] = None, limit: int = 20) -> List[MenuGroup]:
+        """
+        Dishes matching `term` (every dish when empty) at or under
+        `max_price`, grouped per restaurant. Groups are ordered by their
+        best-scoring dish, then by that dish's price.
+        """
+        if not (term or "").strip():
+            # Cheapest-first walk that stops once `limit` restaurants are seen.
+            top: List[Any] = []
+            seen = set()
+            for pos in (self.under(max_price) if max_price is not None else self.by_price):
+                rid = self.items[pos].restaurant_id
+                if rid not in seen:
+                    seen.add(rid)
+                    top.append(rid)
+                    if len(top) >= limit:
+                        break
+            return [(rid, 0.0, [self.items[p] for p in self._menu_under(rid, max_price)]) for rid in top]
+
+        scores = self.text.match(term)
+        if max_price is not None:
+            cheap = self.under(max_price)
+            if len(cheap) < len(scores):
+                scores = {p: scores[p] for p in cheap if p in scores}
+            else:
+                scores = {p: s for p, s in scores.items() if self.price_of[p] <= max_price}
+
+        best: Dict[Any, Tuple[float, float]] = {}
+        for pos, score in scores.items():
+            rid = self.items[pos].restaurant_id
+            key = (score, -self.price_of[pos])
+            if key > best.get(rid, (-1.0, 0.0)):
+                best[rid] = key
+        top = heapq.nlargest(limit, best, key=best.__getitem__)
+        return [
+            (rid, round(best[rid][0], 4), [self.items[p] for p in self._menu_under(rid, max_price) if p in scores])
+            for rid in top
+        ]
+
+class CachedRestaurantRepository(RestaurantRepository):
+    """
+    RestaurantRepository whose reads are answered from the in-process catalog
+    cache; the DB is only queried to (re)build a snapshot or a menu entry.
+    Writes go to the DB and then invalidate the cache.
+    """
+
+    def snapshot(self) -> CatalogSnapshot:
+        return catalog_cache.get_or_load(
+            "restaurants", lambda: CatalogSnapshot(super(CachedRestaurantRepository, self).list(gallery=True))
+        )
+
+    def get(self, entity_id: int, *, gallery: bool = True) -> Optional[Restaurant]:
+        return self.snapshot().by_id.get(int(entity_id))
+
+    def get_many(self, ids: List[int], *, gallery: bool = False) -> List[Restaurant]:
+        by_id = self.snapshot().by_id
+        return [by_id[i] for i in ids if i in by_id]
+
+    def list(
+        self,
+        *,
+        price_range: Optional[int] = None,
+        tag: Optional[str] = None,
+        order_by_ratings: bool = False,
+        gallery: bool = False,
+        after: Optional[Key] = None,
+        limit: Optional[int] = None,
+    ) -> List[Restaurant]:
+        page, _ = self.page(
+            tags=[tag] if tag else None,
+            price_ranges=[price_range] if price_range is not None else None,
+            order_by_ratings=order_by_ratings,
+            after=after,
+            limit=limit if limit is not None else len(self.snapshot().restaurants),
+        )
+        return page.items
+
+    def search_by_name(
+        self,
+        term: str,
+        *,
+        gallery: bool = False,
+        after: Optional[Key] = None,
+        limit: Optional[int] = None,
+    ) -> List[Restaurant]:
+        if after is None and limit is None:
+            return [r for r, _ in self.search(term)]
+        return self.search_page(term, after=after, limit=limit or settings.PAGE_SIZE).items
+
+    def get_menu(self, restaurant_id: int) -> List[MenuItem]:
+        return catalog_cache.get_or_load(
+            ("menu", int(restaurant_id)), lambda: super(CachedRestaurantRepository, self).get_menu(restaurant_id)
+        )
+
+    def coordinates(self) -> List[Tuple[int, Any, Any]]:
+        return list(self.snapshot().table.coordinates())
+
+    def popularity(self) -> Dict[int, int]:
+        # Bookings are not catalog writes, so this entry only refreshes on TTL expiry.
+        return catalog_cache.get_or_load("popularity", lambda: super(CachedRestaurantRepository, self).popularity())
+
+    def catalog_snapshot(self) -> CatalogSnapshot:
+        return self.snapshot()
+
+    def menu_snapshot(self) -> MenuSnapshot:
+        return catalog_cache.get_or_load(
+            "menu_items", lambda: super(CachedRestaurantRepository, self).menu_snapshot()
+        )
+
+    def tag_counts(self, price_range: Optional[int] = None) -> Dict[str, int]:
+        return self.filter(price_ranges=[price_range] if price_range is not None else None)[1]["tag"]
+
+    def set_rating(self, restaurant_id: int, rating: float) -> None:
+        super().set_rating(restaurant_id, rating)
+        notify_catalog_changed(restaurant_id)
+
+# Identical service calls running at the same time share one execution
+# (bursts after a promotion, or right after the catalog cache was dropped).
+service_flights = SingleFlight("restaurant_service")
+
 class AbstractRestaurantService(ABC):
     @abstractmethod
     def list_for_dashboard(
         self,
         *,
-        price_range: Optional[int],
-        tag: Optional[str],
+        price_range: Optional[List[int]],
+        tag: Optional[List[str]],
         sort: Optional[str],
         user_lat: Optional[float],
         user_lng: Optional[float],
-    ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        min_rating: Optional[int] = None,
+        after: Optional[Key] = None,
+        limit: int = settings.PAGE_SIZE,
+    ) -> Page[Dict[str, Any]]:
+        """One page of restaurants; `page.meta["facets"]` holds the facet counts."""
         ...
 
     @abstractmethod
@@ -386,117 +867,531 @@ class RestaurantService(AbstractRestaurantService):
     def _(self, key: str) -> Dict[str, Any]:
         return {"tag": key}
 
+    def _ensure_geo_index(self) -> None:
+        idx = restaurant_geo_index
+        if not idx.loaded or time.monotonic() - idx.built_at > settings.GEO_INDEX_MAX_AGE:
+            idx.rebuild(self.repo.coordinates())
+
     def _distance_enrich(
         self,
         items: Iterable[Restaurant],
         user_lat: Optional[float],
         user_lng: Optional[float],
+        distances: Optional[Dict[int, float]] = None,
     ) -> List[Dict[str, Any]]:
         out: List[Dict[str, Any]] = []
         ulat = float(user_lat) if user_lat is not None else None
         ulng = float(user_lng) if user_lng is not None else None
         for r in items:
             d: Optional[float] = None
-            if ulat is not None and ulng is not None and r.location.is_valid():
+            if distances is not None and r.id in distances:
+                d = round(distances[r.id], 3)
+            elif ulat is not None and ulng is not None and r.location.is_valid():
                 d = round(haversine_km(ulat, ulng, r.location.lat, r.location.lng), 3)
             data = r.to_dict()
             data["distance_km"] = d
             out.append(data)
         return out
 
+    def _sort_spec(
+        self,
+        sort: Optional[str],
+        snap: CatalogSnapshot,
+        distances: Dict[int, float],
+        popularity: Dict[int, int],
+    ) -> SortSpec:
+        """Spec over row numbers of `snap`; values are read from its columns, not the entities."""
+        t = snap.table
+        ids = t.ids
+
+        def getter(i: int, field: str) -> Any:
+            if field == "distance":
+                d = distances.get(ids[i])
+                return round(d, 6) if d is not None else None
+            if field == "popularity":
+                return popularity.get(ids[i], 0)
+            if field == "name":
+                return snap.name_keys[i][0]
+            if field == "ratings":
+                return t.ratings[i]
+            if field == "price_range":
+                return t.price(i)
+            return ids[i]
+        spec = SortSpec.parse(SORT_ALIASES.get(sort, sort), SORT_FIELDS, getter)
+        return spec.then(SortKey("id"))
+
     def list_for_dashboard(
         self,
         *,
-        price_range: Optional[int],
-        tag: Optional[str],
+        price_range: Optional[List[int]],
+        tag: Optional[List[str]],
         sort: Optional[str],
         user_lat: Optional[float],
         user_lng: Optional[float],
-    ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
-        items = self.repo.list(
+        min_rating: Optional[int] = None,
+        after: Optional[Key] = None,
+        limit: int = settings.PAGE_SIZE,
+    ) -> Page[Dict[str, Any]]:
+        """
+        `sort` is None/"name", "ratings", "distance", "popularity" or a
+        composite spec (see utils.sorting.SortSpec). Name and ratings order
+        walk the snapshot's precomputed orderings; anything else takes the
+        first `limit` rows after the cursor with a heap. Raises ValueError
+        for an unknown sort field or a cursor from a different ordering.
+        """
+        key = (
+            "list_for_dashboard", type(self.repo), tuple(price_range or ()), tuple(tag or ()),
+            sort, user_lat, user_lng, min_rating, after, limit,
+        )
+        return service_flights.do(key, lambda: self._list_for_dashboard(
             price_range=price_range,
             tag=tag,
-            order_by_ratings=True if sort == "ratings" else False,
-        )
-        enriched = self._distance_enrich(items, user_lat, user_lng)
-        if sort == "distance" and user_lat is not None and user_lng is not None:
-            enriched = bubble_sort(enriched, key="distance_km", reverse=False)
-        counts = self.repo.tag_counts(price_range=price_range)
-        return enriched, counts
+            sort=sort,
+            user_lat=user_lat,
+            user_lng=user_lng,
+            min_rating=min_rating,
+            after=after,
+            limit=limit,
+        ))
+
+    def _list_for_dashboard(
+        self,
+        *,
+        price_range: Optional[List[int]],
+        tag: Optional[List[str]],
+        sort: Optional[str],
+        user_lat: Optional[float],
+        user_lng: Optional[float],
+        min_rating: Optional[int],
+        after: Optional[Key],
+        limit: int,
+    ) -> Page[Dict[str, Any]]:
+        spec = SORT_ALIASES.get(sort or "name", sort)
+        try:
+            if spec in ("name", "-ratings,name"):
+                page, counts = self.repo.page(
+                    tags=tag,
+                    price_ranges=price_range,
+                    min_rating=min_rating,
+                    order_by_ratings=spec != "name",
+                    after=after,
+                    limit=limit,
+                )
+                distances: Optional[Dict[int, float]] = None
+            else:
+                snap, rows, counts = self.repo.filter_rows(tags=tag, price_ranges=price_range, min_rating=min_rating)
+                distances = {}
+                if "distance" in spec and user_lat is not None and user_lng is not None:
+                    self._ensure_geo_index()
+                    distances = dict(restaurant_geo_index.nearest(float(user_lat), float(user_lng)))
+                popularity = self.repo.popularity() if "popularity" in spec else {}
+                sorter = self._sort_spec(spec, snap, distances, popularity)
+                # Generic cursors carry their spec so one from another ordering is rejected.
+                if after is not None and (not after or after[0] != str(sorter)):
+                    raise ValueError("cursor does not match this sort order")
+                rows, next_values = sorter.page(rows, limit, after[1:] if after is not None else None)
+                items = [snap.restaurants[i] for i in rows]
+                page = Page(items, limit, encode_cursor((str(sorter),) + next_values) if next_values else None)
+        except TypeError:
+            raise ValueError("cursor does not match this sort order") from None
+        enriched = self._distance_enrich(page.items, user_lat, user_lng, distances=distances)
+        return Page(enriched, limit, page.next_cursor, {"facets": counts, "sort": spec})
+
+    def search(self, term: str, *, after: Optional[Key] = None, limit: int = settings.PAGE_SIZE) -> Page[Dict[str, Any]]:
+        def load() -> Page[Dict[str, Any]]:
+            page = self.repo.search_page(term, after=after, limit=limit)
+            return Page([r.to_dict() for r in page.items], limit, page.next_cursor)
+        return service_flights.do(("search", type(self.repo), term, after, limit), load)
+
+    def search_by_name(self, term: str) -> List[Restaurant]:
+        return service_flights.do(("search_by_name", type(self.repo), term), lambda: self.repo.search_by_name(term))
 
     def details(self, restaurant_id: int) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
-        r = self.repo.get(restaurant_id)
-        if not r:
-            return None, []
-        menu = [m.to_dict() for m in self.repo.get_menu(restaurant_id)]
-        return r.to_dict() | {"images": [r.image_url] if r.image_url else []}, menu
+        def load() -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+            r = self.repo.get(restaurant_id)
+            if not r:
+                return None, []
+            menu = [m.to_dict() for m in self.repo.get_menu(restaurant_id)]
+            return r.to_dict() | {"images": r.images}, menu
+        return service_flights.do(("details", type(self.repo), int(restaurant_id)), load)
+
+    def nearby(self, lat: float, lng: float, k: int = 10, radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        self._ensure_geo_index()
+        hits = restaurant_geo_index.nearest(lat, lng, k=k, radius_km=radius_km)
+        distances = dict(hits)
+        return [
+            r.to_dict() | {"distance_km": round(distances[r.id], 3)}
+            for r in self.repo.get_many([rid for rid, _ in hits])
+        ]
+
+    def search_menu(self, term: str = "", max_price: Optional[float] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Matching dishes grouped per restaurant, best group first."""
+        groups = self.repo.search_menu(term, max_price=max_price, limit=limit)
+        by_id = {r.id: r for r in self.repo.get_many([rid for rid, _, _ in groups if rid is not None])}
+        return [
+            {
+                "restaurant": by_id[rid].to_dict(),
+                "score": score,
+                "min_price": items[0].price,
+                "items": [m.to_dict() for m in items],
+            }
+            for rid, score, items in groups
+            if rid in by_id
+        ]
+
+class AsyncRestaurantService:
+    """Awaitable facade over RestaurantService; every call runs on the DB executor."""
+
+    def __init__(self, service: RestaurantService):
+        self._service = service
+
+    @property
+    def repo(self) -> RestaurantRepository:
+        return self._service.repo
+
+    async def list_for_dashboard(self, **kwargs) -> Page[Dict[str, Any]]:
+        return await run_in_db(self._service.list_for_dashboard, **kwargs)
+
+    async def search(self, term: str, *, after: Optional[Key] = None, limit: int = settings.PAGE_SIZE) -> Page[Dict[str, Any]]:
+        return await run_in_db(self._service.search, term, after=after, limit=limit)
+
+    async def details(self, restaurant_id: int) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        return await run_in_db(self._service.details, restaurant_id)
+
+    async def nearby(self, lat: float, lng: float, k: int = 10, radius_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await run_in_db(self._service.nearby, lat, lng, k, radius_km)
+
+    async def search_menu(self, term: str = "", max_price: Optional[float] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        return await run_in_db(self._service.search_menu, term, max_price, limit)
+
+    async def get(self, restaurant_id: int) -> Optional[Restaurant]:
+        return await run_in_db(self.repo.get, restaurant_id)
+
+    async def get_menu(self, restaurant_id: int) -> List[MenuItem]:
+        return await run_in_db(self.repo.get_menu, restaurant_id)
+
+    async def search_by_name(self, term: str) -> List[Restaurant]:
+        return await run_in_db(self._service.search_by_name, term)
+
+    async def suggest(self, term: str, limit: int = 8) -> List[Tuple[Restaurant, float]]:
+        return await run_in_db(self.repo.suggest, term, limit=limit)
+
+    async def tag_counts(self, price_range: Optional[int] = None) -> Dict[str, int]:
+        return await run_in_db(self.repo.tag_counts, price_range)
+
+    async def set_rating(self, restaurant_id: int, rating: float) -> None:
+        await run_in_db(self.repo.set_rating, restaurant_id, rating)
+
+def _service(db) -> AsyncRestaurantService:
+    return AsyncRestaurantService(RestaurantService(CachedRestaurantRepository(db)))
+
+def _fetch_events(
+    db: mysql.connector.MySQLConnection,
+    *,
+    upcoming_only: bool = True,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """Events with their restaurant's primary picture, in a single round trip."""
+    sql = """
+        SELECT e.id, e.event_name AS name, e.event_description AS description,
+               e.event_datetime AS datetime, r.name AS restaurant_name, r.id AS restaurant_id,
+               (SELECT i.image_url FROM newestone.image_for_restaurant i
+                 WHERE i.restaurant_id = r.id LIMIT 1) AS image_path
+        FROM newestone.events e
+        JOIN newestone.restaurants r ON e.restaurant_id = r.id
+    """
+    if upcoming_only:
+        sql += " WHERE e.event_datetime >= NOW()"
+    sql += " ORDER BY e.event_datetime ASC LIMIT %s OFFSET %s"
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(sql, (int(limit), int(offset)))
+    events = cursor.fetchall()
+    cursor.close()
+    for ev in events:
+        ev["picture"] = {"image_path": to_public_image_url(ev.pop("image_path", None))}
+    return events
+
+def _insert_booking(
+    db: mysql.connector.MySQLConnection,
+    order_id: str,
+    restaurant_id: int,
+    people: int,
+    booking_datetime: str,
+    status: str,
+    idem_key: Optional[str] = None,
+    owner: str = "",
+) -> Tuple[str, bool]:
+    """
+    (order id, created); a repeated `idem_key` from the same `owner` returns
+    the original order id and created=False, or raises KeyReused if it came
+    with a different booking.
+    """
+    cursor = db.cursor()
+    try:
+        if idem_key:
+            existing = idempotency.claim(
+                cursor, "userdb_book", idem_key, order_id,
+                owner=owner, fingerprint=idempotency.fingerprint_of(restaurant_id, people, booking_datetime),
+            )
+            if existing is not None:
+                db.rollback()
+                return existing, False
+        if not capacity.reserve(cursor, restaurant_id, booking_datetime, people, order_id=order_id):
+            raise capacity.SlotFullError(booking_datetime)
+        cursor.execute(
+            """
+            INSERT INTO newestone.bookings
+              (order_id, restaurant_id, number_of_guests, booking_datetime, status)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (order_id, restaurant_id, people, booking_datetime, status),
+        )
+        booking_rollups.apply_booking(cursor, restaurant_id, booking_datetime, status, people)
+        db.commit()
+        return order_id, True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def _cursor(after: Optional[str]) -> Optional[Key]:
+    try:
+        return decode_cursor(after)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid 'after' cursor")
+
+def _next_url(request: Request, page: Page) -> Optional[str]:
+    if not page.next_cursor:
+        return None
+    return with_query(request.url.path, request.query_params.multi_items(), after=page.next_cursor)
+
+def _page_json(request: Request, page: Page, **extra: Any) -> Dict[str, Any]:
+    return {
+        **extra,
+        "count": len(page.items),
+        "limit": page.limit,
+        "next_cursor": page.next_cursor,
+        "next": _next_url(request, page),
+        "results": page.items,
+    }
+
+def _dashboard_filters(tag: List[str], price_range: List[int], min_rating: Optional[int]) -> Dict[str, Any]:
+    active_tags = [t.strip().lower() for t in tag if t and t.strip()]
+    selected_prices = [p for p in price_range if p in PRICE_RANGES]
+    return {
+        "active_tag": active_tags[0] if active_tags else None,
+        "active_tags": active_tags,
+        "selected_price": selected_prices[0] if selected_prices else None,
+        "selected_prices": selected_prices,
+        "min_rating": min_rating,
+    }
+
+# Rendered /userdash pages for the bounded anonymous key space: known tags,
+# prices and sort modes, no user coordinates, first page only.
+userdash_cache = PageCache(
+    maxsize=settings.PAGE_CACHE_MAX_ENTRIES,
+    ttl=settings.PAGE_CACHE_TTL,
+    stale_ttl=settings.PAGE_CACHE_STALE_TTL,
+    name="userdash",
+)
+
+DashKey = Tuple[str, Tuple[str, ...], Tuple[int, ...], Optional[int], int]  # (sort, tags, prices, min_rating, limit)
+
+def _userdash_key(sort: Optional[str], filters: Dict[str, Any], min_rating: Optional[int], limit: int) -> Optional[DashKey]:
+    if sort not in (None, *SORT_ALIASES) or not set(filters["active_tags"]) <= set(ALLOWED_TAGS):
+        return None
+    return (
+        sort or "name",
+        tuple(sorted(set(filters["active_tags"]))),
+        tuple(sorted(set(filters["selected_prices"]))),
+        min_rating,
+        limit,
+    )
+
+def _userdash_params(key: DashKey) -> List[Tuple[str, Any]]:
+    sort, tags, prices, min_rating, limit = key
+    params: List[Tuple[str, Any]] = [("sort", sort)]
+    params += [("tag", t) for t in tags] + [("price_range", p) for p in prices]
+    if min_rating is not None:
+        params.append(("min_rating", min_rating))
+    if limit != settings.PAGE_SIZE:
+        params.append(("limit", limit))
+    return params
+
+async def _render_userdash(
+    service: AsyncRestaurantService,
+    request: Optional[Request],
+    filters: Dict[str, Any],
+    *,
+    sort: Optional[str],
+    min_rating: Optional[int],
+    user_lat: Optional[float] = None,
+    user_lng: Optional[float] = None,
+    after: Optional[Key] = None,
+    limit: int = settings.PAGE_SIZE,
+    params: Optional[List[Tuple[str, Any]]] = None,
+):
+    """The restaurant listing page; links carry `params` instead of the request's query when given."""
+    page = await service.list_for_dashboard(
+        price_range=filters["selected_prices"],
+        tag=filters["active_tags"],
+        min_rating=min_rating,
+        sort=sort,
+        user_lat=user_lat,
+        user_lng=user_lng,
+        after=after,
+        limit=limit,
+    )
+    facet_counts = page.meta["facets"]
+    if params is None:
+        next_url = _next_url(request, page)
+    else:
+        next_url = with_query("/userdash", params, after=page.next_cursor) if page.next_cursor else None
+    return templates.TemplateResponse(
+        "userdash.html",
+        {
+            "request": request,
+            "restaurant_client_data": page.items,
+            **filters,
+            "sort_by": sort,
+            "user_lat": user_lat,
+            "user_lng": user_lng,
+            "available_tags": ALLOWED_TAGS,
+            "tag_counts": facet_counts["tag"],
+            "facet_counts": facet_counts,
+            "next_url": next_url,
+            "show_events": False,
+        },
+    )
+
+async def _render_cached_userdash(service: AsyncRestaurantService, request: Optional[Request], key: DashKey) -> bytes:
+    sort, tags, prices, min_rating, limit = key
+    response = await _render_userdash(
+        service,
+        request,
+        _dashboard_filters(list(tags), list(prices), min_rating),
+        sort=sort,
+        min_rating=min_rating,
+        limit=limit,
+        params=_userdash_params(key),
+    )
+    return response.body
 
-def _service(db) -> RestaurantService:
-    return RestaurantService(RestaurantRepository(db))
+async def prerender_userdash() -> int:
+    """Render every single-tag x single-price x sort page (plus anything already cached) into userdash_cache."""
+    keys = {
+        (sort, tags, prices, None, settings.PAGE_SIZE)
+        for sort in SORT_ALIASES
+        for tags in [(), *((t,) for t in ALLOWED_TAGS)]
+        for prices in [(), *((p,) for p in PRICE_RANGES)]
+    }
+    keys.update(userdash_cache.keys())
+    t0 = time.perf_counter()
+    async with db_connection() as db:
+        service = _service(db)
+        for key in keys:
+            await userdash_cache.refresh(key, lambda k=key: _render_cached_userdash(service, None, k))
+    print(f"[PAGE CACHE] prerendered {len(keys)} /userdash pages in {(time.perf_counter() - t0) * 1000:.0f}ms")
+    return len(keys)
+
+@on_catalog_change
+def _expire_userdash_pages(restaurant_id: Optional[int]) -> None:
+    userdash_cache.mark_stale()
+    if settings.PAGE_CACHE_PRERENDER:
+        userdash_cache.schedule(prerender_userdash)
 
 @router.get("/userdash")
 async def userdash(
     request: Request,
     sort: Optional[str] = Query(None),
-    price_range: Optional[int] = Query(None),
-    tag: Optional[str] = Query(None),
+    price_range: List[int] = Query([]),
+    tag: List[str] = Query([]),
+    min_rating: Optional[int] = Query(None, ge=0, le=5),
     user_lat: Optional[float] = Query(None),
     user_lng: Optional[float] = Query(None),
     show_menu: bool = False,
-    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+    upcoming: bool = Query(True),
+    events_limit: int = Query(50, ge=1, le=200),
+    events_offset: int = Query(0, ge=0),
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None),
 ):
+    filters = _dashboard_filters(tag, price_range, min_rating)
     if show_menu:
-        cursor = db.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT e.id, e.event_name AS name, e.event_description AS description,
-                   e.event_datetime AS datetime, r.name AS restaurant_name, r.id AS restaurant_id
-            FROM newestone.events e
-            JOIN newestone.restaurants r ON e.restaurant_id = r.id
-            ORDER BY e.event_datetime ASC
-            """
-        )
-        events = cursor.fetchall()
-        for ev in events:
-            cursor.execute(
-                "SELECT image_url AS image_path FROM newestone.image_for_restaurant WHERE restaurant_id = %s LIMIT 1",
-                (ev["restaurant_id"],),
+        async with db_connection() as db:
+            events = await run_in_db(
+                _fetch_events, db, upcoming_only=upcoming, limit=events_limit, offset=events_offset
             )
-            pic = cursor.fetchone()
-            ev["picture"] = {"image_path": to_public_image_url(pic["image_path"])} if pic and pic.get("image_path") else {"image_path": None}
-        cursor.close()
         return templates.TemplateResponse(
             "userdash.html",
             {
                 "request": request,
                 "events": events,
                 "show_events": True,
-                "active_tag": tag,
+                "upcoming": upcoming,
+                "events_limit": events_limit,
+                "events_offset": events_offset,
+                **filters,
                 "sort_by": sort,
-                "selected_price": price_range,
                 "available_tags": ALLOWED_TAGS,
                 "tag_counts": {t: 0 for t in ALLOWED_TAGS},
             },
         )
+    cursor = _cursor(after)
+    key = _userdash_key(sort, filters, min_rating, limit) if cursor is None and user_lat is None and user_lng is None else None
+    try:
+        if key is not None:
+            async def render() -> bytes:
+                async with db_connection() as db:
+                    return await _render_cached_userdash(_service(db), request, key)
+            body, state = await userdash_cache.get_or_render(key, render)
+            return HTMLResponse(body, headers={"X-Page-Cache": state})
+        async with db_connection() as db:
+            return await _render_userdash(
+                _service(db),
+                request,
+                filters,
+                sort=sort,
+                min_rating=min_rating,
+                user_lat=user_lat,
+                user_lng=user_lng,
+                after=cursor,
+                limit=limit,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/userdash/data")
+async def userdash_data(
+    request: Request,
+    sort: Optional[str] = Query(None),
+    price_range: List[int] = Query([]),
+    tag: List[str] = Query([]),
+    min_rating: Optional[int] = Query(None, ge=0, le=5),
+    user_lat: Optional[float] = Query(None),
+    user_lng: Optional[float] = Query(None),
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    filters = _dashboard_filters(tag, price_range, min_rating)
     service = _service(db)
-    restaurants, tag_counts = service.list_for_dashboard(
-        price_range=price_range, tag=tag, sort=sort, user_lat=user_lat, user_lng=user_lng
-    )
-    return templates.TemplateResponse(
-        "userdash.html",
-        {
-            "request": request,
-            "restaurant_client_data": restaurants,
-            "active_tag": tag,
-            "sort_by": sort,
-            "selected_price": price_range,
-            "user_lat": user_lat,
-            "user_lng": user_lng,
-            "available_tags": ALLOWED_TAGS,
-            "tag_counts": tag_counts,
-            "show_events": False,
-        },
-    )
+    try:
+        page = await service.list_for_dashboard(
+            price_range=filters["selected_prices"],
+            tag=filters["active_tags"],
+            min_rating=min_rating,
+            sort=sort,
+            user_lat=user_lat,
+            user_lng=user_lng,
+            after=_cursor(after),
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page_json(request, page, facets=page.meta["facets"])
 
 @router.get("/details/{restaurant_id}")
 async def details(
@@ -505,11 +1400,36 @@ async def details(
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
     service = _service(db)
-    restaurant, menu_items = service.details(restaurant_id)
+    restaurant, menu_items = await service.details(restaurant_id)
     if restaurant:
         return templates.TemplateResponse("details.html", {"request": request, "restaurant": restaurant, "menu_items": menu_items})
     return templates.TemplateResponse("details.html", {"request": request, "restaurant": None, "menu_items": [], "error": "Restaurant not found"})
 
+@router.get("/nearby")
+async def nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100),
+    radius_km: Optional[float] = Query(None, gt=0),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    service = _service(db)
+    results = await service.nearby(lat, lng, k=k, radius_km=radius_km)
+    return {"lat": lat, "lng": lng, "count": len(results), "results": results}
+
+@router.get("/menu/search")
+async def menu_search(
+    q: str = Query("", max_length=100),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    if not q.strip() and max_price is None:
+        raise HTTPException(status_code=400, detail="Provide q and/or max_price")
+    service = _service(db)
+    results = await service.search_menu(q, max_price=max_price, limit=limit)
+    return {"q": q, "max_price": max_price, "count": len(results), "results": results}
+
 @router.post("/filter-restaurants")
 async def filter_restaurants(price_range: Optional[int] = Form(None)):
     if price_range is None:
@@ -522,45 +1442,116 @@ async def filter_by_tag(tag: Optional[str] = Form(None)):
         return RedirectResponse(url="/userdash", status_code=303)
     return RedirectResponse(url=f"/userdash?tag={quote_plus(tag)}", status_code=303)
 
+def _search_response(request: Request, search_term: str, page: Page):
+    return templates.TemplateResponse(
+        "userdash.html",
+        {
+            "request": request,
+            "restaurant_client_data": page.items,
+            "search_term": search_term,
+            "next_url": (
+                with_query("/search", [("q", search_term), ("limit", page.limit)], after=page.next_cursor)
+                if page.next_cursor else None
+            ),
+            "show_events": False,
+        },
+    )
+
 @router.post("/search")
 async def search_restaurants(
     request: Request,
     search_term: str = Form(...),
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
+    await limiter.enforce(("search-ip", client_ip(request), settings.RATE_LIMIT_SEARCH_IP))
     service = _service(db)
-    results = service.repo.search_by_name(search_term)
-    if not results:
+    page = await service.search(search_term)
+    if not page.items:
         return RedirectResponse(url="/userdash", status_code=303)
-    data = [r.to_dict() for r in results]
-    return templates.TemplateResponse(
-        "userdash.html",
-        {"request": request, "restaurant_client_data": data, "search_term": search_term, "show_events": False},
-    )
+    return _search_response(request, search_term, page)
+
+@router.get("/search")
+async def search_restaurants_page(
+    request: Request,
+    q: str = Query(..., max_length=100),
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    await limiter.enforce(("search-ip", client_ip(request), settings.RATE_LIMIT_SEARCH_IP))
+    service = _service(db)
+    try:
+        page = await service.search(q, after=_cursor(after), limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page.items and after is None:
+        return RedirectResponse(url="/userdash", status_code=303)
+    return _search_response(request, q, page)
+
+@router.get("/search/data")
+async def search_data(
+    request: Request,
+    q: str = Query(..., max_length=100),
+    limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.PAGE_SIZE_MAX),
+    after: Optional[str] = Query(None),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    await limiter.enforce(("search-ip", client_ip(request), settings.RATE_LIMIT_SEARCH_IP))
+    service = _service(db)
+    try:
+        page = await service.search(q, after=_cursor(after), limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _page_json(request, page, q=q)
+
+@router.get("/search/suggest")
+async def search_suggest(
+    q: str = Query("", max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    db: mysql.connector.MySQLConnection = Depends(get_db_connection),
+):
+    service = _service(db)
+    hits = await service.suggest(q, limit)
+    return {
+        "q": q,
+        "results": [
+            {"id": r.id, "name": r.name, "tag": r.tag, "ratings": r.ratings, "score": score}
+            for r, score in hits
+        ],
+    }
 
 @router.post("/userdb/book")
-def book(
+async def book(
+    request: Request,
     people: int = Form(...),
     date: str = Form(...),
     time: str = Form(...),
     restaurant_id: int = Form(...),
+    idempotency_key: Optional[str] = Form(None),
     db: mysql.connector.MySQLConnection = Depends(get_db_connection),
 ):
-    cursor = db.cursor()
-    user_id = "userwefw"
+    try:
+        idem_key = idempotency.normalize_key(request.headers.get(idempotency.HEADER) or idempotency_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     status = "pending"
     booking_datetime = f"{date.strip()} {time.strip()}:00"
-    cursor.execute(
-        """
-        INSERT INTO newestone.bookings
-          (order_id, restaurant_id, number_of_guests, booking_datetime, status)
-        VALUES (%s, %s, %s, %s, %s)
-        """,
-        (user_id, restaurant_id, people, booking_datetime, status),
-    )
-    db.commit()
-    cursor.close()
-    return {"success": True, "message": f"Booking confirmed, status: {status}"}
+    try:
+        order_id, created = await run_in_db(
+            _insert_booking, db, order_ids.next_id(), restaurant_id, people, booking_datetime, status, idem_key, session_key(request)
+        )
+    except capacity.SlotFullError:
+        raise HTTPException(status_code=409, detail="That time slot is fully booked for your party")
+    except idempotency.KeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different booking")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date or time")
+    return {
+        "success": True,
+        "order_id": order_id,
+        "duplicate": not created,
+        "message": f"Booking confirmed, status: {status}",
+    }
 
 @router.post("/rate-restaurant")
 async def rate_restaurant(
@@ -570,5 +1561,5 @@ async def rate_restaurant(
 ):
     rating = max(1.0, min(5.0, float(rating)))
     service = _service(db)
-    service.repo.set_rating(restaurant_id, rating)
+    await service.set_rating(restaurant_id, rating)
     return RedirectResponse(url=f"/details/{restaurant_id}?rated=1", status_code=303)
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# Tests import the app's modules the way the app does (from the backend directory).
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,47 @@
+# tests/test_api_cache.py
+"""Only canonical /api/v1/restaurants requests get a catalog cache entry of their own."""
+import contextlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bench._fakedb import FakeConnection, make_restaurants
+from models.catalog import catalog_cache
+from routes.api import v1
+
+
+def _api_keys():
+    return {k for k in catalog_cache._data if isinstance(k, tuple) and k[:1] == ("api",)}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    @contextlib.asynccontextmanager
+    async def db_connection():
+        yield FakeConnection(make_restaurants(30))
+
+    async def run_in_db(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    monkeypatch.setattr(v1, "db_connection", db_connection)
+    monkeypatch.setattr(v1, "run_in_db", run_in_db)
+    catalog_cache.clear()
+    app = FastAPI()
+    app.include_router(v1.router)
+    yield TestClient(app)
+    catalog_cache.clear()
+
+
+def test_unknown_tags_are_not_cached(client):
+    for i in range(5):
+        assert client.get("/api/v1/restaurants", params={"tag": f"junk-{i}"}).status_code == 200
+    assert _api_keys() == set()
+
+
+def test_cursor_spellings_share_one_entry(client):
+    first = client.get("/api/v1/restaurants", params={"limit": 5}).json()
+    token = first["next_cursor"]
+    for after in (token, token + "=" * (-len(token) % 4)):
+        assert client.get("/api/v1/restaurants", params={"limit": 5, "after": after}).status_code == 200
+    assert len(_api_keys()) == 2  # the first page and the second, once
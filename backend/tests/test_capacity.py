@@ -0,0 +1,49 @@
+# tests/test_capacity.py
+"""capacity.reserve refuses a party the slot has no room for, and changes nothing when it does."""
+import pytest
+
+from bench._fakedb import FakeBookingConnection
+from models import capacity
+from routes.public import booking
+
+WHEN = "2030-06-01 19:00:00"
+
+
+def _reserved(db):
+    return [reserved for _, reserved in db.slots.values()]
+
+
+def test_reserve_refuses_past_capacity():
+    seats = capacity.default_config().seats
+    db = FakeBookingConnection()
+    cur = db.cursor()
+    assert capacity.reserve(cur, 1, WHEN, seats)
+    assert not capacity.reserve(cur, 1, WHEN, 1)
+    assert _reserved(db) == [seats]
+
+
+def test_reserve_refuses_party_larger_than_slot():
+    seats = capacity.default_config().seats
+    db = FakeBookingConnection()
+    assert not capacity.reserve(db.cursor(), 1, WHEN, seats + 1)
+    assert _reserved(db) == [0]
+
+
+def test_force_reserve_ignores_capacity():
+    seats = capacity.default_config().seats
+    db = FakeBookingConnection()
+    cur = db.cursor()
+    assert capacity.reserve(cur, 1, WHEN, seats)
+    assert capacity.reserve(cur, 1, WHEN, 2, force=True)
+    assert _reserved(db) == [seats + 2]
+
+
+def test_full_slot_rolls_back_the_booking():
+    seats = capacity.default_config().seats
+    db = FakeBookingConnection()
+    booking._insert_booking(db, {"restaurant_id": 1, "people": seats, "booking_datetime": WHEN}, "key-1")
+    with pytest.raises(capacity.SlotFullError):
+        booking._insert_booking(db, {"restaurant_id": 1, "people": 1, "booking_datetime": WHEN}, "key-2")
+    assert len(db.bookings) == 1
+    assert _reserved(db) == [seats]
+    assert len(db.idempotency) == 1  # key-2 was released with the rollback
@@ -0,0 +1,69 @@
+# tests/test_idempotency.py
+"""A replayed idempotency key returns the first order's id and inserts nothing; other owners and other bookings never replay it."""
+import pytest
+
+from bench._fakedb import FakeBookingConnection
+from models import idempotency
+from routes.public import booking, userdb
+
+
+def _payload(**extra):
+    return {"restaurant_id": 1, "people": 2, "booking_datetime": "2030-06-01 19:00:00", **extra}
+
+
+def test_booking_replay_returns_original_order_id():
+    db = FakeBookingConnection()
+    first = booking._insert_booking(db, _payload(), "key-1")
+    again = booking._insert_booking(db, _payload(), "key-1")
+    assert again == first
+    assert len(db.bookings) == 1
+
+
+def test_userdb_replay_returns_original_order_id():
+    db = FakeBookingConnection()
+    first = userdb._insert_booking(db, "NB-A", 1, 2, "2030-06-01 19:00:00", "pending", "key-1")
+    again = userdb._insert_booking(db, "NB-B", 1, 2, "2030-06-01 19:00:00", "pending", "key-1")
+    assert first == ("NB-A", True)
+    assert again == ("NB-A", False)
+    assert len(db.bookings) == 1
+
+
+def test_distinct_keys_insert_separate_bookings():
+    db = FakeBookingConnection()
+    a = booking._insert_booking(db, _payload(), "key-1")
+    b = booking._insert_booking(db, _payload(), "key-2")
+    assert a != b
+    assert len(db.bookings) == 2
+
+
+def test_replay_does_not_take_seats_twice():
+    db = FakeBookingConnection()
+    booking._insert_booking(db, _payload(people=3), "key-1")
+    booking._insert_booking(db, _payload(people=3), "key-1")
+    assert [reserved for _, reserved in db.slots.values()] == [3]
+
+
+def test_same_key_from_another_email_is_a_new_booking():
+    db = FakeBookingConnection()
+    a = booking._insert_booking(db, _payload(email="a@example.com"), "key-1")
+    b = booking._insert_booking(db, _payload(email="b@example.com"), "key-1")
+    assert a != b
+    assert len(db.bookings) == 2
+
+
+def test_key_reused_for_another_booking_is_refused():
+    db = FakeBookingConnection()
+    booking._insert_booking(db, _payload(email="a@example.com"), "key-1")
+    with pytest.raises(idempotency.KeyReused):
+        booking._insert_booking(db, _payload(email="a@example.com", people=5), "key-1")
+    assert len(db.bookings) == 1
+
+
+def test_userdb_key_is_scoped_per_session():
+    db = FakeBookingConnection()
+    first = userdb._insert_booking(db, "NB-A", 1, 2, "2030-06-01 19:00:00", "pending", "key-1", "session-a")
+    other = userdb._insert_booking(db, "NB-B", 1, 2, "2030-06-01 19:00:00", "pending", "key-1", "session-b")
+    assert first == ("NB-A", True)
+    assert other == ("NB-B", True)
+    with pytest.raises(idempotency.KeyReused):
+        userdb._insert_booking(db, "NB-C", 1, 2, "2030-06-02 19:00:00", "pending", "key-1", "session-a")
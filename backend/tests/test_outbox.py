@@ -0,0 +1,84 @@
+# tests/test_outbox.py
+"""A message that cannot be built fails on its own row; the rest of the batch is still sent."""
+import asyncio
+import contextlib
+from types import SimpleNamespace
+
+from models import outbox
+
+
+class _Pool:
+    config = SimpleNamespace(sender="NIGHTBITE <noreply@example.com>")
+
+    def __init__(self):
+        self.batches = []
+
+    def send_batch(self, messages):
+        self.batches.append([m["To"] for m in messages])
+        return [None] * len(messages)
+
+
+def _row(i, recipient):
+    return {"id": i, "recipient": recipient, "subject": "Code", "text_body": "123456", "html_body": None, "attempts": 1}
+
+
+def test_poison_row_is_failed_alone(monkeypatch):
+    rows = [_row(1, "a@example.com"), _row(2, "evil@example.com\r\nBcc: x@example.com"), _row(3, "c@example.com")]
+    batches = [rows]
+    sent, failed = [], []
+    monkeypatch.setattr(outbox, "claim", lambda db, limit, lease: batches.pop() if batches else [])
+    monkeypatch.setattr(outbox, "mark_sent", lambda db, ids: sent.extend(ids))
+    monkeypatch.setattr(outbox, "mark_failed", lambda db, i, attempts, error: failed.append(i) or outbox.PENDING)
+    pool = _Pool()
+    worker = outbox.OutboxWorker(pool=pool, batch=10, log=lambda _: None)
+
+    assert worker.drain(db=None) == 2
+    assert pool.batches == [["a@example.com", "c@example.com"]]
+    assert sent == [1, 3]
+    assert failed == [2]
+
+
+def test_send_batch_crash_fails_every_row(monkeypatch):
+    pool = _Pool()
+    pool.send_batch = lambda messages: 1 / 0
+    worker = outbox.OutboxWorker(pool=pool, log=lambda _: None)
+    results = worker.send([_row(1, "a@example.com"), _row(2, "b@example.com")])
+    assert [type(e) for e in results] == [ZeroDivisionError, ZeroDivisionError]
+
+
+def test_runner_sends_without_holding_a_connection(monkeypatch):
+    from models import database
+
+    held = []
+
+    @contextlib.asynccontextmanager
+    async def db_connection():
+        held.append(True)
+        try:
+            yield None
+        finally:
+            held.pop()
+
+    async def run_in_db(fn, *args):
+        return fn(*args)
+
+    class Pool(_Pool):
+        def send_batch(self, messages):
+            assert not held, "SMTP send while a DB connection is checked out"
+            return super().send_batch(messages)
+
+    batches = [[_row(1, "a@example.com")]]
+    monkeypatch.setattr(database, "db_connection", db_connection)
+    monkeypatch.setattr(database, "run_in_db", run_in_db)
+    monkeypatch.setattr(outbox, "claim", lambda db, limit, lease: batches.pop() if batches else [])
+    monkeypatch.setattr(outbox, "mark_sent", lambda db, ids: None)
+    runner = outbox.OutboxRunner(outbox.OutboxWorker(pool=Pool(), batch=10, log=lambda _: None))
+
+    async def main():
+        await runner.start()
+        try:
+            return await runner.drain()
+        finally:
+            await runner.stop()
+
+    assert asyncio.run(main()) == 1
@@ -0,0 +1,74 @@
+# tests/test_pagination.py
+"""Cursor tokens round-trip, malformed ones are rejected, and a keyset walk sees every row once."""
+import pytest
+
+from bench._fakedb import make_restaurants
+from utils.pagination import decode_cursor, encode_cursor, page_sorted
+
+
+@pytest.mark.parametrize("key", [(1,), (4.5, 17), ("Restaurant 000042", 42), (-3.0, "khmer", 0)])
+def test_cursor_round_trip(key):
+    token = encode_cursor(key)
+    assert "=" not in token
+    assert decode_cursor(token) == key
+
+
+@pytest.mark.parametrize("token", ["", None])
+def test_empty_cursor_is_none(token):
+    assert decode_cursor(token) is None
+
+
+# garbage, "not json", [], {"a":1}, 12, a non-UTF-8 byte
+@pytest.mark.parametrize("token", ["!!!", "bm90IGpzb24", "W10", "eyJhIjoxfQ", "MTI", "_w"])
+def test_bad_cursor_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_keyset_walk_visits_every_restaurant_once():
+    rows = sorted(make_restaurants(103), key=lambda r: (-r["ratings"], r["id"]))
+    keys = [(-r["ratings"], r["id"]) for r in rows]
+    seen, token = [], None
+    while True:
+        page = page_sorted(rows, keys, decode_cursor(token), 10)
+        seen += [r["id"] for r in page.items]
+        if not page.has_more:
+            break
+        token = page.next_cursor
+    assert seen == [r["id"] for r in rows]
+
+
+@pytest.fixture
+def client():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from bench._fakedb import FakeConnection
+    from models.database import get_db_connection
+    from routes.public.userdb import router
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db_connection] = lambda: FakeConnection(make_restaurants(30))
+    return TestClient(app)
+
+
+def test_search_data_walks_pages(client):
+    first = client.get("/search/data", params={"q": "restaurant", "limit": 10}).json()
+    assert len(first["results"]) == 10
+    token = first["next_cursor"]
+    second = client.get("/search/data", params={"q": "restaurant", "limit": 10, "after": token}).json()
+    assert not {r["id"] for r in first["results"]} & {r["id"] for r in second["results"]}
+
+
+@pytest.mark.parametrize("path", ["/search", "/search/data"])
+@pytest.mark.parametrize("key", [["restaurant 000003", 3], [1, 2, 3, 4], ["x"], [-1.0, -4.5, "restaurant 000003", "3"]])
+def test_search_rejects_cursor_of_another_shape(client, path, key):
+    r = client.get(path, params={"q": "restaurant", "after": encode_cursor(key)}, follow_redirects=False)
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/search", "/search/data"])
+def test_search_rejects_undecodable_cursor(client, path):
+    r = client.get(path, params={"q": "restaurant", "after": "!!!"}, follow_redirects=False)
+    assert r.status_code == 400
@@ -0,0 +1,34 @@
+# tests/test_repository_queries.py
+"""The repository's read paths cost a fixed number of round trips, however many restaurants match."""
+import pytest
+
+from bench._fakedb import FakeConnection, make_restaurants
+from routes.public.userdb import RestaurantRepository
+
+
+@pytest.fixture(params=[1, 50], ids=["one", "many"])
+def conn(request):
+    return FakeConnection(make_restaurants(request.param))
+
+
+def test_list_is_two_queries(conn):
+    restaurants = RestaurantRepository(conn).list()
+    assert len(restaurants) == len(conn.restaurants)
+    assert conn.queries == 2  # rows + one IN (...) for every picture
+
+
+def test_list_ordered_by_ratings_is_two_queries(conn):
+    RestaurantRepository(conn).list(order_by_ratings=True, gallery=True, limit=10)
+    assert conn.queries == 2
+
+
+def test_search_by_name_is_two_queries(conn):
+    restaurants = RestaurantRepository(conn).search_by_name("restaurant")
+    assert len(restaurants) == len(conn.restaurants)
+    assert conn.queries == 2
+
+
+def test_get_is_two_queries(conn):
+    restaurant = RestaurantRepository(conn).get(1)
+    assert restaurant is not None and restaurant.id == 1
+    assert conn.queries == 2
@@ -0,0 +1,64 @@
+# tests/test_rollup_backfill.py
+"""backfill() rebuilds the rollups only when they are empty, bookings exist and no other process holds the lock."""
+import pytest
+
+from models import booking_rollups
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._row = None
+
+    def execute(self, sql, params=()):
+        self.conn.statements.append(sql)
+        if "GET_LOCK" in sql:
+            self._row = (int(self.conn.lock_free),)
+        elif "EXISTS" in sql:
+            self._row = (int(self.conn.have_rollups), int(self.conn.have_bookings))
+        else:
+            self._row = (1,)
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+class _Conn:
+    def __init__(self, *, lock_free=True, have_rollups=False, have_bookings=True):
+        self.lock_free = lock_free
+        self.have_rollups = have_rollups
+        self.have_bookings = have_bookings
+        self.statements = []
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        pass
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    calls = []
+    monkeypatch.setattr(booking_rollups, "rebuild", lambda db, batch_size, log: calls.append(db) or {"batches": 1})
+    return calls
+
+
+def test_empty_rollups_are_backfilled(rebuilds):
+    db = _Conn()
+    assert booking_rollups.backfill(db, log=lambda _: None) == {"batches": 1}
+    assert rebuilds == [db]
+    assert "RELEASE_LOCK" in db.statements[-1]
+
+
+@pytest.mark.parametrize(
+    "state",
+    [{"have_rollups": True}, {"have_bookings": False}, {"lock_free": False}],
+    ids=["already-filled", "no-bookings", "locked"],
+)
+def test_backfill_skipped(rebuilds, state):
+    assert booking_rollups.backfill(_Conn(**state), log=lambda _: None) is None
+    assert rebuilds == []
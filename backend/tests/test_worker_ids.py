@@ -0,0 +1,97 @@
+# tests/test_worker_ids.py
+"""Processes started with the same WORKER_ID each lease a distinct worker id, so their order ids never collide."""
+import asyncio
+import contextlib
+
+from models import database, worker_ids
+from utils.ids import IdGenerator, split_id
+
+
+class _Table:
+    """newestone.worker_ids as a dict, leases never expiring within a test."""
+
+    def __init__(self, size=1024):
+        self.owners = {i: None for i in range(size)}
+
+    def lease(self, db, owner, seconds):
+        for i, held in self.owners.items():
+            if held is None:
+                self.owners[i] = owner
+                return i
+        return None
+
+    def renew(self, db, worker_id, owner, seconds):
+        return self.owners.get(worker_id) == owner
+
+    def release(self, db, worker_id, owner):
+        if self.owners.get(worker_id) == owner:
+            self.owners[worker_id] = None
+
+
+def _patch(monkeypatch, table):
+    @contextlib.asynccontextmanager
+    async def db_connection():
+        yield None
+
+    async def run_in_db(fn, *args):
+        return fn(*args)
+
+    monkeypatch.setattr(database, "db_connection", db_connection)
+    monkeypatch.setattr(database, "run_in_db", run_in_db)
+    monkeypatch.setattr(worker_ids, "lease", table.lease)
+    monkeypatch.setattr(worker_ids, "renew", table.renew)
+    monkeypatch.setattr(worker_ids, "release", table.release)
+
+
+def test_same_configured_worker_id_gets_distinct_leases(monkeypatch):
+    table = _Table()
+    _patch(monkeypatch, table)
+    gens = [IdGenerator(5, prefix="NB") for _ in range(8)]  # like `uvicorn --workers 8` with WORKER_ID=5
+    leases = [worker_ids.WorkerIdLease(g) for g in gens]
+
+    async def main():
+        for lease in leases:
+            await lease.start()
+        ids = [g.next_id() for _ in range(100) for g in gens]
+        workers = {g.worker_id for g in gens}
+        for lease in leases:
+            await lease.stop()
+        return ids, workers
+
+    ids, workers = asyncio.run(main())
+    assert len(workers) == 8
+    assert len(set(ids)) == len(ids)
+    assert set(table.owners.values()) == {None}  # every lease handed back on stop
+    assert {g.worker_id for g in gens} == {5}  # back to the configured fallback
+
+
+def test_lost_lease_is_replaced(monkeypatch):
+    table = _Table(size=2)
+    _patch(monkeypatch, table)
+    gen = IdGenerator(prefix="NB")
+    lease = worker_ids.WorkerIdLease(gen)
+
+    async def main():
+        await lease.start()
+        first = gen.worker_id
+        table.owners[first] = "someone else"  # our lease ran out and was taken over
+        await lease._tick()
+        second = gen.worker_id
+        await lease.stop()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert (first, second) == (0, 1)
+
+
+def test_no_free_id_falls_back(monkeypatch):
+    _patch(monkeypatch, _Table(size=0))
+    gen = IdGenerator(7)
+    lease = worker_ids.WorkerIdLease(gen)
+
+    async def main():
+        await lease.start()
+        await lease.stop()
+
+    asyncio.run(main())
+    assert split_id(gen.next_int())[1] == 7
@@ -0,0 +1,105 @@
+# utils/facets.py
+from __future__ import annotations
+from typing import Callable, Dict, Generic, Hashable, Iterable, List, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def _bitset(positions: List[int], size: int) -> int:
+    buf = bytearray((size + 7) // 8)
+    for p in positions:
+        buf[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(buf, "little")
+
+
+def iter_bits(mask: int) -> List[int]:
+    """Positions of the set bits in `mask`, ascending."""
+    bits = bin(mask)[:1:-1]
+    out: List[int] = []
+    i = bits.find("1")
+    while i != -1:
+        out.append(i)
+        i = bits.find("1", i + 1)
+    return out
+
+
+class FacetIndex(Generic[T]):
+    """
+    Bitmap index over a fixed list of items.
+
+    Every (facet, value) pair gets an int used as a bitset over item
+    positions. A query ORs the selected values inside a facet, ANDs across
+    facets, and counts each value against the other facets' selections
+    (so picking a tag still shows how many items every other tag has).
+    """
+
+    def __init__(self, items: Iterable[T], facets: Mapping[str, Callable[[T], Optional[Hashable]]]):
+        self.items: List[T] = list(items)
+        self.size = len(self.items)
+        self.all_mask = (1 << self.size) - 1
+        self.bitsets: Dict[str, Dict[Hashable, int]] = {
+            name: self._index(map(key_fn, self.items)) for name, key_fn in facets.items()
+        }
+
+    @classmethod
+    def from_columns(cls, items: Iterable[T], columns: Mapping[str, Iterable[Optional[Hashable]]]) -> "FacetIndex[T]":
+        """
+        Same index, with each facet's values given as a column parallel to
+        `items` (e.g. an `array` from models.catalog.RestaurantTable), so
+        building it never calls into the items themselves.
+        """
+        self = cls(items, {})
+        self.bitsets = {name: self._index(values) for name, values in columns.items()}
+        return self
+
+    def _index(self, values: Iterable[Optional[Hashable]]) -> Dict[Hashable, int]:
+        positions: Dict[Hashable, List[int]] = {}
+        for pos, value in enumerate(values):
+            if value is not None:
+                positions.setdefault(value, []).append(pos)
+        return {v: _bitset(ps, self.size) for v, ps in positions.items()}
+
+    def _facet_mask(self, facet: str, values: Optional[Iterable[Hashable]]) -> int:
+        if not values:
+            return self.all_mask
+        mask = 0
+        for v in values:
+            mask |= self.bitsets.get(facet, {}).get(v, 0)
+        return mask
+
+    def query(self, selected: Mapping[str, Optional[Iterable[Hashable]]]) -> Tuple[int, Dict[str, Dict[Hashable, int]]]:
+        """Return (matching mask, {facet: {value: count}}) for `selected` values per facet."""
+        names = list(self.bitsets)
+        masks = [self._facet_mask(n, selected.get(n)) for n in names]
+
+        # others[i] = AND of every facet mask except masks[i]
+        prefix, acc = [], self.all_mask
+        for m in masks:
+            prefix.append(acc)
+            acc &= m
+        match = acc
+        others = [0] * len(masks)
+        acc = self.all_mask
+        for i in range(len(masks) - 1, -1, -1):
+            others[i] = prefix[i] & acc
+            acc &= masks[i]
+
+        counts = {
+            name: {v: (bits & others[i]).bit_count() for v, bits in self.bitsets[name].items()}
+            for i, name in enumerate(names)
+        }
+        return match, counts
+
+    def member_test(self, mask: int) -> Callable[[int], int]:
+        """Constant-time `pos -> bit` lookup for `mask`, for walking an ordering lazily."""
+        buf = mask.to_bytes((self.size + 7) // 8 or 1, "little")
+        return lambda pos: buf[pos >> 3] >> (pos & 7) & 1
+
+    def select(self, mask: int, order: Optional[List[int]] = None) -> List[T]:
+        """Items whose bit is set in `mask`, in position order or in the given position `order`."""
+        if order is None:
+            return [self.items[p] for p in iter_bits(mask)]
+        member = bytearray(self.size)
+        for p in iter_bits(mask):
+            member[p] = 1
+        return [self.items[p] for p in order if member[p]]
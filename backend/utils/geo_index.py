@@ -0,0 +1,166 @@
+# utils/geo_index.py
+from __future__ import annotations
+import heapq
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.helpers import normalize_coords, haversine_km
+
+KM_PER_DEG_LAT = 111.195
+
+Cell = Tuple[int, int]
+Hit = Tuple[int, float]  # (entity id, distance in km)
+
+
+class GeoGridIndex:
+    """
+    Uniform lat/lng grid over point coordinates.
+
+    Points are bucketed into `cell_deg` x `cell_deg` cells. Radius queries
+    only visit the cells overlapping the search box, and k-nearest queries
+    walk outward ring by ring, stopping once no unvisited cell can hold a
+    closer point than the current k-th hit.
+    """
+
+    def __init__(self, cell_deg: float = 0.05):
+        self.cell_deg = float(cell_deg)
+        self._cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+        self.built_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    # ---------- maintenance ----------
+    def rebuild(self, points: Iterable[Tuple[int, object, object]]) -> None:
+        cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        pts: Dict[int, Tuple[float, float]] = {}
+        for entity_id, lat, lng in points:
+            lat, lng = normalize_coords(lat, lng)
+            if lat is None or lng is None:
+                continue
+            pts[int(entity_id)] = (lat, lng)
+            cells.setdefault(self._cell(lat, lng), {})[int(entity_id)] = (lat, lng)
+        with self._lock:
+            self._cells, self._points = cells, pts
+            self.loaded = True
+            self.built_at = time.monotonic()
+
+    def upsert(self, entity_id: int, lat, lng) -> None:
+        lat, lng = normalize_coords(lat, lng)
+        with self._lock:
+            self._remove_locked(int(entity_id))
+            if lat is None or lng is None:
+                return
+            self._points[int(entity_id)] = (lat, lng)
+            self._cells.setdefault(self._cell(lat, lng), {})[int(entity_id)] = (lat, lng)
+
+    def remove(self, entity_id: int) -> None:
+        with self._lock:
+            self._remove_locked(int(entity_id))
+
+    def _remove_locked(self, entity_id: int) -> None:
+        old = self._points.pop(entity_id, None)
+        if old is None:
+            return
+        key = self._cell(*old)
+        bucket = self._cells.get(key)
+        if bucket is not None:
+            bucket.pop(entity_id, None)
+            if not bucket:
+                del self._cells[key]
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.loaded = False
+
+    # ---------- queries ----------
+    def within(self, lat: float, lng: float, radius_km: float) -> List[Hit]:
+        """All points within `radius_km`, nearest first."""
+        dlat = radius_km / KM_PER_DEG_LAT
+        coslat = max(math.cos(math.radians(min(89.9, abs(lat) + dlat))), 1e-6)
+        dlng = min(180.0, radius_km / (KM_PER_DEG_LAT * coslat))
+        (r0, c0), (r1, c1) = self._cell(lat - dlat, lng - dlng), self._cell(lat + dlat, lng + dlng)
+        hits: List[Hit] = []
+        with self._lock:
+            if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self._cells):
+                keys = [k for k in self._cells if r0 <= k[0] <= r1 and c0 <= k[1] <= c1]
+            else:
+                keys = [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+            for key in keys:
+                for entity_id, (plat, plng) in self._cells.get(key, {}).items():
+                    d = haversine_km(lat, lng, plat, plng)
+                    if d <= radius_km:
+                        hits.append((entity_id, d))
+        hits.sort(key=lambda h: h[1])
+        return hits
+
+    def nearest(self, lat: float, lng: float, k: Optional[int] = None, radius_km: Optional[float] = None) -> List[Hit]:
+        """The `k` nearest points (all when k is None), optionally capped at `radius_km`."""
+        if radius_km is not None and k is None:
+            return self.within(lat, lng, radius_km)
+        with self._lock:
+            if k is None or k >= len(self._points):
+                hits = [(eid, haversine_km(lat, lng, p[0], p[1])) for eid, p in self._points.items()]
+                if radius_km is not None:
+                    hits = [h for h in hits if h[1] <= radius_km]
+                hits.sort(key=lambda h: h[1])
+                return hits if k is None else hits[:k]
+            if k <= 0 or not self._cells:
+                return []
+
+            rows = [key[0] for key in self._cells]
+            cols = [key[1] for key in self._cells]
+            cr, cc = self._cell(lat, lng)
+            max_ring = max(abs(cr - min(rows)), abs(cr - max(rows)), abs(cc - min(cols)), abs(cc - max(cols)))
+
+            best: List[Tuple[float, int]] = []  # max-heap of (-distance, id)
+            for ring in range(max_ring + 1):
+                for key in self._ring(cr, cc, ring):
+                    for entity_id, (plat, plng) in self._cells.get(key, {}).items():
+                        d = haversine_km(lat, lng, plat, plng)
+                        if radius_km is not None and d > radius_km:
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-d, entity_id))
+                        elif d < -best[0][0]:
+                            heapq.heapreplace(best, (-d, entity_id))
+                clearance = self._clearance_km(lat, lng, cr, cc, ring)
+                if radius_km is not None and clearance > radius_km:
+                    break
+                if len(best) == k and -best[0][0] <= clearance:
+                    break
+        return sorted(((eid, -nd) for nd, eid in best), key=lambda h: h[1])
+
+    @staticmethod
+    def _ring(cr: int, cc: int, ring: int) -> Iterable[Cell]:
+        if ring == 0:
+            yield (cr, cc)
+            return
+        for c in range(cc - ring, cc + ring + 1):
+            yield (cr - ring, c)
+            yield (cr + ring, c)
+        for r in range(cr - ring + 1, cr + ring):
+            yield (r, cc - ring)
+            yield (r, cc + ring)
+
+    def _clearance_km(self, lat: float, lng: float, cr: int, cc: int, ring: int) -> float:
+        """Lower bound on the distance from (lat, lng) to any cell outside `ring`."""
+        south = (cr - ring) * self.cell_deg
+        north = (cr + ring + 1) * self.cell_deg
+        west = (cc - ring) * self.cell_deg
+        east = (cc + ring + 1) * self.cell_deg
+        dlat = min(lat - south, north - lat) * KM_PER_DEG_LAT
+        coslat = math.cos(math.radians(min(89.9, max(abs(south), abs(north)))))
+        dlng = min(lng - west, east - lng) * KM_PER_DEG_LAT * coslat
+        return max(0.0, min(dlat, dlng) * 0.995)
+
+
+restaurant_geo_index = GeoGridIndex()
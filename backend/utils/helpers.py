@@ -0,0 +1,27 @@
+# utils/helpers.py
+from __future__ import annotations
+import math
+from typing import Optional, Tuple
+
+def normalize_coords(lat, lng) -> Tuple[Optional[float], Optional[float]]:
+    try:
+        lat = float(lat) if lat is not None else None
+        lng = float(lng) if lng is not None else None
+    except Exception:
+        return (None, None)
+    if lat is None or lng is None:
+        return (None, None)
+    if abs(lat) <= 90 and abs(lng) <= 180:
+        return (lat, lng)
+    if abs(lng) <= 90 and abs(lat) <= 180:
+        return (lng, lat)
+    return (None, None)
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    R = 6371.0
+    to_rad = math.pi / 180.0
+    dlat = (lat2 - lat1) * to_rad
+    dlon = (lon2 - lon1) * to_rad
+    a = math.sin(dlat/2)**2 + math.cos(lat1*to_rad) * math.cos(lat2*to_rad) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return R * c
@@ -0,0 +1,129 @@
+# utils/ids.py
+from __future__ import annotations
+import os
+import socket
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+# 2024-01-01T00:00:00Z in milliseconds; 41 bits of milliseconds from here last ~69 years.
+EPOCH_MS = 1704067200000
+
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+# 63 bits fit in 13 base-36 digits; fixed width keeps string order == numeric order.
+_WIDTH = 13
+
+
+def _default_worker_id() -> int:
+    """Host and process derived id, used when WORKER_ID is not configured."""
+    host = zlib.crc32(socket.gethostname().encode("utf-8"))
+    return (host ^ os.getpid()) & MAX_WORKER
+
+
+def _base36(n: int) -> str:
+    out = []
+    while n:
+        n, r = divmod(n, 36)
+        out.append(_ALPHABET[r])
+    return "".join(reversed(out)).rjust(_WIDTH, "0")
+
+
+class IdGenerator:
+    """
+    Snowflake-style 63-bit ids: milliseconds since EPOCH_MS, a 10-bit worker
+    id and a 12-bit per-millisecond sequence. Ids from one worker strictly
+    increase; ids from different workers sort by time and never collide as
+    long as the workers have different worker ids.
+
+    Nothing touches the database. When the clock steps backwards, or more
+    than 4096 ids are taken in one millisecond, the generator keeps counting
+    from the last millisecond it used instead of waiting.
+
+    The worker id is resolved per process, so a generator imported before a
+    fork (gunicorn --preload) does not hand the parent's id to its children.
+    The app gives each process a distinct id leased from the database
+    (models/worker_ids.py) through assign(); until then, and in processes
+    without a lease, the configured or host/pid derived id is used.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None, prefix: str = ""):
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER}")
+        self.prefix = prefix
+        self._configured = worker_id
+        self._lock = threading.Lock()
+        self._pid = -1
+        self._assigned: Optional[int] = None
+        self._worker = 0
+        self._last_ms = -1
+        self._sequence = 0
+
+    @property
+    def worker_id(self) -> int:
+        self._check_process()
+        return self._worker
+
+    def _check_process(self) -> None:
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._assigned = None  # a lease belongs to the process that took it
+            self._worker = self._fallback()
+            self._last_ms = -1
+            self._sequence = 0
+
+    def _fallback(self) -> int:
+        return self._configured if self._configured is not None else _default_worker_id()
+
+    def assign(self, worker_id: Optional[int]) -> None:
+        """Use `worker_id` in this process from now on; None goes back to the fallback id."""
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER}")
+        with self._lock:
+            self._check_process()
+            self._assigned = worker_id
+            self._worker = worker_id if worker_id is not None else self._fallback()
+
+    def next_int(self) -> int:
+        with self._lock:
+            self._check_process()
+            now = int(time.time() * 1000) - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self._worker << SEQUENCE_BITS) | self._sequence
+
+    def next_id(self) -> str:
+        return self.prefix + _base36(self.next_int())
+
+    def decode(self, value: str) -> Tuple[float, int, int]:
+        """(unix seconds, worker id, sequence) of an id from next_id()."""
+        if self.prefix and value.startswith(self.prefix):
+            value = value[len(self.prefix):]
+        return split_id(int(value, 36))
+
+
+def split_id(n: int) -> Tuple[float, int, int]:
+    ms = n >> (WORKER_BITS + SEQUENCE_BITS)
+    return (ms + EPOCH_MS) / 1000.0, (n >> SEQUENCE_BITS) & MAX_WORKER, n & MAX_SEQUENCE
+
+
+def _configured_worker() -> Optional[int]:
+    from config.settings import settings
+
+    return settings.WORKER_ID if settings.WORKER_ID >= 0 else None
+
+
+# Booking order ids: "NB" + 13 base-36 digits, the same length as the old NB{ts}{rand} ids.
+order_ids = IdGenerator(_configured_worker(), prefix="NB")
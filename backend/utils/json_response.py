@@ -0,0 +1,61 @@
+# utils/json_response.py
+from __future__ import annotations
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:  # optional: pip install orjson
+    import orjson
+except ImportError:
+    orjson = None
+
+_ORJSON_OPTS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact JSON bytes; uses orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=_ORJSON_OPTS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response encoded straight from plain dicts/lists.
+
+    Unlike FastAPI's default response it skips `jsonable_encoder`, which
+    walks and copies the whole payload again after the entities have
+    already been turned into dicts.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+def etag_for(body: bytes) -> str:
+    """Strong entity tag for an encoded body."""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def if_none_match(request: Request, etag: Optional[str]) -> bool:
+    """True when the request's If-None-Match already names `etag` (answer with 304)."""
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so a W/ prefix still matches.
+    return any(t.strip().removeprefix("W/") == etag for t in header.split(","))
+
+
+def conditional_json(request: Request, body: bytes, etag: str, *, max_age: int = 0) -> Response:
+    """200 with `body`, or an empty 304 when the client already has `etag`."""
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}, must-revalidate"}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(body, headers=headers)
@@ -0,0 +1,402 @@
+# utils/mailer.py
+from __future__ import annotations
+import asyncio
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+
+from config.settings import on_settings_reload, settings
+
+
+@dataclass(frozen=True)
+class SMTPConfig:
+    host: str
+    port: int
+    security: str  # "starttls" | "ssl" | "none"
+    user: str
+    password: str
+    sender: str
+    timeout: float = 20.0
+    debug: bool = False
+
+    @classmethod
+    def from_settings(cls, s: Any = settings) -> "SMTPConfig":
+        return cls(
+            host=s.SMTP_HOST,
+            port=s.SMTP_PORT,
+            security=s.smtp_security,
+            user=s.SMTP_USER,
+            password=s.SMTP_PASS,
+            sender=s.smtp_sender,
+            timeout=s.SMTP_TIMEOUT,
+            debug=s.SMTP_DEBUG,
+        )
+
+
+def valid_address(addr: Optional[str]) -> bool:
+    """A single recipient we can put in a To header: no line breaks or control characters, fits the outbox column."""
+    return bool(addr) and len(addr) <= 320 and "@" in addr and not any(ord(c) < 32 or c == "\x7f" for c in addr)
+
+
+def build_message(sender: str, to: str, subject: str, text: str, html: Optional[str] = None) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = to
+    msg.set_content(text or "")
+    if html:
+        msg.add_alternative(html, subtype="html")
+    return msg
+
+
+class _Session:
+    __slots__ = ("smtp", "created", "last_used", "sent")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.created = self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPPool:
+    """
+    Long-lived, authenticated SMTP sessions shared by the mail threads.
+
+    A session is checked out for one or more messages and returned. One that
+    sat idle longer than `noop_after` seconds is probed with NOOP first, one
+    that has sent `max_messages` or lived `max_age` seconds is retired, and
+    any send that fails on a dead connection is retried once on a fresh one.
+    """
+
+    def __init__(
+        self,
+        config: SMTPConfig,
+        size: int = 2,
+        noop_after: float = 30.0,
+        max_messages: int = 100,
+        max_age: float = 600.0,
+    ):
+        self.config = config
+        self.size = max(1, int(size))
+        self.noop_after = noop_after
+        self.max_messages = max_messages
+        self.max_age = max_age
+        self._idle: List[_Session] = []
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.reconnects = 0
+        self.noops = 0
+        self.sent = 0
+        self.errors = 0
+
+    def _open(self) -> _Session:
+        cfg = self.config
+        if cfg.security == "ssl":
+            smtp = smtplib.SMTP_SSL(cfg.host, cfg.port, timeout=cfg.timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(cfg.host, cfg.port, timeout=cfg.timeout)
+        try:
+            smtp.set_debuglevel(1 if cfg.debug else 0)
+            smtp.ehlo()
+            if cfg.security == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if cfg.user:
+                smtp.login(cfg.user, cfg.password)
+        except BaseException:
+            self._close(smtp)
+            raise
+        with self._lock:
+            self.connects += 1
+        return _Session(smtp)
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _alive(self, session: _Session) -> bool:
+        now = time.monotonic()
+        if session.sent >= self.max_messages or now - session.created >= self.max_age:
+            return False
+        if now - session.last_used < self.noop_after:
+            return True
+        try:
+            code, _ = session.smtp.noop()
+            with self._lock:
+                self.noops += 1
+            return code == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def checkout(self) -> _Session:
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._open()
+            if self._alive(session):
+                return session
+            self._close(session.smtp)
+
+    def checkin(self, session: _Session) -> None:
+        session.last_used = time.monotonic()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(session)
+                return
+        self._close(session.smtp)
+
+    def send_batch(self, messages: List[EmailMessage]) -> List[Optional[Exception]]:
+        """
+        Send `messages` over one session; returns one entry per message,
+        None if it was accepted or the exception that stopped it. A dropped
+        connection is replaced once per message; when it cannot be
+        replaced, the rest of the batch fails with that error.
+        """
+        results: List[Optional[Exception]] = []
+        try:
+            session: Optional[_Session] = self.checkout()
+        except (smtplib.SMTPException, OSError) as e:
+            with self._lock:
+                self.errors += len(messages)
+            return [e] * len(messages)
+        try:
+            for msg in messages:
+                if session is None:
+                    results.append(results[-1])
+                    continue
+                for attempt in (1, 2):
+                    try:
+                        session.smtp.send_message(msg)
+                        session.sent += 1
+                        results.append(None)
+                        break
+                    except (smtplib.SMTPServerDisconnected, OSError) as e:
+                        self._close(session.smtp)
+                        session = None
+                        if attempt == 2:
+                            results.append(e)
+                            break
+                        with self._lock:
+                            self.reconnects += 1
+                        print(f"[SMTP] connection lost ({type(e).__name__}), reconnecting")
+                        try:
+                            session = self._open()
+                        except (smtplib.SMTPException, OSError) as e2:
+                            results.append(e2)
+                            break
+                    except smtplib.SMTPException as e:
+                        print(f"[SMTP] {msg['To']}: {e}")
+                        results.append(e)
+                        break
+        finally:
+            if session is not None:
+                self.checkin(session)
+            failed = sum(1 for r in results if r is not None)
+            with self._lock:
+                self.sent += len(results) - failed
+                self.errors += failed
+        return results
+
+    def send_many(self, messages: List[EmailMessage]) -> int:
+        """Send `messages` over one session; returns how many were accepted."""
+        return sum(1 for r in self.send_batch(messages) if r is None)
+
+    def keepalive(self) -> None:
+        """NOOP every idle session that is due, dropping the ones that fail."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            if self._alive(session):
+                session.last_used = time.monotonic()
+                self.checkin(session)
+            else:
+                self._close(session.smtp)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._close(session.smtp)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "idle": len(self._idle),
+                "connects": self.connects,
+                "reconnects": self.reconnects,
+                "noops": self.noops,
+                "sent": self.sent,
+                "errors": self.errors,
+            }
+
+
+class MailWorker:
+    """
+    Bounded asyncio queue drained by `concurrency` tasks. Each task takes up
+    to `batch` queued messages and sends them over one pooled session on
+    the mail executor, so a burst of OTP emails shares a few connections
+    instead of opening one each.
+    """
+
+    def __init__(self, pool: Optional[SMTPPool] = None, maxsize: int = 1000, concurrency: int = 2, batch: int = 20):
+        self._pool = pool
+        self.maxsize = maxsize
+        self.concurrency = max(1, int(concurrency))
+        self.batch = max(1, int(batch))
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def pool(self) -> SMTPPool:
+        if self._pool is None:
+            self._pool = get_pool()
+        return self._pool
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.maxsize)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="mail")
+        self._tasks = [asyncio.create_task(self._drain(i)) for i in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._keepalive()))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Send what is queued (up to `timeout` seconds), then close every session."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[MAIL] shutting down with {self._queue.qsize()} messages unsent")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pool is not None:
+            self._pool.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def enqueue(self, to: str, subject: str, text: str, html: Optional[str] = None) -> bool:
+        """
+        Queue one message from the event loop; False when the worker is not
+        running or the queue is full, so the caller can fall back.
+        """
+        if self._queue is None or not self._tasks:
+            return False
+        msg = build_message(self.pool.config.sender, to, subject, text, html)
+        try:
+            self._queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"[MAIL] queue full, not queued: {to}")
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _drain(self, n: int) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._loop.run_in_executor(self._executor, self.pool.send_many, batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"[MAIL] worker {n}: batch of {len(batch)} failed: {type(e).__name__}: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _keepalive(self) -> None:
+        interval = max(1.0, self.pool.noop_after)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._loop.run_in_executor(self._executor, self.pool.keepalive)
+            except Exception as e:
+                print(f"[MAIL] keepalive failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pool": self._pool.stats() if self._pool is not None else None,
+        }
+
+
+_pool: Optional[SMTPPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SMTPPool(
+                    SMTPConfig.from_settings(),
+                    size=settings.MAIL_POOL_SIZE,
+                    noop_after=settings.MAIL_NOOP_AFTER,
+                    max_messages=settings.MAIL_MAX_MESSAGES_PER_SESSION,
+                )
+    return _pool
+
+
+@on_settings_reload
+def _reset_pool(old, new) -> None:
+    """Drop the pool when SMTP settings change; the next send connects with the new ones."""
+    global _pool
+    if SMTPConfig.from_settings(old) == SMTPConfig.from_settings(new):
+        return
+    with _pool_lock:
+        stale, _pool = _pool, None
+    if mailer._pool is stale:
+        mailer._pool = None
+    if stale is not None:
+        stale.close()
+
+
+def send_email(to: str, subject: str, text: str, html: Optional[str] = None) -> None:
+    """Send one message now on a pooled session (blocking; call from a thread)."""
+    pool = get_pool()
+    if not pool.config.user and pool.config.security != "none":
+        raise RuntimeError("SMTP_USER/SMTP_PASS not set")
+    error = pool.send_batch([build_message(pool.config.sender, to, subject, text, html)])[0]
+    if error is not None:
+        raise error
+
+
+# The app's worker; its pool (and SMTP config) is created on first use.
+mailer = MailWorker(
+    maxsize=settings.MAIL_QUEUE_MAX,
+    concurrency=settings.MAIL_POOL_SIZE,
+    batch=settings.MAIL_BATCH,
+)
@@ -0,0 +1,159 @@
+# utils/page_cache.py
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+Render = Callable[[], Awaitable[bytes]]
+
+
+class _Entry:
+    __slots__ = ("body", "fresh_until", "stale_until")
+
+    def __init__(self, body: bytes, fresh_until: float, stale_until: float):
+        self.body = body
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class PageCache:
+    """
+    Rendered responses (bytes) keyed on normalized request parameters,
+    served with stale-while-revalidate.
+
+    An entry is fresh for `ttl` seconds and may then be served stale for
+    another `stale_ttl` while one background task renders it again. A
+    catalog write calls `mark_stale()`, which keeps the bytes but forces a
+    re-render on the next hit; renders that started before the write are
+    discarded instead of stored.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 30.0, stale_ttl: float = 300.0, name: str = "pages"):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.name = name
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._data)
+
+    def _store(self, key: Hashable, body: bytes, generation: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._data[key] = _Entry(body, now + self.ttl, now + self.ttl + self.stale_ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    async def get_or_render(self, key: Hashable, render: Render) -> Tuple[bytes, str]:
+        """(body, "hit" | "stale" | "miss"); a stale hit also starts a background re-render."""
+        self._loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and now >= entry.stale_until:
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+        if entry is not None and now < entry.fresh_until:
+            self.hits += 1
+            return entry.body, "hit"
+        if entry is not None:
+            self.stale_hits += 1
+            self.revalidate(key, render)
+            return entry.body, "stale"
+        self.misses += 1
+        generation = self._generation
+        body = await render()
+        self._store(key, body, generation)
+        return body, "miss"
+
+    async def refresh(self, key: Hashable, render: Render) -> bool:
+        """Render `key` now and store it; False if a write happened meanwhile."""
+        generation = self._generation
+        body = await render()
+        self.refreshes += 1
+        return self._store(key, body, generation)
+
+    def revalidate(self, key: Hashable, render: Render) -> None:
+        """Re-render `key` in the background unless that is already happening."""
+        if key in self._refreshing:
+            return
+
+        async def run() -> None:
+            try:
+                await self.refresh(key, render)
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"[PAGE CACHE] {self.name}: re-render of {key!r} failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = self._spawn(run())
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def schedule(self, job: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Run `job()` on the event loop that serves this cache; callable from
+        any thread (catalog listeners run on the DB executor). False before
+        the first request, when there is no loop to run it on.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(lambda: self._spawn(job()))
+        return True
+
+    def mark_stale(self) -> None:
+        with self._lock:
+            self._generation += 1
+            for entry in self._data.values():
+                entry.fresh_until = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "refreshing": len(self._refreshing),
+        }
@@ -0,0 +1,72 @@
+# utils/pagination.py
+from __future__ import annotations
+import base64
+import bisect
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, Iterable, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlencode
+
+T = TypeVar("T")
+
+Key = Tuple[Any, ...]
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """Opaque, URL-safe token for the sort key of the last item on a page."""
+    raw = json.dumps(list(key), separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Key]:
+    """Inverse of encode_cursor; None for an empty token, ValueError for a malformed one."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"invalid cursor: {e}") from None
+    if not isinstance(value, list) or not value:
+        raise ValueError("invalid cursor")
+    return tuple(value)
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T]
+    limit: int
+    next_cursor: Optional[str] = None
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+def page_from(items: Iterable[T], key: Callable[[T], Key], limit: int) -> Page[T]:
+    """Build a page from up to `limit + 1` items already positioned after the cursor."""
+    rows = []
+    for item in items:
+        rows.append(item)
+        if len(rows) > limit:
+            break
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return Page(rows, limit, encode_cursor(key(rows[-1])))
+    return Page(rows, limit)
+
+
+def page_sorted(items: Sequence[T], keys: Sequence[Key], after: Optional[Key], limit: int) -> Page[T]:
+    """Keyset page over `items` already sorted by the parallel `keys` list (a bisect, no scan)."""
+    start = bisect.bisect_right(keys, after) if after is not None else 0
+    rows = items[start:start + limit]
+    more = start + limit < len(items)
+    return Page(list(rows), limit, encode_cursor(keys[start + limit - 1]) if more else None)
+
+
+def with_query(url_path: str, params: Iterable[Tuple[str, Any]], **overrides: Any) -> str:
+    """`url_path` with `params` (multi-valued) re-encoded, replacing keys given in `overrides`."""
+    kept = [(k, v) for k, v in params if k not in overrides]
+    kept += [(k, v) for k, v in overrides.items() if v is not None]
+    return f"{url_path}?{urlencode(kept)}" if kept else url_path
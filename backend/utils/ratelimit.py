@@ -0,0 +1,189 @@
+# utils/ratelimit.py
+from __future__ import annotations
+import functools
+import math
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from config.settings import settings
+
+_UNITS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hr": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+
+@dataclass(frozen=True)
+class Rate:
+    """`limit` requests per `per` seconds: a bucket of `limit` tokens refilled at limit/per a second."""
+
+    limit: int
+    per: float
+
+    @property
+    def per_second(self) -> float:
+        return self.limit / self.per
+
+
+_RATE = re.compile(r"^(\d+)\s*/\s*(\d*(?:\.\d+)?)\s*([a-z]+)$")
+
+
+@functools.lru_cache(maxsize=64)
+def parse_rate(spec: str) -> Optional[Rate]:
+    """"10/minute", "5/hour", "3/15m"; empty or "0/..." means no limit."""
+    spec = (spec or "").strip().lower()
+    if not spec:
+        return None
+    m = _RATE.match(spec)
+    unit = m.group(3) if m else ""
+    if len(unit) > 1 and unit.endswith("s"):
+        unit = unit[:-1]
+    if not m or unit not in _UNITS:
+        raise ValueError(f"{spec!r} is not a rate like 10/minute")
+    rate = Rate(int(m.group(1)), float(m.group(2) or 1) * _UNITS[unit])
+    return rate if rate.limit > 0 and rate.per > 0 else None
+
+
+def _refill(tokens: float, updated: float, now: float, rate: Rate) -> float:
+    return min(float(rate.limit), tokens + max(0.0, now - updated) * rate.per_second)
+
+
+class MemoryBucketStore:
+    """
+    Token buckets in this process, at most `maxsize` of them (least
+    recently used dropped first; a dropped bucket comes back full). Each
+    uvicorn worker counts on its own; use models.ratelimit.DatabaseBucketStore
+    to share buckets between workers.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = max(1, int(maxsize))
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # bucket -> [tokens, updated]
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take_now(self, bucket: str, rate: Rate, cost: int = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(bucket)
+            if state is None:
+                state = self._buckets[bucket] = [float(rate.limit), now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._buckets.move_to_end(bucket)
+                state[0] = _refill(state[0], state[1], now, rate)
+                state[1] = now
+            if state[0] >= cost:
+                state[0] -= cost
+                return True, state[0]
+            return False, state[0]
+
+    async def take(self, bucket: str, rate: Rate, cost: int = 1) -> Tuple[bool, float]:
+        """(allowed, tokens left) after trying to take `cost` tokens from `bucket`."""
+        return self.take_now(bucket, rate, cost)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "buckets": len(self._buckets), "maxsize": self.maxsize, "evictions": self.evictions}
+
+
+class RateLimiter:
+    """
+    Checks a request against named token buckets, e.g.
+
+        await limiter.enforce(
+            ("login-ip", client_ip(request), settings.RATE_LIMIT_LOGIN_IP),
+            ("login-email", email, settings.RATE_LIMIT_LOGIN_EMAIL),
+        )
+
+    Each check is (rule, key, rate spec); a rule with an empty spec or an
+    empty key is skipped. The first exhausted bucket raises a 429 with
+    Retry-After. If the store itself fails the request is let through, so
+    an unreachable rate table never locks everyone out.
+    """
+
+    def __init__(self, store: Any):
+        self.store = store
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    async def hit(self, rule: str, key: Any, spec: str, cost: int = 1) -> Optional[float]:
+        """None if allowed, else the seconds until `cost` tokens are back."""
+        rate = parse_rate(spec)
+        if rate is None or key is None or key == "":
+            return None
+        bucket = f"{rule}:{str(key).lower()[:128]}"
+        try:
+            ok, tokens = await self.store.take(bucket, rate, cost)
+        except Exception as e:
+            self.errors += 1
+            print(f"[RATELIMIT] store failed, allowing {rule}: {type(e).__name__}: {e}")
+            return None
+        if ok:
+            self.allowed += 1
+            return None
+        self.limited += 1
+        return (cost - tokens) / rate.per_second
+
+    async def enforce(self, *checks: Tuple[str, Any, str]) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        for rule, key, spec in checks:
+            wait = await self.hit(rule, key, spec)
+            if wait is not None:
+                print(f"[RATELIMIT] {rule} {key}: retry in {wait:.1f}s")
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests, please try again later",
+                    headers={"Retry-After": str(max(1, math.ceil(wait)))},
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "errors": self.errors,
+            "store": self.store.stats(),
+        }
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        # The last hop was added by our own proxy; earlier ones are client-supplied
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    # No peer address (e.g. a unix socket): one shared bucket rather than none
+    return request.client.host if request.client and request.client.host else "unknown"
+
+
+def session_key(request: Request) -> str:
+    """A random id kept in the session, so one browser session has its own buckets."""
+    key = request.session.get("rl_key")
+    if not key:
+        key = request.session["rl_key"] = secrets.token_hex(8)
+    return key
+
+
+def make_store(backend: str) -> Any:
+    if backend == "db":
+        from models.ratelimit import DatabaseBucketStore
+
+        return DatabaseBucketStore()
+    return MemoryBucketStore(settings.RATE_LIMIT_MAX_BUCKETS)
+
+
+# The app's limiter; RATE_LIMIT_BACKEND picks where buckets live.
+limiter = RateLimiter(make_store(settings.RATE_LIMIT_BACKEND))
@@ -0,0 +1,215 @@
+# utils/search_index.py
+from __future__ import annotations
+import bisect
+import heapq
+import re
+from collections import Counter
+from typing import Callable, Dict, Generic, Iterable, List, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Match quality per kind of term hit; multiplied by the field weight.
+EXACT, PREFIX, FUZZY = 1.0, 0.75, 0.5
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def trigrams(term: str) -> List[str]:
+    padded = f"${term}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)] or [padded]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Damerau-Levenshtein (optimal string alignment) distance, or limit + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class TextSearchIndex(Generic[T]):
+    """
+    In-memory inverted index with prefix and typo-tolerant term lookup.
+
+    Each field of an item is tokenized into terms; a term's posting list
+    keeps, per item, the weight of the best field it appeared in. Query
+    tokens are resolved against the sorted vocabulary (exact, then prefix)
+    and, only when neither hits, against a trigram index of the vocabulary
+    with a bounded edit distance. Every query token has to match; items are
+    ranked by the summed weighted match quality, then by `rank(item)`.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[T],
+        fields: Mapping[str, Callable[[T], Optional[str]]],
+        weights: Optional[Mapping[str, float]] = None,
+        rank: Optional[Callable[[T], float]] = None,
+    ):
+        self.items: List[T] = list(items)
+        self._rank = [float(rank(it)) if rank else 0.0 for it in self.items]
+        weights = weights or {}
+        postings: Dict[str, Dict[int, float]] = {}
+        for pos, item in enumerate(self.items):
+            for name, get in fields.items():
+                w = float(weights.get(name, 1.0))
+                for term in tokenize(get(item)):
+                    found = postings.setdefault(term, {})
+                    if found.get(pos, 0.0) < w:
+                        found[pos] = w
+        # Posting lists ordered best-first so capped lookups keep the strongest items.
+        self._postings: Dict[str, List[Tuple[int, float]]] = {
+            term: sorted(found.items(), key=lambda pw: (-pw[1], -self._rank[pw[0]]))
+            for term, found in postings.items()
+        }
+        # Forward index (item -> its terms), for checking a small candidate set
+        # against a token whose posting lists are long.
+        self._terms: List[List[Tuple[str, float]]] = [[] for _ in self.items]
+        for term, plist in self._postings.items():
+            for pos, w in plist:
+                self._terms[pos].append((term, w))
+        self._vocab: List[str] = sorted(self._postings)
+        self._grams: Dict[str, List[int]] = {}
+        for tid, term in enumerate(self._vocab):
+            for g in set(trigrams(term)):
+                self._grams.setdefault(g, []).append(tid)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    # ---------- term resolution ----------
+    def _prefix_terms(self, token: str, max_expansions: int) -> List[str]:
+        lo = bisect.bisect_left(self._vocab, token)
+        hi = bisect.bisect_left(self._vocab, token + "\U0010ffff", lo)
+        return self._vocab[lo:min(hi, lo + max_expansions)]
+
+    def _fuzzy_terms(self, token: str, max_checks: int = 256) -> List[Tuple[str, int]]:
+        if len(token) < 4:
+            return []
+        limit = 1 if len(token) < 8 else 2
+        grams = set(trigrams(token))
+        overlap: Counter = Counter()
+        for g in grams:
+            overlap.update(self._grams.get(g, ()))
+        # One edit (a transposition included) touches at most four padded trigrams.
+        need = max(1, len(grams) - 4 * limit)
+        out: List[Tuple[str, int]] = []
+        checks = 0
+        for tid, hits in overlap.most_common():
+            if hits < need or checks >= max_checks:
+                break
+            term = self._vocab[tid]
+            if abs(len(term) - len(token)) > limit:
+                continue
+            checks += 1
+            d = edit_distance(token, term, limit)
+            if d <= limit:
+                out.append((term, d))
+        return out
+
+    def _expand(self, token: str, *, prefix: bool, max_expansions: int) -> List[Tuple[str, float]]:
+        terms: List[Tuple[str, float]] = []
+        if token in self._postings:
+            terms.append((token, EXACT))
+        if prefix:
+            terms.extend((t, PREFIX) for t in self._prefix_terms(token, max_expansions) if t != token)
+        if not terms:
+            terms = [(t, FUZZY / (1 + d)) for t, d in self._fuzzy_terms(token)]
+        return terms
+
+    def _match(self, terms: List[Tuple[str, float]], per_term: Optional[int]) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for term, quality in terms:
+            plist = self._postings[term]
+            for pos, w in (plist if per_term is None else plist[:per_term]):
+                s = quality * w
+                if scores.get(pos, 0.0) < s:
+                    scores[pos] = s
+        return scores
+
+    def _narrow(self, scores: Dict[int, float], terms: List[Tuple[str, float]]) -> Dict[int, float]:
+        """Keep the items of `scores` that also contain one of `terms`, adding that term's score."""
+        quality = dict(terms)
+        out: Dict[int, float] = {}
+        for pos, s in scores.items():
+            best = 0.0
+            for term, w in self._terms[pos]:
+                q = quality.get(term)
+                if q is not None and q * w > best:
+                    best = q * w
+            if best:
+                out[pos] = s + best
+        return out
+
+    # ---------- queries ----------
+    def match(
+        self,
+        query: str,
+        *,
+        last_is_prefix: bool = False,
+        max_expansions: int = 256,
+        per_term: Optional[int] = None,
+    ) -> Dict[int, float]:
+        """Unordered {item position: score} for every item matching all tokens of `query`."""
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+        # Capping posting lists is only safe for a lone token: with several,
+        # the strongest items of one token need not contain the others.
+        if len(tokens) > 1:
+            per_term = None
+        expanded = []
+        for i, token in enumerate(tokens):
+            is_prefix = len(token) >= 3 or (last_is_prefix and i == len(tokens) - 1)
+            terms = self._expand(token, prefix=is_prefix, max_expansions=max_expansions)
+            if not terms:
+                return {}
+            expanded.append((sum(len(self._postings[t]) for t, _ in terms), terms))
+        expanded.sort(key=lambda e: e[0])
+
+        # Start from the most selective token, then either walk the next
+        # token's postings or check the surviving items' own terms, whichever
+        # touches fewer entries.
+        scores = self._match(expanded[0][1], per_term)
+        for size, terms in expanded[1:]:
+            if not scores:
+                return {}
+            if len(scores) * 4 < size:
+                scores = self._narrow(scores, terms)
+            else:
+                m = self._match(terms, per_term)
+                scores = {pos: s + m[pos] for pos, s in scores.items() if pos in m}
+        return scores
+
+    def _ranked(self, scores: Dict[int, float], limit: Optional[int]) -> List[Tuple[T, float]]:
+        key = lambda pos: (scores[pos], self._rank[pos])
+        order = heapq.nlargest(limit, scores, key=key) if limit is not None else sorted(scores, key=key, reverse=True)
+        return [(self.items[pos], round(scores[pos], 4)) for pos in order]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[T, float]]:
+        """Full ranked search: every token of `query` must match exactly, by prefix, or within a small edit distance."""
+        return self._ranked(self.match(query), limit)
+
+    def suggest(self, query: str, limit: int = 8) -> List[Tuple[T, float]]:
+        """
+        Typeahead: like `search`, but the last token is always a prefix. A
+        single token only reads the best-ranked items of each expanded term,
+        so the cost stays bounded however short the input is.
+        """
+        scores = self.match(query, last_is_prefix=True, max_expansions=32, per_term=max(64, limit * 8))
+        return self._ranked(scores, limit)
@@ -0,0 +1,232 @@
+# utils/sessions.py
+from __future__ import annotations
+import asyncio
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from http.cookies import SimpleCookie
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config.settings import settings
+
+
+class MemorySessionStore:
+    """
+    Sessions in this process: an LRU of at most `maxsize` entries, each
+    with an absolute expiry. Only for a single worker process; with more
+    than one, use models.sessions.DatabaseSessionStore.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = max(1, int(maxsize))
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+        self.deletes = 0
+        self.evictions = 0
+        self.swept = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def load(self, sid: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            self.reads += 1
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return entry
+
+    async def save(self, sid: str, data: str, expires_at: float) -> None:
+        with self._lock:
+            self.writes += 1
+            self._data[sid] = (data, expires_at)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, sid: str) -> None:
+        with self._lock:
+            self.deletes += 1
+            self._data.pop(sid, None)
+
+    async def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at <= now]
+            for sid in expired:
+                del self._data[sid]
+            self.swept += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "sessions": len(self._data),
+                "maxsize": self.maxsize,
+                "reads": self.reads,
+                "writes": self.writes,
+                "deletes": self.deletes,
+                "evictions": self.evictions,
+                "swept": self.swept,
+            }
+
+
+ROTATE_KEY = "session.rotate"
+
+
+def rotate_session(request: Any) -> None:
+    """Give this session a new id when the response is sent (no-op for signed-cookie sessions)."""
+    request.scope[ROTATE_KEY] = True
+
+
+class ServerSessionMiddleware:
+    """
+    Drop-in for Starlette's SessionMiddleware that keeps `request.session`
+    in a server-side store. The cookie holds only a random session id, so
+    there is nothing to sign or verify per request and the cookie stays a
+    fixed ~50 bytes however much the session holds.
+
+    The session is written back only when it changed, or when less than
+    half of its lifetime is left (sliding expiry); an emptied session is
+    deleted and its cookie cleared. Paths under `skip_prefixes` (static
+    files) never touch the store.
+
+    rotate_session() makes the response save the session under a fresh id
+    and delete the old one; call it whenever the session gains privileges
+    (admin login) so an id planted before login is worthless after it.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: Any,
+        session_cookie: str = "session",
+        max_age: int = 14 * 24 * 60 * 60,
+        path: str = "/",
+        same_site: str = "lax",
+        https_only: bool = False,
+        skip_prefixes: Tuple[str, ...] = ("/static",),
+    ):
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.max_age = int(max_age)
+        self.path = path
+        self.skip_prefixes = tuple(skip_prefixes)
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    def _sid_from(self, scope: Scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                morsel = SimpleCookie(value.decode("latin-1")).get(self.session_cookie)
+                # Anything longer is not one of our ids (e.g. an old signed cookie)
+                if morsel is not None and 0 < len(morsel.value) <= 64:
+                    return morsel.value
+        return None
+
+    def _cookie(self, sid: str, max_age: int) -> str:
+        value = sid if max_age else "null"
+        expires = "; expires=Thu, 01 Jan 1970 00:00:00 GMT" if not max_age else ""
+        return f"{self.session_cookie}={value}; path={self.path}; Max-Age={max_age}{expires}; {self.security_flags}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        if scope.get("path", "").startswith(self.skip_prefixes):
+            scope["session"] = {}
+            await self.app(scope, receive, send)
+            return
+
+        sid = self._sid_from(scope)
+        loaded = await self.store.load(sid) if sid else None
+        if loaded is None:
+            initial, expires_at = None, 0.0
+            scope["session"] = {}
+        else:
+            initial, expires_at = loaded
+            scope["session"] = json.loads(initial)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                headers = MutableHeaders(scope=message)
+                if session:
+                    data = json.dumps(session, separators=(",", ":"))
+                    now = time.time()
+                    if loaded is None or scope.get(ROTATE_KEY):
+                        new_sid = secrets.token_urlsafe(32)
+                        await self.store.save(new_sid, data, now + self.max_age)
+                        if loaded is not None:
+                            await self.store.delete(sid)
+                        headers.append("Set-Cookie", self._cookie(new_sid, self.max_age))
+                    elif data != initial or expires_at - now < self.max_age / 2:
+                        await self.store.save(sid, data, now + self.max_age)
+                        if expires_at - now < self.max_age / 2:
+                            headers.append("Set-Cookie", self._cookie(sid, self.max_age))
+                elif loaded is not None:
+                    await self.store.delete(sid)
+                    headers.append("Set-Cookie", self._cookie(sid, 0))
+                elif sid:
+                    # Unknown or expired id: stop the browser sending it
+                    headers.append("Set-Cookie", self._cookie(sid, 0))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class SessionSweeper:
+    """Deletes expired sessions from the store every `interval` seconds."""
+
+    def __init__(self, store: Any, interval: float = 300.0):
+        self.store = store
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                n = await self.store.sweep()
+                if n:
+                    print(f"[SESSIONS] swept {n} expired sessions")
+            except Exception as e:
+                print(f"[SESSIONS] sweep failed: {type(e).__name__}: {e}")
+
+
+def make_store(backend: str) -> Optional[Any]:
+    """The store for SESSION_BACKEND; None for "cookie" (signed-cookie sessions)."""
+    if backend == "memory":
+        return MemorySessionStore(settings.SESSION_MEMORY_MAX_ENTRIES)
+    if backend == "db":
+        from models.sessions import DatabaseSessionStore
+
+        return DatabaseSessionStore()
+    return None
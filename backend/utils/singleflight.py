@@ -0,0 +1,80 @@
+# utils/singleflight.py
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+R = TypeVar("R")
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller runs the
+    function, callers arriving while it runs block and receive the same
+    result (or exception). Nothing is kept once the call finishes, so this
+    is not a cache; it only stops a burst of identical requests from each
+    running the same queries.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, name: str = "flights"):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.max_shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], R]) -> R:
+        try:
+            hash(key)
+        except TypeError:
+            return fn()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.max_shared = max(self.max_shared, call.waiters + 1)
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                "name": self.name,
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "coalesced_ratio": round(self.coalesced / calls, 4) if calls else 0.0,
+                "max_shared": self.max_shared,
+            }
@@ -0,0 +1,156 @@
+# utils/sorting.py
+from __future__ import annotations
+import heapq
+from dataclasses import dataclass
+from functools import total_ordering
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+Getter = Callable[[Any, str], Any]
+
+
+def default_getter(item: Any, field: str) -> Any:
+    if isinstance(item, dict):
+        return item.get(field)
+    return getattr(item, field, None)
+
+
+@total_ordering
+class _Reversed:
+    """Wraps a value so that it sorts in descending order inside an ascending tuple key."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Reversed) and self.value == other.value
+
+    def __lt__(self, other: "_Reversed") -> bool:
+        return other.value < self.value
+
+
+@dataclass(frozen=True)
+class SortKey:
+    field: str
+    descending: bool = False
+    nulls_first: bool = False
+
+    def __str__(self) -> str:
+        out = ("-" if self.descending else "") + self.field
+        return out + ":nulls_first" if self.nulls_first else out
+
+
+class SortSpec:
+    """
+    Composite sort order over several fields.
+
+    Each key sorts ascending or descending with its nulls placed first or
+    last (last by default, whichever the direction). Keys compile into a
+    single tuple per item, so ordering is one stable O(n log n) sort, and
+    the first `k` rows can be taken with a heap in O(n log k).
+
+    Specs parse from strings such as "-ratings,name" or
+    "price_range:nulls_first,-popularity".
+    """
+
+    def __init__(self, keys: Sequence[SortKey], getter: Getter = default_getter):
+        if not keys:
+            raise ValueError("a sort needs at least one key")
+        self.keys = tuple(keys)
+        self.getter = getter
+        self._fields = [k.field for k in self.keys]
+        self._converters = [self._converter(k) for k in self.keys]
+
+    @staticmethod
+    def _converter(k: SortKey) -> Callable[[Any], Tuple[int, Any]]:
+        null = (0 if k.nulls_first else 2, 0)
+        if not k.descending:
+            return lambda v: null if v is None else (1, v)
+
+        def desc(v: Any) -> Tuple[int, Any]:
+            if v is None:
+                return null
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                return (1, -v)
+            return (1, _Reversed(v))
+        return desc
+
+    @classmethod
+    def parse(cls, spec: str, allowed: Iterable[str], getter: Getter = default_getter) -> "SortSpec":
+        allowed = set(allowed)
+        keys: List[SortKey] = []
+        for part in (spec or "").split(","):
+            part = part.strip()
+            if not part:
+                continue
+            field, _, option = part.partition(":")
+            descending = field.startswith("-")
+            field = field.lstrip("+-").strip()
+            if field not in allowed:
+                raise ValueError(f"cannot sort by {field!r}; choose from {', '.join(sorted(allowed))}")
+            if option not in ("", "nulls_first", "nulls_last"):
+                raise ValueError(f"unknown sort option {option!r}")
+            keys.append(SortKey(field, descending, option == "nulls_first"))
+        return cls(keys, getter)
+
+    def with_getter(self, getter: Getter) -> "SortSpec":
+        return SortSpec(self.keys, getter)
+
+    def then(self, *keys: SortKey) -> "SortSpec":
+        """This spec followed by `keys` as tie-breakers (fields already present are skipped)."""
+        present = {k.field for k in self.keys}
+        return SortSpec(self.keys + tuple(k for k in keys if k.field not in present), self.getter)
+
+    def __str__(self) -> str:
+        return ",".join(str(k) for k in self.keys)
+
+    # ---------- keys ----------
+    def values(self, item: Any) -> Tuple[Any, ...]:
+        """Raw sort values of `item`; JSON-friendly, so usable as a pagination cursor."""
+        return tuple(self.getter(item, k.field) for k in self.keys)
+
+    def key_of(self, values: Sequence[Any]) -> Tuple[Any, ...]:
+        """Comparable key for raw `values` as returned by `values()`."""
+        return tuple([conv(v) for conv, v in zip(self._converters, values)])
+
+    def key(self, item: Any) -> Tuple[Any, ...]:
+        get = self.getter
+        return tuple([conv(get(item, f)) for conv, f in zip(self._converters, self._fields)])
+
+    # ---------- ordering ----------
+    def sort(self, items: Iterable[T]) -> List[T]:
+        # One stable pass per key, least significant first, keeps each key
+        # function trivial. Nulls get the flag that survives `reverse`.
+        rows = list(items)
+        get = self.getter
+        for k in reversed(self.keys):
+            flag_null = (2 if k.nulls_first else 0) if k.descending else (0 if k.nulls_first else 2)
+            rows.sort(
+                key=lambda it, f=k.field, fn=flag_null: (fn, 0) if (v := get(it, f)) is None else (1, v),
+                reverse=k.descending,
+            )
+        return rows
+
+    def top(self, items: Iterable[T], k: int) -> List[T]:
+        """The first `k` items of `sort(items)` without sorting the rest (stable, O(n log k))."""
+        return heapq.nsmallest(k, items, key=self.key)
+
+    def page(self, items: Iterable[T], limit: int, after: Optional[Sequence[Any]] = None) -> Tuple[List[T], Optional[Tuple[Any, ...]]]:
+        """
+        Up to `limit` items following the raw cursor `after`, plus the cursor
+        for the next page (None on the last one). For a unique order, end the
+        spec with a unique field such as the id.
+        """
+        decorated: Iterable[Tuple[Any, int, T]] = ((self.key(it), i, it) for i, it in enumerate(items))
+        if after is not None:
+            bound = self.key_of(after)
+            decorated = (d for d in decorated if d[0] > bound)
+        # (key, position) pairs are unique, so ties keep input order and items are never compared.
+        rows = [it for _, _, it in heapq.nsmallest(limit + 1, decorated)]
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, self.values(rows[-1])
+        return rows, None
@@ -0,0 +1,102 @@
+# utils/templating.py
+from __future__ import annotations
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import jinja2
+from fastapi.templating import Jinja2Templates
+
+from config.settings import settings
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+TEMPLATES_DIR = (BACKEND_DIR.parent / "frontend" / "templates").resolve()
+
+
+class _RenderStats:
+    """Per-template render count and timings, for /_templates/stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, float]] = {}
+
+    def record(self, name: str, ms: float) -> None:
+        with self._lock:
+            s = self._data.setdefault(name, {"renders": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["renders"] += 1
+            s["total_ms"] += ms
+            s["max_ms"] = max(s["max_ms"], ms)
+            s["last_ms"] = ms
+        if ms >= settings.TEMPLATES_SLOW_MS:
+            print(f"[TEMPLATES] slow render {name}: {ms:.1f}ms")
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "renders": int(s["renders"]),
+                    "avg_ms": round(s["total_ms"] / s["renders"], 3),
+                    "max_ms": round(s["max_ms"], 3),
+                    "last_ms": round(s["last_ms"], 3),
+                }
+                for name, s in sorted(self._data.items())
+            }
+
+
+class TimedTemplates(Jinja2Templates):
+    """Jinja2Templates that records how long each TemplateResponse takes to render."""
+
+    def __init__(self, env: jinja2.Environment):
+        super().__init__(env=env)
+        self.stats = _RenderStats()
+
+    def TemplateResponse(self, *args: Any, **kwargs: Any):
+        t0 = time.perf_counter()
+        response = super().TemplateResponse(*args, **kwargs)
+        self.stats.record(response.template.name, (time.perf_counter() - t0) * 1000)
+        return response
+
+
+def _environment() -> jinja2.Environment:
+    cache_dir = settings.TEMPLATES_BYTECODE_CACHE_DIR
+    if cache_dir:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=True,
+        auto_reload=settings.TEMPLATES_AUTO_RELOAD,
+        bytecode_cache=jinja2.FileSystemBytecodeCache(cache_dir or None),
+    )
+
+
+# The one template environment every router renders through.
+templates = TimedTemplates(_environment())
+
+
+def warm_templates() -> List[str]:
+    """
+    Compile every .html template into the environment's in-memory cache
+    (and the bytecode cache on disk) so no request pays the compile cost.
+    Returns the names that compiled; failures are logged and skipped.
+    """
+    env = templates.env
+    compiled: List[str] = []
+    t0 = time.perf_counter()
+    for name in env.list_templates(extensions=["html"]):
+        try:
+            env.get_template(name)
+            compiled.append(name)
+        except jinja2.TemplateError as e:
+            print(f"[TEMPLATES] {name} failed to compile: {e}")
+    print(f"[TEMPLATES] precompiled {len(compiled)} templates in {(time.perf_counter() - t0) * 1000:.0f}ms")
+    return compiled
+
+
+def template_stats() -> Dict[str, Any]:
+    return {
+        "directory": str(TEMPLATES_DIR),
+        "auto_reload": templates.env.auto_reload,
+        "loaded": len(templates.env.cache or {}),
+        "renders": templates.stats.snapshot(),
+    }